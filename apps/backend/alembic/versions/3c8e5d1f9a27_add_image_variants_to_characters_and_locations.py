@@ -0,0 +1,28 @@
+"""add_image_variants_to_characters_and_locations
+
+Revision ID: 3c8e5d1f9a27
+Revises: bfd70e4f42a5
+Create Date: 2026-10-19 10:12:31.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c8e5d1f9a27'
+down_revision: Union[str, None] = 'bfd70e4f42a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('characters', sa.Column('image_variants', sa.JSON(), nullable=True))
+    op.add_column('locations', sa.Column('image_variants', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('locations', 'image_variants')
+    op.drop_column('characters', 'image_variants')
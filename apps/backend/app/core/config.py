@@ -25,6 +25,10 @@ class Settings:
     
     # Media settings
     MEDIA_ROOT = os.path.join(os.getcwd(), "media")
+    # Internal state such as the image cache index, kept out of MEDIA_ROOT because that is served publicly
+    CACHE_ROOT: str = os.getenv("CACHE_ROOT", os.path.join(os.getcwd(), "cache"))
+    # Shown until a character or location image has been generated, media/placeholder.png by default
+    PLACEHOLDER_IMAGE_URL: str = os.getenv("PLACEHOLDER_IMAGE_URL", f"{BACKEND_URL or ''}/media/placeholder.png")
     
     # Database settings
     DATABASE_URL: Optional[str] = os.getenv("DATABASE_URL")
@@ -38,15 +42,77 @@ class Settings:
     OPEN_ROUTER_API_KEY: Optional[str] = os.getenv("OPEN_ROUTER_API_KEY")
     OPEN_ROUTER_API_BASE: Optional[str] = os.getenv("OPEN_ROUTER_API_BASE")
     ANTHROPIC_API_KEY: Optional[str] = os.getenv("ANTHROPIC_API_KEY")
+    # Streamed chat replies are sent in frames of up to this many bytes, held back at most this many seconds
+    CHAT_CHUNK_FLUSH_INTERVAL: float = float(os.getenv("CHAT_CHUNK_FLUSH_INTERVAL", "0.03"))
+    CHAT_CHUNK_MAX_BYTES: int = int(os.getenv("CHAT_CHUNK_MAX_BYTES", "512"))
+    # Offer MessagePack frames to game WebSocket clients asking for the verse.msgpack subprotocol
+    WS_MSGPACK_ENABLED: bool = os.getenv("WS_MSGPACK_ENABLED", "True").lower() in ("true", "1", "yes")
     
     # Langfuse settings
     LANGFUSE_SECRET_KEY: Optional[str] = os.getenv("LANGFUSE_SECRET_KEY")
     LANGFUSE_PUBLIC_KEY: Optional[str] = os.getenv("LANGFUSE_PUBLIC_KEY")
     LANGFUSE_HOST: Optional[str] = os.getenv("LANGFUSE_HOST")
     
+    # Entity reservoir settings: pre-generated NPCs and locations kept per story, 0 disables
+    RESERVOIR_CHARACTERS: int = int(os.getenv("RESERVOIR_CHARACTERS", "2"))
+    RESERVOIR_LOCATIONS: int = int(os.getenv("RESERVOIR_LOCATIONS", "1"))
+    # Reservoirs of stories without a session for this many seconds are dropped, as are the least
+    # recently used ones beyond this many stories
+    RESERVOIR_IDLE_TTL: float = float(os.getenv("RESERVOIR_IDLE_TTL", "1800"))
+    RESERVOIR_MAX_STORIES: int = int(os.getenv("RESERVOIR_MAX_STORIES", "100"))
+    
     # ComfyUI settings
     COMFYUI_API_URL: Optional[str] = os.getenv("COMFYUI_API_URL")
+    # Comma-separated ComfyUI backends image jobs are balanced over, defaults to COMFYUI_API_URL
+    COMFYUI_API_URLS: List[str] = [
+        url.strip() for url in (os.getenv("COMFYUI_API_URLS") or os.getenv("COMFYUI_API_URL") or "").split(",")
+        if url.strip()
+    ]
+    # Jobs this process runs at once per backend, attempts per job, and slots kept free for interactive jobs
+    COMFYUI_MAX_IN_FLIGHT: int = int(os.getenv("COMFYUI_MAX_IN_FLIGHT", "2"))
+    COMFYUI_MAX_ATTEMPTS: int = int(os.getenv("COMFYUI_MAX_ATTEMPTS", "2"))
+    COMFYUI_RESERVED_INTERACTIVE_SLOTS: int = int(os.getenv("COMFYUI_RESERVED_INTERACTIVE_SLOTS", "1"))
+    # Seconds a job may be passed over for jobs using the models already loaded on a backend
+    COMFYUI_AFFINITY_MAX_WAIT: float = float(os.getenv("COMFYUI_AFFINITY_MAX_WAIT", "10"))
     COMFYUI_WORKFLOWS_DIR: str = str(Path(os.getcwd()) / "comfyui_workflows")
+    # Size of the shared HTTP connection pool to ComfyUI
+    COMFYUI_MAX_CONNECTIONS: int = int(os.getenv("COMFYUI_MAX_CONNECTIONS", "20"))
+    # Seconds after which uploaded reference images are checked to still exist on ComfyUI
+    COMFYUI_REFERENCE_VERIFY_INTERVAL: float = float(os.getenv("COMFYUI_REFERENCE_VERIFY_INTERVAL", "600"))
+    # Complete jobs on ComfyUI's /ws events instead of polling /history
+    COMFYUI_USE_WEBSOCKET: bool = os.getenv("COMFYUI_USE_WEBSOCKET", "True").lower() in ("true", "1", "yes")
+    # Bytes per chunk when streaming generated images to disk, bounds the memory per download
+    COMFYUI_DOWNLOAD_CHUNK_SIZE: int = int(os.getenv("COMFYUI_DOWNLOAD_CHUNK_SIZE", str(64 * 1024)))
+    # Seconds finished /comfyui/generate-image jobs can still be polled
+    COMFYUI_JOB_TTL: float = float(os.getenv("COMFYUI_JOB_TTL", "3600"))
+    # Submit the deferred images of a scene step as one merged ComfyUI job of up to MAX_IMAGES images,
+    # a batch nobody submits is sent after WINDOW seconds
+    COMFYUI_SCENE_BATCHING: bool = os.getenv("COMFYUI_SCENE_BATCHING", "True").lower() in ("true", "1", "yes")
+    COMFYUI_SCENE_BATCH_MAX_IMAGES: int = int(os.getenv("COMFYUI_SCENE_BATCH_MAX_IMAGES", "4"))
+    COMFYUI_SCENE_BATCH_WINDOW: float = float(os.getenv("COMFYUI_SCENE_BATCH_WINDOW", "30"))
+    # Generation profiles (fast, balanced or quality) used when a call site does not select one
+    IMAGE_PROFILE_CHARACTER: str = os.getenv("IMAGE_PROFILE_CHARACTER", "fast")
+    IMAGE_PROFILE_LOCATION: str = os.getenv("IMAGE_PROFILE_LOCATION", "balanced")
+    # Deferred images are first rendered as a quick preview of at most PREVIEW_STEPS steps at PREVIEW_SCALE size
+    IMAGE_PREVIEW_ENABLED: bool = os.getenv("IMAGE_PREVIEW_ENABLED", "True").lower() in ("true", "1", "yes")
+    IMAGE_PREVIEW_STEPS: int = int(os.getenv("IMAGE_PREVIEW_STEPS", "4"))
+    IMAGE_PREVIEW_SCALE: float = float(os.getenv("IMAGE_PREVIEW_SCALE", "0.5"))
+    # Generated image cache: number of cached images, and whether sampling parameters are derived from the prompt
+    IMAGE_CACHE_SIZE: int = int(os.getenv("IMAGE_CACHE_SIZE", "512"))
+    IMAGE_CACHE_PIN_SEED: bool = os.getenv("IMAGE_CACHE_PIN_SEED", "False").lower() in ("true", "1", "yes")
+    # Derivatives of generated images: thumbnail widths, formats (e.g. webp, avif), encoder quality and worker processes
+    IMAGE_VARIANT_WIDTHS: List[int] = [
+        int(width) for width in os.getenv("IMAGE_VARIANT_WIDTHS", "256,768").split(",") if width.strip()
+    ]
+    IMAGE_VARIANT_FORMATS: List[str] = [
+        fmt.strip().lower() for fmt in os.getenv("IMAGE_VARIANT_FORMATS", "webp,avif").split(",") if fmt.strip()
+    ]
+    IMAGE_VARIANT_QUALITY: int = int(os.getenv("IMAGE_VARIANT_QUALITY", "80"))
+    IMAGE_VARIANT_WORKERS: int = int(os.getenv("IMAGE_VARIANT_WORKERS", "2"))
+    # Seconds between garbage collections of unreferenced generated images (0, the default, disables them), and
+    # their minimum age; `python -m app.scripts.media_gc` reports what a collection would delete
+    MEDIA_GC_INTERVAL: float = float(os.getenv("MEDIA_GC_INTERVAL", "0"))
+    MEDIA_GC_GRACE_PERIOD: float = float(os.getenv("MEDIA_GC_GRACE_PERIOD", "86400"))
 
 
 # Create global settings instance
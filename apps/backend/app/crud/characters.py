@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Dict, Optional
 from sqlalchemy.orm import Session
 from app.models.character import Character
 from app.schemas import character as character_schema
@@ -35,3 +35,30 @@ def get_player_character_for_story(db: Session, story_id: int) -> Character | No
 def get_character_by_uuid(db: Session, character_uuid: str) -> Optional[Character]:
     """Get a character by its UUID"""
     return db.query(Character).filter(Character.uuid == character_uuid).first()
+
+def get_character_ids_by_uuids(db: Session, character_uuids: list[str]) -> list[int]:
+    """Get the IDs of the characters with the given UUIDs in one query"""
+    unique_uuids = list(dict.fromkeys(character_uuids))
+    rows = db.query(Character.id).filter(Character.uuid.in_(unique_uuids)).all()
+    return list(dict.fromkeys(row.id for row in rows))
+
+def get_character_image_urls(db: Session) -> list[str]:
+    """Image URLs of all characters, including the URLs of their image variants"""
+    urls = []
+    for image_dir, image_variants in db.query(Character.image_dir, Character.image_variants).all():
+        if image_dir:
+            urls.append(image_dir)
+        urls.extend((image_variants or {}).values())
+    return urls
+
+def update_character_image(
+    db: Session, character_uuid: str, image_url: str, image_variants: Optional[Dict[str, str]] = None
+) -> Optional[Character]:
+    """Set the image and its variants of a character identified by its UUID"""
+    db_character = get_character_by_uuid(db, character_uuid)
+    if db_character is None:
+        return None
+    db_character.image_dir = image_url
+    db_character.image_variants = image_variants or None
+    db.commit()
+    return db_character
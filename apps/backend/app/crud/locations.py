@@ -1,3 +1,4 @@
+from typing import Dict, Optional
 from sqlalchemy.orm import Session
 from app.models import *
 from app.schemas import location as location_schema
@@ -24,6 +25,31 @@ def create_location(db: Session, location: location_schema.LocationCreate):
     db.refresh(db_location)
     return db_location
 
+def get_location_by_uuid(db: Session, location_uuid: str) -> Location | None:
+    """Get a location by its UUID"""
+    return db.query(Location).filter(Location.uuid == location_uuid).first()
+
+def get_location_image_urls(db: Session) -> list[str]:
+    """Image URLs of all locations, including the URLs of their image variants"""
+    urls = []
+    for image_dir, image_variants in db.query(Location.image_dir, Location.image_variants).all():
+        if image_dir:
+            urls.append(image_dir)
+        urls.extend((image_variants or {}).values())
+    return urls
+
+def update_location_image(
+    db: Session, location_uuid: str, image_url: str, image_variants: Optional[Dict[str, str]] = None
+) -> Location | None:
+    """Set the image and its variants of a location identified by its UUID"""
+    db_location = get_location_by_uuid(db, location_uuid)
+    if db_location is None:
+        return None
+    db_location.image_dir = image_url
+    db_location.image_variants = image_variants or None
+    db.commit()
+    return db_location
+
 # MOCK_LOCATIONS = {
 #     0: Location(
 #         id=0,
@@ -1,7 +1,8 @@
 import logging
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import desc
+from sqlalchemy import desc, insert
 from app.models.scene import Scene, SceneSummary
+from app.models.associations import scene_character_association
 from app.crud import characters as characters_crud
 
 from typing import List, Optional, Dict, Any
@@ -205,17 +206,22 @@ def create_complete_scene(
     story_id: int, 
     location_id: int, 
     description: str,
-    character_uuids: Optional[List[str]] = None
+    character_uuids: Optional[List[str]] = None,
+    commit: bool = True
 ) -> Scene:
     """
     Create a complete scene with all required data using character UUIDs instead of IDs
     
+    Character ids are resolved with a single query and the scene-character
+    associations are written with one bulk insert.
+    
     Args:
         db: Database session
         story_id: ID of the story to associate with
         location_id: ID of the location to associate with
         description: Scene description
         character_uuids: Optional list of character UUIDs to associate
+        commit: Commit the transaction; pass False to leave it to the caller (unit of work)
         
     Returns:
         The created scene database model
@@ -231,20 +237,19 @@ def create_complete_scene(
     
     db.add(db_scene)
     db.flush()
-    
-    # Store ID before we might lose it in refresh
-    scene_id = db_scene.id
 
     logging.info("character_uuids: " + str(character_uuids))
     
     # Add characters if provided
     if character_uuids:
-        # Get fresh copy of scene first
-        db_scene = db.query(Scene).filter(Scene.id == scene_id).first()
-        if db_scene:
-            db_scene = add_characters_to_scene(db, scene_id, character_uuids)
-    
-    db.commit()
-    db.refresh(db_scene)
+        character_ids = characters_crud.get_character_ids_by_uuids(db, character_uuids)
+        if character_ids:
+            db.execute(
+                insert(scene_character_association),
+                [{"scene_id": db_scene.id, "character_id": character_id} for character_id in character_ids]
+            )
+    
+    if commit:
+        db.commit()
     
     return db_scene
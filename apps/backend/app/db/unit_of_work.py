@@ -0,0 +1,61 @@
+import logging
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+from sqlalchemy.orm import Session
+
+T = TypeVar("T")
+
+
+class UnitOfWork:
+    """
+    Collects new ORM objects and writes them to the database in a single transaction.
+
+    Objects are kept out of the session until commit, so commits made by other code
+    on the same session (e.g. image updates) do not write them early. Objects are
+    looked up by their uuid attribute until they are committed.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self._pending: Dict[str, Any] = {}
+
+    def add(self, obj: Any) -> None:
+        """Register a new ORM object to be inserted on commit"""
+        self._pending[str(obj.uuid)] = obj
+
+    def get(self, uuid: str) -> Optional[Any]:
+        """Return a pending object by its uuid"""
+        return self._pending.get(uuid)
+
+    @property
+    def pending(self) -> List[Any]:
+        """Objects that will be inserted on commit, in registration order"""
+        return list(self._pending.values())
+
+    def commit(self, finalize: Optional[Callable[[Session], T]] = None) -> Optional[T]:
+        """
+        Insert all pending objects and commit once.
+
+        Args:
+            finalize: Optional function run in the same transaction after the pending
+                objects were flushed (so their ids are known), e.g. to create the scene
+
+        Returns:
+            The result of finalize
+        """
+        try:
+            self.db.add_all(self._pending.values())
+            self.db.flush()
+            result = finalize(self.db) if finalize else None
+            self.db.commit()
+            return result
+        except Exception:
+            logging.exception(f"Unit of work failed, rolling back {len(self._pending)} pending objects")
+            self.db.rollback()
+            raise
+        finally:
+            self._pending.clear()
+
+    def discard(self) -> None:
+        """Forget all pending objects"""
+        self._pending.clear()
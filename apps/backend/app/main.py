@@ -16,6 +16,12 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.routers.api import api_router
 from app.core.config import settings
+from app.services.game_engine.orchestrators.entity_reservoir import shutdown_reservoirs
+from app.services.image_generation.generation_jobs import close_generation_jobs
+from app.services.image_generation.image_variants import close_image_variants
+from app.services.image_generation.media_gc import media_garbage_collector
+from app.services.image_generation.scheduler import close_comfyui_scheduler
+from app.services.image_generation import WorkflowLoaderFactory
 
 
 app = FastAPI(title=settings.PROJECT_NAME, description="Create your own story", version="0.1.0", redirect_slashes=True)
@@ -39,7 +45,17 @@ app.mount("/media", StaticFiles(directory=settings.MEDIA_ROOT), name="media")
 @app.on_event("startup")
 def startup_event():
     seed_database()
-    pass
+    WorkflowLoaderFactory.preload_templates()
+    media_garbage_collector.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await media_garbage_collector.stop()
+    await shutdown_reservoirs()
+    await close_generation_jobs()
+    await close_comfyui_scheduler()
+    close_image_variants()
 
 
 @app.get("/")
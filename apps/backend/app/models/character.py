@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, JSON
 from sqlalchemy.orm import relationship
 from app.db.session import Base
 from sqlalchemy.orm import Mapped
@@ -19,6 +19,7 @@ class Character(Base):
     speaking_style = Column(String) # character's speaking style, e.g., formal, informal, etc.
     relationships = Column(String) # relationships with other characters
     image_dir = Column(String) # directory where all character images are stored
+    image_variants = Column(JSON) # thumbnail and modern-format variants of the image by variant name
     image_prompt = Column(String) # this might not be necessary to store in db
     relationship_level = Column(Integer) # on hold for now
     story_id = Column(Integer, ForeignKey('stories.id'), nullable=False)
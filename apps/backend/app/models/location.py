@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, JSON
 from sqlalchemy.orm import relationship
 from app.db.session import Base
 
@@ -12,6 +12,7 @@ class Location(Base):
     rules = Column(String) # rules for the location
     colors = Column(String) # interface colors
     image_dir = Column(String) # directory where all location images are stored
+    image_variants = Column(JSON) # thumbnail and modern-format variants of the image by variant name
     story_id = Column(Integer, ForeignKey('stories.id'), nullable=False)
     uuid = Column(String, nullable=False)
     
@@ -15,6 +15,8 @@ from app.prompts.character_generator import (
     CHARACTER_IMAGE_PROMPT_USER_TEMPLATE,
     CREATE_CHARACTER_DRAFT_SYSTEM_PROMPT,
     CREATE_CHARACTER_DRAFT_USER_PROMPT_TEMPLATE,
+    CREATE_CHARACTERS_BATCH_SYSTEM_PROMPT,
+    CREATE_CHARACTERS_BATCH_USER_PROMPT_TEMPLATE,
 )
 from app.prompts.location_generator import (
     LOCATION_GENERATOR_SYSTEM_PROMPT,
@@ -79,6 +81,8 @@ __all__ = [
     'CHARACTER_IMAGE_PROMPT_USER_TEMPLATE',
     'CREATE_CHARACTER_DRAFT_SYSTEM_PROMPT',
     'CREATE_CHARACTER_DRAFT_USER_PROMPT_TEMPLATE',
+    'CREATE_CHARACTERS_BATCH_SYSTEM_PROMPT',
+    'CREATE_CHARACTERS_BATCH_USER_PROMPT_TEMPLATE',
     'LOCATION_GENERATOR_SYSTEM_PROMPT',
     'LOCATION_GENERATOR_USER_PROMPT_TEMPLATE',
     'STORY_WIZARD_SYSTEM_PROMPT',
@@ -48,8 +48,8 @@ IMPORTANT: Return ONLY valid JSON in the following format and nothing else:
 """
 
 CREATE_CHARACTER_DRAFT_USER_PROMPT_TEMPLATE = """
-World Description: {world_description}
-World Rules: {world_rules}
+Story Description: {story_description}
+Story Rules: {story_rules}
 Character Description: {description}
 
 Generate a character draft based on this description.
@@ -92,6 +92,49 @@ Story Rules: {story_rules}
 Character Draft: {character_draft}
 """
 
+# Batch generation: describe and structure several characters in one call
+CREATE_CHARACTERS_BATCH_SYSTEM_PROMPT = """
+You are a Character Development Specialist, focused on creating rich, detailed character profiles for interactive narrative stories.
+Your task is to expand several basic character drafts into fully-fleshed characters with depth, consistency, and narrative potential.
+
+For every draft:
+1. Develop a detailed description that expands on their basic traits, including their appearance (150-250 words)
+2. Create 3-5 personality traits
+3. Craft a compelling backstory that fits the setting and explains their current role
+4. Define 2-3 clear goals that drive their actions and create narrative opportunities
+
+Ensure all details are consistent with the provided story setting, and make the characters distinct from each other.
+
+IMPORTANT: All JSON keys MUST use camelCase formatting (e.g., personalityTraits), not snake_case.
+Return ONLY a valid JSON array with exactly one object per draft, in the same order as the drafts, following this structure:
+```json
+[
+  {
+    "name": "string",  // Preserve the name from the draft
+    "description": "string",
+    "personalityTraits": ["string", "string"],
+    "backstory": "string",
+    "goals": ["string"],
+    "relationships": [
+      {
+        "name": "string",
+        "level": 0,  // Numeric level of relationship intensity (0-10)
+        "type": "string",
+        "backstory": "string"
+      }
+    ]
+  }
+]
+```
+"""
+
+CREATE_CHARACTERS_BATCH_USER_PROMPT_TEMPLATE = """
+Story Description: {story_description}
+Story Rules: {story_rules}
+Character Drafts:
+{character_drafts}
+"""
+
 CREATE_CHARACTER_JSON_USER_PROMPT_TEMPLATE = """
 Please convert the following detailed character descriptions into a structured JSON format:
 
@@ -1,13 +1,22 @@
+from dataclasses import asdict
 from fastapi import APIRouter, HTTPException
-from typing import Dict, Any, List, Optional
-from app.services.image_generation.comfyui_service import ComfyUIService
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Dict, Any, List, Optional
+from app.schemas.comfyui import GenerationProgressResponse
+from app.services.image_generation.generation_jobs import GenerationJob, get_generation_jobs
+from app.services.image_generation.generation_profiles import GENERATION_PROFILES, get_generation_profile
+from app.services.image_generation.image_cache import get_image_cache
+from app.services.image_generation.scheduler import get_comfyui_scheduler
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/comfyui", tags=["comfyui"])
 
+SSE_KEEPALIVE_SECONDS = 15
+
 class ImageGenerationRequest(BaseModel):
     prompt: str
     context_type: str = "character"  # Default to character if not specified
+    profile: Optional[str] = None  # fast, balanced or quality, defaults to the profile of the context
 
 class ImagePathsModel(BaseModel):
     base: str
@@ -19,26 +28,103 @@ class ImageGenerationResponse(BaseModel):
     promptId: Optional[str] = None
     error: Optional[str] = None
     imagePaths: Optional[Dict[str, Any]] = None
+    imageVariants: Dict[str, str] = {}
+    cached: bool = False
+
+class ImageGenerationJobResponse(BaseModel):
+    jobId: str
+    status: str  # "queued", "running", "completed" or "failed"
+    progress: Optional[GenerationProgressResponse] = None
+    result: Optional[ImageGenerationResponse] = None
+    error: Optional[str] = None
+
+class ImageCacheStatsResponse(BaseModel):
+    entries: int
+    maxEntries: int
+    hits: int
+    misses: int
+    evictions: int
+    hitRate: Optional[float] = None
 
-class GenerationProgressResponse(BaseModel):
-    promptId: str
-    step: int
-    totalSteps: int
-    status: str
+class GenerationProfileResponse(BaseModel):
+    name: str
+    sampler_name: str
+    scheduler: str
+    steps: int
+    cfg: float
 
-@router.post("/generate-image", response_model=ImageGenerationResponse)
+class ComfyUIBackendResponse(BaseModel):
+    url: str
+    inFlight: int
+    maxInFlight: int
+    queueDepth: int
+    healthy: bool
+    completed: int
+    failures: int
+    modelSwitches: int
+    abandoned: int
+    wastedGpuSeconds: float
+
+@router.post("/generate-image", response_model=ImageGenerationJobResponse, status_code=202)
 async def generate_image(request: ImageGenerationRequest):
-    """Generate image using ComfyUI based on text prompt"""
-    comfyui_service = ComfyUIService()
+    """
+    Start generating an image using ComfyUI based on text prompt.
+
+    Returns the job right away; poll GET /comfyui/jobs/{job_id} or follow
+    GET /comfyui/jobs/{job_id}/events for its progress and result.
+    """
     try:
-        result = comfyui_service.generate_image(request.prompt, request.context_type)
-        return result
-    except TimeoutError as e:
-        raise HTTPException(status_code=504, detail=f"Generation timed out: {str(e)}")
-    except ConnectionError as e:
-        raise HTTPException(status_code=503, detail=f"ComfyUI service unavailable: {str(e)}")
+        get_generation_profile(request.profile, request.context_type)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=f"Invalid request: {str(e)}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    return get_generation_jobs().submit(request.prompt, request.context_type, request.profile).stats()
+
+def _get_job(job_id: str) -> GenerationJob:
+    job = get_generation_jobs().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Image generation job {job_id} not found")
+    return job
+
+@router.get("/jobs/{job_id}", response_model=ImageGenerationJobResponse)
+async def image_generation_job(job_id: str):
+    """Status, last progress and, once finished, result of an image generation job"""
+    return _get_job(job_id).stats()
+
+@router.get("/jobs/{job_id}/events")
+async def image_generation_job_events(job_id: str):
+    """
+    Server-Sent Events stream of the progress of an image generation job.
+
+    Every event is a GenerationProgressResponse; the stream ends with the event whose
+    status is "completed" or "failed".
+    """
+    job = _get_job(job_id)
+
+    async def stream() -> AsyncIterator[str]:
+        async for progress in get_generation_jobs().events(job, keepalive=SSE_KEEPALIVE_SECONDS):
+            if progress is None:
+                # Comment line keeping proxies from closing an idle stream
+                yield ": keepalive\n\n"
+            else:
+                yield f"event: progress\ndata: {progress.model_dump_json()}\n\n"
+
+    return StreamingResponse(
+        stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/cache", response_model=ImageCacheStatsResponse)
+async def image_cache_stats():
+    """Hit-rate metrics of the generated image cache"""
+    return get_image_cache().stats()
+
+
+@router.get("/backends", response_model=List[ComfyUIBackendResponse])
+async def comfyui_backends():
+    """Load and health of the ComfyUI backends used by the scheduler"""
+    return get_comfyui_scheduler().stats()
+
 
+@router.get("/profiles", response_model=List[GenerationProfileResponse])
+async def generation_profiles():
+    """Generation profiles that can be selected when generating an image"""
+    return [asdict(profile) for profile in GENERATION_PROFILES.values()]
@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from typing import AbstractSet, Dict, Any, Optional
 from fastapi import WebSocket
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 
@@ -9,6 +10,9 @@ class BaseMessageHandler(ABC):
     Abstract base class for message handlers.
     Provides interface for handling specific message types.
     """
+    # Message types the handler processes, GameMessageHandler routes them to it directly
+    message_types: AbstractSet[str] = frozenset()
+
     def __init__(self, db_session: Optional[Session] = None):
         """
         Initialize the handler with a database session
@@ -30,4 +34,15 @@ class BaseMessageHandler(ABC):
         Returns:
             bool: True if the message was handled, False otherwise
         """
-        pass 
\ No newline at end of file
+        pass
+
+    async def handle_decoded(self, message: BaseModel, websocket: WebSocket) -> None:
+        """
+        Handle a message that was already decoded and validated against its schema
+        (see GameClientMessage). Defaults to handle with the message as a dictionary.
+
+        Args:
+            message: The incoming message, one of the models of GameClientMessage
+            websocket: The client websocket
+        """
+        await self.handle(message.model_dump(), websocket)
@@ -0,0 +1,68 @@
+import asyncio
+from typing import AsyncIterator, List
+
+from app.core.config import settings
+
+
+async def coalesce_chunks(
+    chunks: AsyncIterator[str],
+    flush_interval: float = settings.CHAT_CHUNK_FLUSH_INTERVAL,
+    max_bytes: int = settings.CHAT_CHUNK_MAX_BYTES
+) -> AsyncIterator[str]:
+    """
+    Join the text deltas of a stream into fewer, larger chunks.
+
+    A chunk is yielded once it holds max_bytes of UTF-8 text, or flush_interval seconds after
+    its first delta arrived even if the stream stalls, and the remainder as soon as the
+    stream ends. The stream is read by a background task, so buffering a delta costs no
+    more than appending it to a list.
+
+    Args:
+        chunks: Stream of text deltas, e.g. the tokens of an LLM reply
+        flush_interval: Seconds a delta may wait for more text, 0 to pass every delta on
+        max_bytes: Size at which a chunk is yielded right away
+    """
+    loop = asyncio.get_running_loop()
+    buffer: List[str] = []
+    size = 0
+    finished = False
+    # Set when the buffer holds text, and when it must be flushed without waiting
+    pending = asyncio.Event()
+    full = asyncio.Event()
+
+    async def read() -> None:
+        nonlocal size, finished
+        try:
+            async for delta in chunks:
+                buffer.append(delta)
+                size += len(delta.encode("utf-8"))
+                pending.set()
+                if size >= max_bytes:
+                    full.set()
+        finally:
+            finished = True
+            pending.set()
+            full.set()
+
+    reader = asyncio.create_task(read())
+    try:
+        while True:
+            await pending.wait()
+            if not full.is_set() and flush_interval > 0:
+                timer = loop.call_later(flush_interval, full.set)
+                await full.wait()
+                timer.cancel()
+            chunk = "".join(buffer)
+            buffer.clear()
+            size = 0
+            if not finished:
+                pending.clear()
+                full.clear()
+            if chunk:
+                yield chunk
+            elif finished:
+                break
+        # Raise the error of the stream, if any
+        await reader
+    finally:
+        reader.cancel()
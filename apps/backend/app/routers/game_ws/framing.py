@@ -0,0 +1,86 @@
+import importlib.util
+import logging
+from functools import lru_cache
+from typing import Any, List, Optional, Sequence, Union
+
+from fastapi import WebSocket
+from pydantic import BaseModel
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# WebSocket subprotocols a client can offer to choose how server messages are encoded.
+# Clients offering neither get JSON text frames, as before subprotocols were negotiated.
+JSON_SUBPROTOCOL = "verse.json"
+MSGPACK_SUBPROTOCOL = "verse.msgpack"
+
+
+@lru_cache(maxsize=None)
+def _msgpack_installed() -> bool:
+    if importlib.util.find_spec("msgpack") is not None:
+        return True
+    logger.warning("msgpack is not installed, game WebSockets only send JSON frames")
+    return False
+
+
+def supported_subprotocols() -> List[str]:
+    """Subprotocols this server accepts, MessagePack only when enabled and installed"""
+    if settings.WS_MSGPACK_ENABLED and _msgpack_installed():
+        return [MSGPACK_SUBPROTOCOL, JSON_SUBPROTOCOL]
+    return [JSON_SUBPROTOCOL]
+
+
+def select_subprotocol(offered: Sequence[str]) -> Optional[str]:
+    """The first subprotocol offered by the client that this server supports, None for plain JSON"""
+    supported = supported_subprotocols()
+    return next((protocol for protocol in offered if protocol in supported), None)
+
+
+class MessagePackWebSocket:
+    """
+    A WebSocket sending its JSON messages as MessagePack binary frames.
+
+    Only send_json changes; receiving and everything else is left to the wrapped socket,
+    so client messages are still JSON text frames.
+    """
+
+    def __init__(self, websocket: WebSocket):
+        import msgpack
+
+        self._packb = msgpack.packb
+        self.websocket = websocket
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.websocket, name)
+
+    async def send_json(self, data: Any, mode: str = "text") -> None:
+        await self.websocket.send_bytes(self._packb(data))
+
+
+async def accept(websocket: WebSocket) -> Union[WebSocket, MessagePackWebSocket]:
+    """
+    Accept a game WebSocket, selecting the message encoding from the subprotocols the
+    client offered in the handshake.
+
+    Returns:
+        The socket to send messages on, wrapped when MessagePack was selected
+    """
+    scope = getattr(websocket, "scope", None)
+    offered = (scope.get("subprotocols") or []) if isinstance(scope, dict) else []
+    subprotocol = select_subprotocol(offered)
+    if subprotocol is None:
+        await websocket.accept()
+        return websocket
+    await websocket.accept(subprotocol=subprotocol)
+    if subprotocol == MSGPACK_SUBPROTOCOL:
+        return MessagePackWebSocket(websocket)
+    return websocket
+
+
+async def send_model(websocket: Union[WebSocket, MessagePackWebSocket], message: BaseModel) -> None:
+    """Send a message model in the encoding of the socket"""
+    if isinstance(websocket, MessagePackWebSocket):
+        await websocket.send_json(message.model_dump(mode="json"))
+    else:
+        await websocket.send_text(message.model_dump_json())
@@ -5,6 +5,7 @@ from fastapi import WebSocket
 from pydantic import ValidationError
 from sqlalchemy.orm import Session
 
+from app.schemas.schemas_ws import InitializeGameMessage
 from app.schemas.story_generation import StoryGenerationInput, Story, Character
 from app.services.game_engine.orchestrators.game_initializer import GameInitializer
 from app.routers.game_ws.base import BaseMessageHandler
@@ -40,6 +41,10 @@ class GameInitializationHandler(BaseMessageHandler):
         
         return True
     
+    async def handle_decoded(self, message: InitializeGameMessage, websocket: WebSocket) -> None:
+        """Handle a game initialization request whose input was validated while decoding it"""
+        await self._initialize_game(message.payload, websocket)
+
     async def _handle_initialize_game(self, message: Dict[str, Any], websocket: WebSocket):
         """
         Handle game initialization request
@@ -51,7 +56,17 @@ class GameInitializationHandler(BaseMessageHandler):
             # Validate input
             payload = message.get("payload", {})
             input_data = StoryGenerationInput(**payload)
-            
+        except ValidationError as e:
+            await websocket.send_json({
+                "type": "ERROR",
+                "payload": {"message": "Invalid input data", "details": e.errors()}
+            })
+            return
+        await self._initialize_game(input_data, websocket)
+
+    async def _initialize_game(self, input_data: StoryGenerationInput, websocket: WebSocket):
+        """Generate the story and the player character, sending each to the client"""
+        try:
             # Get user ID if authenticated
             user_id = None
             auth_header = websocket.headers.get("authorization")
@@ -11,6 +11,7 @@ from app.models.character import Character as CharacterOrmModel
 from app.models.location import Location as LocationOrmModel
 from app.services.scene_service import SceneService
 from app.services.scene_generator import SceneGeneratorAgent
+from app.services.game_engine.orchestrators.entity_reservoir import EntityReservoir, get_reservoir
 from app.services.llm import LLMService
 from app.crud.stories import get_story_by_uuid
 from app.models.story import Story
@@ -22,6 +23,8 @@ from app.schemas.story_generation import (
 )
 from app.utils.model_converters import convert_character, convert_characters, convert_locations, convert_scene
 from app.schemas.scene_generator import SceneGenerationResult
+from app.schemas.comfyui import GenerationProgressResponse
+from app.services.image_generation.image_variants import get_image_variants
 
 logger = logging.getLogger(__name__)
 
@@ -46,6 +49,7 @@ class SceneGenerationHandler:
         self.llm_service = LLMService()
         self.agent: Optional[SceneGeneratorAgent] = None
         self.agent_task: Optional[asyncio.Task[Any]] = None
+        self.reservoir: Optional[EntityReservoir] = None
         self.active_actions: Dict[str, str] = {}
 
     async def run(self):
@@ -90,6 +94,11 @@ class SceneGenerationHandler:
             logger.exception(f"Error in SceneGenerationHandler for story {self.story_uuid}: {e}")
             await self._send_error(f"An unexpected error occurred: {str(e)}")
             await self._cleanup()
+        finally:
+            # The story's reservoir only refills while one of its sessions is open
+            if self.reservoir is not None:
+                self.reservoir.close_session()
+                self.reservoir = None
 
     def _get_story(self) -> Story:
         """Fetches the story using the UUID and handles errors."""
@@ -162,6 +171,7 @@ class SceneGenerationHandler:
                 id=story_data.id
             )
 
+            self.reservoir = get_reservoir(generation_input_story, self.llm_service)
             agent = SceneGeneratorAgent(
                 llm_service=self.llm_service,
                 story=generation_input_story,
@@ -169,6 +179,13 @@ class SceneGenerationHandler:
                 on_location_added=self._handle_location_added,
                 on_character_added=self._handle_character_added,
                 on_action_changed=self._handle_action_changed,
+                on_description_delta=self._handle_description_delta,
+                on_location_image_ready=self._handle_location_image_ready,
+                on_character_image_ready=self._handle_character_image_ready,
+                on_image_progress=self._handle_image_progress,
+                on_location_image_preview=self._handle_location_image_preview,
+                on_character_image_preview=self._handle_character_image_preview,
+                reservoir=self.reservoir,
                 db_session=self.db_session
             )
             self.agent = agent
@@ -273,6 +290,37 @@ class SceneGenerationHandler:
         logger.info(f"Sending ACTION_CHANGED update for story {self.story_uuid}, active actions: {self.active_actions}")
         await self._send_update("ACTION_CHANGED", payload)
 
+    async def _send_description_delta(self, delta: str):
+        """Sends a SCENE_DESCRIPTION_DELTA message with the next chunk of the scene description."""
+        payload = {
+            "storyId": str(self.story_uuid),
+            "delta": delta,
+        }
+        await self._send_update("SCENE_DESCRIPTION_DELTA", payload)
+
+    async def _send_image_ready(self, message_type: str, entity_uuid: str, image_url: str, preview: bool = False):
+        """
+        Sends a CHARACTER_IMAGE_READY or LOCATION_IMAGE_READY message with the image of an entity,
+        either a provisional preview or the final image.
+        """
+        payload = {
+            "storyId": str(self.story_uuid),
+            "uuid": entity_uuid,
+            "imageUrl": image_url,
+            "imageVariants": {} if preview else get_image_variants().urls(image_url),
+            "preview": preview,
+        }
+        logger.info(f"Sending {message_type} update for story {self.story_uuid}: {payload}")
+        await self._send_update(message_type, payload)
+
+    async def _send_generation_progress(self, progress: GenerationProgressResponse):
+        """Sends a GENERATION_PROGRESS message with the ComfyUI progress of an entity image."""
+        payload = {
+            "storyId": str(self.story_uuid),
+            **progress.model_dump(),
+        }
+        await self._send_update("GENERATION_PROGRESS", payload)
+
     async def _send_scene_complete(self, scene: Union[SceneModel, SceneGenerationResult]):
         """Sends the SCENE_COMPLETE message with the final scene details."""
             
@@ -288,7 +336,9 @@ class SceneGenerationHandler:
         await self._send_update("ERROR", {"message": message})
 
     async def _cleanup(self):
-        """Cancels any running agent task."""
+        """Cancels any running agent task and its background image generations."""
+        if self.agent is not None:
+            self.agent.cancel_pending_images()
         if self.agent_task and not self.agent_task.done():
             logger.info(f"Cancelling SceneGeneratorAgent task for story {self.story_uuid}")
             self.agent_task.cancel()
@@ -323,4 +373,28 @@ class SceneGenerationHandler:
             action_message: Message describing the action, or None if action was removed
         """
         logger.debug(f"Callback _handle_action_changed called for story {self.story_uuid}: {action_type}={action_message}")
-        await self._send_action_changed(action_type, action_message) 
\ No newline at end of file
+        await self._send_action_changed(action_type, action_message)
+
+    async def _handle_description_delta(self, delta: str):
+        """Callback triggered by SceneGeneratorAgent for each streamed chunk of the scene description."""
+        await self._send_description_delta(delta)
+
+    async def _handle_location_image_ready(self, location_uuid: str, image_url: str):
+        """Callback triggered by SceneGeneratorAgent when the image of a generated location is ready."""
+        await self._send_image_ready("LOCATION_IMAGE_READY", location_uuid, image_url)
+
+    async def _handle_character_image_ready(self, character_uuid: str, image_url: str):
+        """Callback triggered by SceneGeneratorAgent when the image of a generated character is ready."""
+        await self._send_image_ready("CHARACTER_IMAGE_READY", character_uuid, image_url)
+
+    async def _handle_location_image_preview(self, location_uuid: str, image_url: str):
+        """Callback triggered by SceneGeneratorAgent when a preview of the image of a generated location is ready."""
+        await self._send_image_ready("LOCATION_IMAGE_READY", location_uuid, image_url, preview=True)
+
+    async def _handle_character_image_preview(self, character_uuid: str, image_url: str):
+        """Callback triggered by SceneGeneratorAgent when a preview of the image of a generated character is ready."""
+        await self._send_image_ready("CHARACTER_IMAGE_READY", character_uuid, image_url, preview=True)
+
+    async def _handle_image_progress(self, progress: GenerationProgressResponse):
+        """Callback triggered by SceneGeneratorAgent with the progress of an image being generated."""
+        await self._send_generation_progress(progress)
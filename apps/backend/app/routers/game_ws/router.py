@@ -1,21 +1,26 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import Dict, Any, List, Optional, Callable, Type
+from typing import Dict, Any, List, Optional, Callable, Type, Union
 import json
 import logging
 from jose import jwt, JWTError  # Add JWT handling
+from pydantic import BaseModel, ValidationError
 import uuid  # Add uuid
 
 from app.routers.game_ws.base import BaseMessageHandler
+from app.routers.game_ws.coalescing import coalesce_chunks
+from app.routers.game_ws.framing import accept, send_model
 from app.routers.game_ws.handlers.initialization import GameInitializationHandler
 from app.routers.game_ws.handlers.scene_generation import SceneGenerationHandler  # Import SceneGenerationHandler
 from app.db.session import get_db, Session
 
 
 
+from app.schemas.schemas_ws import AuthenticateMessage, game_client_message_adapter
 from app.schemas.conversation import ClientMessage, ChatChunkMessage, ChatCompleteMessage, ErrorMessage
 from app.crud.characters import get_character_by_uuid
 from app.crud.scenes import get_scene_by_uuid
 from app.services.conversation_service import ConversationService
+from app.services.game_engine.orchestrators.entity_reservoir import reservoir_stats
 from app.services.auth import ALGORITHM, SECRET_KEY
 from app.services.users import get_user
 
@@ -26,8 +31,31 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/game", tags=["game"])
 
 
+class EntityReservoirStatsResponse(BaseModel):
+    storyUuid: str
+    sessions: int
+    characters: int
+    maxCharacters: int
+    locations: int
+    maxLocations: int
+    hits: int
+    misses: int
+    generated: int
+    hitRate: Optional[float] = None
+    characterHitRate: Optional[float] = None
+    locationHitRate: Optional[float] = None
+
+
+@router.get("/reservoirs", response_model=List[EntityReservoirStatsResponse])
+async def entity_reservoirs():
+    """Content and hit rates of the entity reservoirs of the stories being played"""
+    return reservoir_stats()
+
+
 class AuthenticationHandler(BaseMessageHandler):
     """Handler for authentication messages"""
+
+    message_types = frozenset({"AUTHENTICATE"})
     
     async def handle(self, message: Dict[str, Any], websocket: WebSocket) -> bool:
         message_type = message.get("type")
@@ -37,12 +65,17 @@ class AuthenticationHandler(BaseMessageHandler):
         
         await self._handle_authenticate(message, websocket)
         return True
+
+    async def handle_decoded(self, message: AuthenticateMessage, websocket: WebSocket) -> None:
+        await self._authenticate(message.payload.Authorization, websocket)
     
     async def _handle_authenticate(self, message: Dict[str, Any], websocket: WebSocket):
         """Process authentication request"""
         payload = message.get("payload", {})
-        auth_header = payload.get("Authorization", "")
-        
+        await self._authenticate(payload.get("Authorization", ""), websocket)
+
+    async def _authenticate(self, auth_header: str, websocket: WebSocket):
+        """Authenticate the connection with a 'Bearer <token>' header value"""
         if not auth_header.startswith("Bearer "):
             await websocket.send_json({
                 "type": "AUTH_ERROR",
@@ -118,6 +151,13 @@ class GameMessageHandler:
         
         # Initialize handlers
         self.handlers: List[BaseMessageHandler] = handlers or self._create_default_handlers()
+        # Message type -> handler, for handlers that declare their message types
+        self.routes: Dict[str, BaseMessageHandler] = {}
+        for handler in self.handlers:
+            for message_type in handler.message_types:
+                self.routes.setdefault(message_type, handler)
+        # Handlers without declared message types are tried in turn for the other messages
+        self.fallback_handlers = [handler for handler in self.handlers if not handler.message_types]
         
         # Track active connections
         self.active_connections: List[WebSocket] = []
@@ -149,11 +189,17 @@ class GameMessageHandler:
             # Add more handlers here as they're implemented
         ]
     
-    async def connect(self, websocket: WebSocket):
-        """Accept and track a new WebSocket connection"""
-        await websocket.accept()
+    async def connect(self, websocket: WebSocket) -> WebSocket:
+        """
+        Accept and track a new WebSocket connection.
+
+        Returns:
+            The socket to use for the connection, encoding messages as negotiated (see framing.accept)
+        """
+        websocket = await accept(websocket)
         self.active_connections.append(websocket)
         logger.info("New WebSocket connection established")
+        return websocket
     
     def disconnect(self, websocket: WebSocket):
         """Remove a disconnected WebSocket"""
@@ -162,37 +208,75 @@ class GameMessageHandler:
             self.active_connections.remove(websocket)
         logger.info(f"WebSocket connection closed for user: {username}")
     
+    async def handle_frame(self, frame: Union[str, bytes], websocket: WebSocket):
+        """
+        Decode a WebSocket frame and dispatch it to the handler of its type.
+
+        The frame is parsed and validated against the message model of its type in one
+        pass (see GameClientMessage). Frames of other types go through handle_message.
+        """
+        try:
+            message = game_client_message_adapter.validate_json(frame)
+        except ValidationError as e:
+            error_type = e.errors()[0]["type"]
+            if error_type == "json_invalid":
+                await self._send_error(websocket, "Invalid JSON")
+            elif error_type in ("union_tag_invalid", "union_tag_not_found"):
+                await self.handle_message(json.loads(frame), websocket)
+            elif error_type == "dict_type":
+                await self._send_error(websocket, "Message must be a JSON object")
+            else:
+                await websocket.send_json({
+                    "type": "ERROR",
+                    "payload": {
+                        "message": "Invalid input data",
+                        "details": e.errors(include_url=False, include_context=False, include_input=False)
+                    }
+                })
+            return
+
+        handler = self.routes.get(message.type)
+        if handler is None:
+            await self._send_error(websocket, f"Unknown message type: {message.type}")
+            return
+        try:
+            await handler.handle_decoded(message, websocket)
+        except Exception as e:
+            username = getattr(websocket.state, "username", "unknown")
+            logger.exception(f"Error in handler for message type {message.type} from user {username}")
+            await self._send_error(websocket, str(e))
+
     async def handle_message(self, message: Dict[str, Any], websocket: WebSocket):
         """Route incoming message to appropriate handler based on type"""
         message_type = message.get("type")
         username = getattr(websocket.state, "username", "unknown")
-        print(f"Handling message {message_type} from user: {username}")
+        logger.debug(f"Handling message {message_type} from user: {username}")
         
         if not message_type:
-            await websocket.send_json({
-                "type": "ERROR",
-                "payload": {"message": "Missing message type"}
-            })
+            await self._send_error(websocket, "Missing message type")
             return
-        
-        # Try each handler until one handles the message
-        for handler in self.handlers:
+
+        # Handlers declaring the type get the message directly, the others are tried in turn
+        handler = self.routes.get(message_type)
+        candidates = [handler] if handler is not None else self.fallback_handlers
+        for handler in candidates:
             try:
                 was_handled = await handler.handle(message, websocket)
                 if was_handled:
                     return
             except Exception as e:
                 logger.exception(f"Error in handler for message type {message_type} from user {username}")
-                await websocket.send_json({
-                    "type": "ERROR",
-                    "payload": {"message": str(e)}
-                })
+                await self._send_error(websocket, str(e))
                 return
         
         # If we got here, no handler processed the message
+        await self._send_error(websocket, f"Unknown message type: {message_type}")
+
+    @staticmethod
+    async def _send_error(websocket: WebSocket, message: str):
         await websocket.send_json({
             "type": "ERROR",
-            "payload": {"message": f"Unknown message type: {message_type}"}
+            "payload": {"message": message}
         })
 
 
@@ -209,21 +293,13 @@ async def game_websocket(websocket: WebSocket):
     # Create a handler with the database session for this connection
     handler = GameMessageHandler(db_session=db) # Pass db session
 
-    await handler.connect(websocket)
+    websocket = await handler.connect(websocket)
 
     try:
         while True:
-            print(f"Waiting for message from user: {getattr(websocket.state, 'username', 'unknown')}")
-            # Receive and parse JSON message
+            # Receive, decode and dispatch the next message
             data = await websocket.receive_text()
-            try:
-                message = json.loads(data)
-                await handler.handle_message(message, websocket)
-            except json.JSONDecodeError:
-                await websocket.send_json({
-                    "type": "ERROR",
-                    "payload": {"message": "Invalid JSON"}
-                })
+            await handler.handle_frame(data, websocket)
     except WebSocketDisconnect:
         handler.disconnect(websocket)
         logger.info(f"WebSocket disconnected for user: {getattr(websocket.state, 'username', 'unknown')}")
@@ -245,7 +321,7 @@ async def scene_generation_websocket(
 ):
     """WebSocket endpoint for scene generation communication."""
     logger.info(f"Initiating scene generation WS for story {story_uuid}")
-    await websocket.accept() # Accept the connection first
+    websocket = await accept(websocket) # Accept the connection first
     
     # Get database session (synchronous)
     db = next(get_db())
@@ -344,7 +420,7 @@ async def scene_generation_websocket(
 async def scene_websocket(websocket: WebSocket, scene_uuid: str, character_uuid: str):
 
     # Accept the WebSocket connection
-    await websocket.accept()
+    websocket = await accept(websocket)
 
     db = next(get_db())
 
@@ -414,7 +490,7 @@ async def scene_websocket(websocket: WebSocket, scene_uuid: str, character_uuid:
                 content="Invalid message format",
                 details=str(e)
             )
-            await websocket.send_text(error.model_dump_json())
+            await send_model(websocket, error)
             continue
 
         # Verify scene ID matches
@@ -423,22 +499,23 @@ async def scene_websocket(websocket: WebSocket, scene_uuid: str, character_uuid:
                 type="error",
                 content="Scene ID mismatch"
             )
-            await websocket.send_text(error.model_dump_json())
+            await send_model(websocket, error)
             continue
 
-        # Process the message and stream chunks back to the client
-        async for chunk in await conversation_service.process_message(
+        # Process the message and stream chunks back to the client, joining deltas into fewer frames
+        reply = await conversation_service.process_message(
             db=db,
             messages=message.messages,
             character=character,
             scene=scene
-        ):
+        )
+        async for chunk in coalesce_chunks(reply):
             chunk_message = ChatChunkMessage(
                 type="chat_chunk",
                 content=chunk
             )
-            await websocket.send_text(chunk_message.model_dump_json())
+            await send_model(websocket, chunk_message)
 
         # Signal that the response is complete
         complete_message = ChatCompleteMessage(type="chat_complete")
-        await websocket.send_text(complete_message.model_dump_json())
+        await send_model(websocket, complete_message)
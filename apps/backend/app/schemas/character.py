@@ -1,5 +1,5 @@
 from pydantic import BaseModel, ConfigDict
-from typing import Optional
+from typing import Dict, Optional
 
 class CharacterBase(BaseModel):
     name: str
@@ -12,6 +12,7 @@ class CharacterBase(BaseModel):
     speaking_style: Optional[str] = None
     relationships: Optional[str] = None
     image_dir: Optional[str] = None
+    image_variants: Optional[Dict[str, str]] = None
     image_prompt: Optional[str] = None
     relationship_level: Optional[int] = None
     uuid: str
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 class ImageGenerationRequest(BaseModel):
     prompt: str
@@ -8,4 +8,14 @@ class ImagePathsModel(BaseModel):
     base: str
 
 class ImageGenerationResponse(BaseModel):
-    imagePaths: ImagePathsModel
\ No newline at end of file
+    imagePaths: ImagePathsModel
+
+class GenerationProgressResponse(BaseModel):
+    promptId: str
+    step: int
+    totalSteps: int
+    status: str  # "queued", "running", "completed" or, for API jobs, "failed"
+    entityUuid: Optional[str] = None
+    jobId: Optional[str] = None
+    # Progress of the quick preview rendered before the final image
+    preview: bool = False
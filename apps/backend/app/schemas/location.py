@@ -1,5 +1,5 @@
 from pydantic import BaseModel, ConfigDict
-from typing import Optional
+from typing import Dict, Optional
 
 class LocationBase(BaseModel):
     name: str
@@ -9,6 +9,7 @@ class LocationBase(BaseModel):
     rules: Optional[str] = None
     colors: Optional[str] = None
     image_dir: Optional[str] = None
+    image_variants: Optional[Dict[str, str]] = None
     uuid: str
 
 class LocationCreate(LocationBase):
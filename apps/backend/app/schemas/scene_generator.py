@@ -9,6 +9,8 @@ class SceneGeneratorState(BaseModel):
     player: Character
     characters_pool: List[Character]  # All available characters
     locations_pool: List[Location]  # All available locations
+    reserved_characters: List[Character] = Field(default_factory=list)  # Pre-generated, not yet in the story
+    reserved_locations: List[Location] = Field(default_factory=list)  # Pre-generated, not yet in the story
     previous_scene: Optional[Scene] = None
     
     # Selected elements for the new scene
@@ -16,6 +18,7 @@ class SceneGeneratorState(BaseModel):
     selected_characters: List[Character] = Field(default_factory=list)
     
     # Output building
+    scene_outline: Optional[str] = None
     scene_description: Optional[str] = None
     
     # Memory context
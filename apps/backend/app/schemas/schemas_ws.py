@@ -1,5 +1,7 @@
-from typing import Literal, Dict, Any, Optional, Union
-from pydantic import BaseModel, Field
+from typing import Annotated, Literal, Dict, Any, Optional, Union
+from pydantic import BaseModel, Field, TypeAdapter
+
+from app.schemas import story_generation
 
 # Player Character model
 class PlayerCharacter(BaseModel):
@@ -87,4 +89,28 @@ ServerMessage = Union[
     NarrationUpdate,
     NarrationComplete,
     ErrorMessage
-] 
\ No newline at end of file
+] 
+
+# Client messages of the game WebSocket
+class AuthenticatePayload(BaseModel):
+    Authorization: str = ""
+
+class AuthenticateMessage(BaseModel):
+    type: Literal["AUTHENTICATE"]
+    payload: AuthenticatePayload = Field(default_factory=AuthenticatePayload)
+
+class InitializeGameMessage(BaseModel):
+    type: Literal["INITIALIZE_GAME"]
+    payload: story_generation.StoryGenerationInput
+
+# Union of the game WebSocket client messages, selected by their type
+GameClientMessage = Annotated[
+    Union[
+        AuthenticateMessage,
+        InitializeGameMessage
+    ],
+    Field(discriminator="type")
+]
+
+# Built once; validate_json parses a frame and validates it against the message of its type in one pass
+game_client_message_adapter: TypeAdapter[GameClientMessage] = TypeAdapter(GameClientMessage)
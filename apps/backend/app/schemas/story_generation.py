@@ -1,4 +1,4 @@
-from typing import List, Optional, Literal
+from typing import Dict, List, Optional, Literal
 from pydantic import BaseModel, ConfigDict, Field
 
 
@@ -80,6 +80,8 @@ class Character(CharacterFromLLM):
     model_config = ConfigDict(from_attributes=True)
     imageUrl: str = Field(...,
                          description="URL of the generated image for this character")
+    imageVariants: Dict[str, str] = Field(default_factory=dict,
+                                          description="Thumbnail and modern-format variants of the image by variant name")
     role: Literal["player", "npc"] = Field(
         ..., description="Character's role in the story (player or npc)")
     uuid: str = Field(
@@ -104,6 +106,8 @@ class Location(LocationFromLLM):
                                description="Location ID in the database")
     imageUrl: str = Field(...,
                          description="URL of the generated image for this location")
+    imageVariants: Dict[str, str] = Field(default_factory=dict,
+                                          description="Thumbnail and modern-format variants of the image by variant name")
     uuid: str = Field(
         ..., description="Unique identifier for the location")
 
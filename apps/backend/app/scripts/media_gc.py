@@ -0,0 +1,47 @@
+import argparse
+import os
+import sys
+
+# Add the parent directory to the path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.db.session import SessionLocal
+from app.services.image_generation.media_gc import collect_media_garbage, storage_usage
+from app.services.image_generation.media_store import MediaStore
+
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024 or unit == "GiB":
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+def media_gc(delete: bool, grace_hours: float):
+    store = MediaStore(grace_period=grace_hours * 3600)
+    db = SessionLocal()
+    try:
+        usage = storage_usage(db, store)
+        print(f"Media store {store.root}")
+        print(f"  {usage.files} files, {format_bytes(usage.bytes)}")
+        print(f"  referenced:   {usage.referenced_files} files, {format_bytes(usage.referenced_bytes)}")
+        print(f"  unreferenced: {usage.files - usage.referenced_files} files, {format_bytes(usage.unreferenced_bytes)}")
+        print(f"  legacy (not content-addressed): {usage.legacy_files} files")
+        for kind, size in sorted(usage.by_kind.items()):
+            print(f"  {kind:<8} {format_bytes(size)}")
+
+        result = collect_media_garbage(db, store, dry_run=not delete)
+        verb = "Deleted" if delete else "Would delete"
+        print(f"{verb} {result.deleted_files} files ({format_bytes(result.deleted_bytes)}), "
+              f"kept {result.recent_files} unreferenced files younger than {grace_hours:g} hours")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report the disk usage of generated images and collect orphans")
+    parser.add_argument("--delete", action="store_true", help="Delete unreferenced files instead of a dry run")
+    parser.add_argument("--grace-hours", type=float, default=24, help="Keep unreferenced files younger than this")
+    args = parser.parse_args()
+    media_gc(args.delete, args.grace_hours)
@@ -0,0 +1,162 @@
+import asyncio
+import inspect
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Tuple, Union
+
+
+@dataclass
+class DagNode:
+    """
+    A step of a generation pipeline.
+
+    func is called with the results of the nodes listed in inputs, in that order,
+    and may return a value or an awaitable.
+    """
+    name: str
+    func: Callable[..., Union[Any, Awaitable[Any]]]
+    inputs: Tuple[str, ...] = ()
+
+
+@dataclass
+class NodeTiming:
+    """When a node ran, in seconds relative to the start of the run"""
+    ready: float
+    start: float
+    end: float
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    @property
+    def queued(self) -> float:
+        """Time spent waiting for a concurrency slot after the inputs were ready"""
+        return self.start - self.ready
+
+
+@dataclass
+class DagRun:
+    """Results and timings of a DAG execution"""
+    results: Dict[str, Any]
+    timings: Dict[str, NodeTiming]
+    total: float
+    nodes: Dict[str, DagNode] = field(default_factory=dict)
+
+    @property
+    def sum_of_steps(self) -> float:
+        """Time the run would have taken with every node run in sequence"""
+        return sum(timing.duration for timing in self.timings.values())
+
+    def critical_path(self) -> Tuple[List[str], float]:
+        """The chain of dependent nodes with the longest total duration"""
+        best: Dict[str, Tuple[float, List[str]]] = {}
+        for name in _topological_order(self.nodes):
+            longest_input = max(
+                (best[input_name] for input_name in self.nodes[name].inputs),
+                key=lambda entry: entry[0],
+                default=(0.0, [])
+            )
+            best[name] = (longest_input[0] + self.timings[name].duration, longest_input[1] + [name])
+        if not best:
+            return [], 0.0
+        duration, path = max(best.values(), key=lambda entry: entry[0])
+        return path, duration
+
+    def log_summary(self, label: str) -> None:
+        path, path_duration = self.critical_path()
+        logging.info(
+            f"{label} finished in {self.total:.2f}s "
+            f"(sum of steps {self.sum_of_steps:.2f}s, critical path {path_duration:.2f}s: {' -> '.join(path)})"
+        )
+        for name, timing in sorted(self.timings.items(), key=lambda item: item[1].start):
+            logging.info(
+                f"  {name:<28} start {timing.start:7.2f}s  duration {timing.duration:7.2f}s  queued {timing.queued:5.2f}s"
+            )
+
+
+def _topological_order(nodes: Dict[str, DagNode]) -> List[str]:
+    """Order node names so every node comes after its inputs; raises on unknown inputs and cycles"""
+    order: List[str] = []
+    state: Dict[str, int] = {}  # 1 = visiting, 2 = done
+
+    def visit(name: str, path: Tuple[str, ...]) -> None:
+        if state.get(name) == 2:
+            return
+        if state.get(name) == 1:
+            raise ValueError(f"Dependency cycle: {' -> '.join(path + (name,))}")
+        state[name] = 1
+        for input_name in nodes[name].inputs:
+            if input_name not in nodes:
+                raise ValueError(f"Node {name} depends on unknown node {input_name}")
+            visit(input_name, path + (name,))
+        state[name] = 2
+        order.append(name)
+
+    for name in nodes:
+        visit(name, ())
+    return order
+
+
+class DagExecutor:
+    """
+    Runs a dependency graph of steps, starting every step as soon as its inputs are
+    available. At most max_concurrency steps run at the same time; waiting for inputs
+    does not take a slot. If a step fails, the remaining steps are cancelled and the
+    error is raised.
+    """
+
+    def __init__(self, max_concurrency: int = 4):
+        self.max_concurrency = max_concurrency
+
+    async def run(self, nodes: Sequence[DagNode]) -> DagRun:
+        """
+        Execute the nodes.
+
+        Args:
+            nodes: Steps of the graph, names must be unique
+
+        Returns:
+            The result and timing of every node
+        """
+        graph: Dict[str, DagNode] = {}
+        for node in nodes:
+            if node.name in graph:
+                raise ValueError(f"Duplicate node name: {node.name}")
+            graph[node.name] = node
+        _topological_order(graph)
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        started = time.perf_counter()
+        timings: Dict[str, NodeTiming] = {}
+        tasks: Dict[str, asyncio.Task[Any]] = {}
+
+        async def run_node(node: DagNode) -> Any:
+            args = [await tasks[input_name] for input_name in node.inputs]
+            ready = time.perf_counter() - started
+            async with semaphore:
+                start = time.perf_counter() - started
+                result = node.func(*args)
+                if inspect.isawaitable(result):
+                    result = await result
+            timings[node.name] = NodeTiming(ready=ready, start=start, end=time.perf_counter() - started)
+            return result
+
+        for name in _topological_order(graph):
+            tasks[name] = asyncio.create_task(run_node(graph[name]), name=f"dag:{name}")
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        return DagRun(
+            results={name: task.result() for name, task in tasks.items()},
+            timings=timings,
+            total=time.perf_counter() - started,
+            nodes=graph,
+        )
@@ -0,0 +1,346 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional
+
+from app.core.config import settings
+from app.schemas.story_generation import Story, Character, Location
+from app.services.llm import LLMService
+from app.services.game_engine.tools.character_generator import CharacterGenerator
+from app.services.game_engine.tools.location_generator import LocationGenerator
+from app.services.image_generation.scheduler import Priority
+
+EntityKind = Literal["character", "location"]
+
+RESERVE_CHARACTER_DESCRIPTION = (
+    "A supporting character who fits naturally into this story and could appear in many different scenes."
+)
+RESERVE_LOCATION_DESCRIPTION = (
+    "A location that fits naturally into this story and could host many different scenes."
+)
+
+
+class EntityReservoir:
+    """
+    Per-story reservoir of fully generated NPCs and locations that are not yet part of the story.
+
+    A background task keeps the reservoir filled up to the configured sizes while the story
+    has an open session and no scene is being generated for it, using the regular
+    CharacterGenerator and LocationGenerator without saving to the database. SceneGeneratorAgent can claim a reserved entity (optionally
+    renaming it) instead of generating one from scratch; the agent then saves it to the story.
+
+    Hits are claims, misses are entities the agent had to generate from scratch while a
+    reservoir was available. Entities whose image could not be generated are not reserved.
+    """
+
+    def __init__(
+        self,
+        story: Story,
+        character_generator: Optional[CharacterGenerator] = None,
+        location_generator: Optional[LocationGenerator] = None,
+        characters_size: int = settings.RESERVOIR_CHARACTERS,
+        locations_size: int = settings.RESERVOIR_LOCATIONS,
+        retry_delay: float = 30.0
+    ):
+        self.story = story
+        self.character_generator = character_generator or CharacterGenerator()
+        self.location_generator = location_generator or LocationGenerator()
+        self.sizes: Dict[EntityKind, int] = {"character": characters_size, "location": locations_size}
+        self.retry_delay = retry_delay
+
+        self.characters: List[Character] = []
+        self.locations: List[Location] = []
+        self.hits: Dict[EntityKind, int] = {"character": 0, "location": 0}
+        self.misses: Dict[EntityKind, int] = {"character": 0, "location": 0}
+        self.generated: Dict[EntityKind, int] = {"character": 0, "location": 0}
+
+        self._busy = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        # Open sessions of the story, refills only run while there is one
+        self.sessions = 0
+        self.last_used = time.monotonic()
+        self._active = asyncio.Event()
+        self._wakeup = asyncio.Event()
+        self._refill_task: Optional[asyncio.Task[None]] = None
+
+    # --- Refill --- #
+
+    def start(self) -> None:
+        """Start the background refill task if it is not running"""
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.create_task(self._refill_loop())
+        self._wakeup.set()
+
+    def open_session(self) -> None:
+        """Mark the story as played, allowing refills, and start the refill task"""
+        self.sessions += 1
+        self.last_used = time.monotonic()
+        self._active.set()
+        self.start()
+
+    def close_session(self) -> None:
+        """End a session opened with open_session, refills pause once no session is left"""
+        self.sessions = max(0, self.sessions - 1)
+        self.last_used = time.monotonic()
+        if self.sessions == 0:
+            self._active.clear()
+
+    def idle_seconds(self) -> float:
+        """Seconds since the last session ended, 0 while a session is open"""
+        return 0.0 if self.sessions else time.monotonic() - self.last_used
+
+    def cancel(self) -> None:
+        """Cancel the background refill task without waiting for it"""
+        if self._refill_task and not self._refill_task.done():
+            self._refill_task.cancel()
+        self._refill_task = None
+
+    async def stop(self) -> None:
+        """Stop the background refill task"""
+        if self._refill_task and not self._refill_task.done():
+            self._refill_task.cancel()
+            try:
+                await self._refill_task
+            except asyncio.CancelledError:
+                pass
+        self._refill_task = None
+
+    @asynccontextmanager
+    async def busy(self) -> AsyncIterator[None]:
+        """Hold off refilling while a scene is being generated for the story"""
+        self._busy += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self._busy -= 1
+            if self._busy == 0:
+                self._idle.set()
+
+    def _next_kind(self) -> Optional[EntityKind]:
+        """The entity kind that is furthest below its target size"""
+        missing_characters = self.sizes["character"] - len(self.characters)
+        missing_locations = self.sizes["location"] - len(self.locations)
+        if missing_characters <= 0 and missing_locations <= 0:
+            return None
+        return "character" if missing_characters >= missing_locations else "location"
+
+    async def _refill_loop(self) -> None:
+        while True:
+            await self._active.wait()
+            await self._idle.wait()
+            kind = self._next_kind()
+            if kind is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            try:
+                if kind == "character":
+                    await self._generate_character()
+                else:
+                    await self._generate_location()
+                self.generated[kind] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.exception(f"Failed to refill {kind} reservoir for story {self.story.uuid}: {e}")
+                await asyncio.sleep(self.retry_delay)
+
+    async def _generate_character(self) -> None:
+        taken = ", ".join(character.name for character in self.characters) or "none"
+        draft = await self.character_generator.create_character_draft_from_description(
+            f"{RESERVE_CHARACTER_DESCRIPTION} Must be different from: {taken}.", self.story
+        )
+        character = await self.character_generator.generate_character(
+            draft, self.story, is_player=False, persist=False
+        )
+        if character.imageUrl == settings.PLACEHOLDER_IMAGE_URL:
+            raise RuntimeError(f"Image generation failed for character {character.name}")
+        self.characters.append(character)
+        logging.info(f"Reserved character {character.name} for story {self.story.uuid}")
+
+    async def _generate_location(self) -> None:
+        taken = ", ".join(location.name for location in self.locations) or "none"
+        location = await self.location_generator.generate_location(
+            self.story, f"{RESERVE_LOCATION_DESCRIPTION} Must be different from: {taken}.", persist=False
+        )
+        if location.imageUrl == settings.PLACEHOLDER_IMAGE_URL:
+            raise RuntimeError(f"Image generation failed for location {location.name}")
+        self.locations.append(location)
+        logging.info(f"Reserved location {location.name} for story {self.story.uuid}")
+
+    # --- Claims --- #
+
+    def claim_character(self, character_uuid: str, name: Optional[str] = None) -> Optional[Character]:
+        """
+        Take a reserved character out of the reservoir.
+
+        Args:
+            character_uuid: UUID of the reserved character
+            name: Optional new name, replaced in the description and backstory as well
+
+        Returns:
+            The claimed character, or None if it is no longer reserved
+        """
+        character = next((c for c in self.characters if c.uuid == character_uuid), None)
+        if character is None:
+            return None
+        self.characters.remove(character)
+        if name and name != character.name:
+            character = character.model_copy(update={
+                "name": name,
+                "description": character.description.replace(character.name, name),
+                "backstory": character.backstory.replace(character.name, name),
+            })
+        self._record_hit("character")
+        return character
+
+    def claim_location(self, location_uuid: str, name: Optional[str] = None) -> Optional[Location]:
+        """
+        Take a reserved location out of the reservoir.
+
+        Args:
+            location_uuid: UUID of the reserved location
+            name: Optional new name, replaced in the description as well
+
+        Returns:
+            The claimed location, or None if it is no longer reserved
+        """
+        location = next((l for l in self.locations if l.uuid == location_uuid), None)
+        if location is None:
+            return None
+        self.locations.remove(location)
+        if name and name != location.name:
+            location = location.model_copy(update={
+                "name": name,
+                "description": location.description.replace(location.name, name),
+            })
+        self._record_hit("location")
+        return location
+
+    def record_miss(self, kind: EntityKind) -> None:
+        """Record an entity that had to be generated from scratch"""
+        self.misses[kind] += 1
+        self.log_stats()
+
+    def _record_hit(self, kind: EntityKind) -> None:
+        self.hits[kind] += 1
+        self.log_stats()
+        self._wakeup.set()
+
+    def hit_rate(self, kind: Optional[EntityKind] = None) -> Optional[float]:
+        """Share of new entities taken from the reservoir, None before any entity was needed"""
+        kinds: List[EntityKind] = [kind] if kind else ["character", "location"]
+        hits = sum(self.hits[k] for k in kinds)
+        total = hits + sum(self.misses[k] for k in kinds)
+        return hits / total if total else None
+
+    def stats(self) -> Dict[str, Any]:
+        """Reservoir content and hit-rate metrics"""
+        return {
+            "storyUuid": self.story.uuid,
+            "sessions": self.sessions,
+            "characters": len(self.characters),
+            "maxCharacters": self.sizes["character"],
+            "locations": len(self.locations),
+            "maxLocations": self.sizes["location"],
+            "hits": sum(self.hits.values()),
+            "misses": sum(self.misses.values()),
+            "generated": sum(self.generated.values()),
+            "hitRate": self.hit_rate(),
+            "characterHitRate": self.hit_rate("character"),
+            "locationHitRate": self.hit_rate("location"),
+        }
+
+    def log_stats(self) -> None:
+        """Log the reservoir content and hit rates"""
+        def rate(kind: Optional[EntityKind] = None) -> str:
+            value = self.hit_rate(kind)
+            return "n/a" if value is None else f"{value:.0%}"
+
+        logging.info(
+            f"Reservoir for story {self.story.uuid}: "
+            f"{len(self.characters)}/{self.sizes['character']} characters, "
+            f"{len(self.locations)}/{self.sizes['location']} locations, "
+            f"hit rate {rate()} (characters {rate('character')}, locations {rate('location')})"
+        )
+
+
+# Reservoirs outlive websocket connections, one per story, least recently used first
+_reservoirs: "OrderedDict[str, EntityReservoir]" = OrderedDict()
+
+
+def get_reservoir(story: Story, llm_service: Optional[LLMService] = None) -> Optional[EntityReservoir]:
+    """
+    Get the reservoir of a story, creating it on first use, and open a session on it.
+
+    The caller ends the session with close_session once its connection is closed.
+    Returns None when the reservoir is disabled in the settings or the story has no UUID.
+    """
+    if story.uuid is None or (settings.RESERVOIR_CHARACTERS <= 0 and settings.RESERVOIR_LOCATIONS <= 0):
+        return None
+    reservoir = _reservoirs.get(story.uuid)
+    if reservoir is not None:
+        _reservoirs.move_to_end(story.uuid)
+    else:
+        reservoir = EntityReservoir(
+            story,
+            # Refills are prefetching and must not delay images a player is waiting for
+            character_generator=CharacterGenerator(llm_service, image_priority=Priority.BULK),
+            location_generator=LocationGenerator(llm_service, image_priority=Priority.BULK),
+        )
+        _reservoirs[story.uuid] = reservoir
+    reservoir.open_session()
+    evict_reservoirs()
+    return reservoir
+
+
+def evict_reservoirs(
+    idle_ttl: float = settings.RESERVOIR_IDLE_TTL,
+    max_stories: int = settings.RESERVOIR_MAX_STORIES
+) -> None:
+    """
+    Drop the reservoirs of stories without a session for idle_ttl seconds, then the least
+    recently used reservoirs without a session while more than max_stories are kept.
+    """
+    for story_uuid, reservoir in list(_reservoirs.items()):
+        if not reservoir.sessions and reservoir.idle_seconds() > idle_ttl:
+            _evict(story_uuid)
+    for story_uuid, reservoir in list(_reservoirs.items()):
+        if len(_reservoirs) <= max_stories:
+            break
+        if not reservoir.sessions:
+            _evict(story_uuid)
+
+
+def _evict(story_uuid: str) -> None:
+    reservoir = _reservoirs.pop(story_uuid)
+    reservoir.cancel()
+    logging.info(
+        f"Evicted reservoir of story {story_uuid} with {len(reservoir.characters)} characters "
+        f"and {len(reservoir.locations)} locations"
+    )
+
+
+def reserved_image_urls() -> List[str]:
+    """Image URLs of the entities held by all reservoirs, which are not in the database yet"""
+    return [
+        entity.imageUrl
+        for reservoir in _reservoirs.values()
+        for entity in [*reservoir.characters, *reservoir.locations]
+    ]
+
+
+def reservoir_stats() -> List[Dict[str, Any]]:
+    """Metrics of the reservoirs of all stories, most recently used last"""
+    return [reservoir.stats() for reservoir in _reservoirs.values()]
+
+
+async def shutdown_reservoirs() -> None:
+    """Stop all refill tasks"""
+    for reservoir in list(_reservoirs.values()):
+        await reservoir.stop()
+    _reservoirs.clear()
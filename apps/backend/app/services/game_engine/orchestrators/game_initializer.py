@@ -1,9 +1,10 @@
-from typing import Optional, Callable, Awaitable
+from typing import Optional, Callable, Awaitable, List
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 from app.services.game_engine.tools.story_generator import StoryGenerator
 from app.services.game_engine.tools.character_generator import CharacterGenerator
+from app.services.game_engine.orchestrators.dag_executor import DagExecutor, DagNode
 from app.schemas.story_generation import (
     StoryGenerationInput,
     Story,
@@ -45,16 +46,22 @@ class GameInitializer:
     
     This approach enables a more dynamic, player-driven experience where the story
     expands organically in response to player choices.
+
+    The generation steps of both generators are run as one dependency graph, so steps
+    that do not depend on each other (e.g. the story rules and the player image) overlap
+    and initialization takes the time of the critical path.
     """
     def __init__(
         self,
         story_generator: Optional[StoryGenerator] = None,
         character_generator: Optional[CharacterGenerator] = None,
-        db_session: Optional[Session] = None
+        db_session: Optional[Session] = None,
+        max_concurrency: int = 4
     ):
         self.story_generator = story_generator or StoryGenerator(db_session=db_session)
         self.character_generator = character_generator or CharacterGenerator(db_session=db_session)
         self.db_session = db_session
+        self.executor = DagExecutor(max_concurrency=max_concurrency)
     
     async def initialize_game(
         self, 
@@ -76,26 +83,29 @@ class GameInitializer:
         Returns:
             InitialGameState with generated story and player character
         """
-        # 1. Generate the story first
-        story = await self.story_generator.generate_story(user_id, user_input.story)
-        
-        # Call the callback if provided
+        nodes: List[DagNode] = [
+            *self.story_generator.story_steps(user_id, user_input.story),
+            *self.character_generator.character_steps(
+                user_input.playerCharacter, is_player=True, name="player_character"
+            ),
+        ]
+
+        # Notify as soon as each part is ready, without holding back the rest of the graph
         if on_story_generated:
-            await on_story_generated(story)
-        
-        # 2. Generate the player character within the context of the story
-        player_character = await self.character_generator.generate_character(
-            user_input.playerCharacter,
-            story,
-            is_player=True
-        )
-        
-        # Call the callback if provided
+            nodes.append(DagNode("on_story_generated", on_story_generated, ("story",)))
         if on_character_generated:
-            await on_character_generated(player_character)
-        
-        # 3. Return the initial game state
+            # Clients expect the story before the character
+            after_story = ("on_story_generated",) if on_story_generated else ()
+            nodes.append(DagNode(
+                "on_character_generated",
+                lambda character, *_: on_character_generated(character),
+                ("player_character", *after_story)
+            ))
+
+        run = await self.executor.run(nodes)
+        run.log_summary("Game initialization")
+
         return InitialGameState(
-            story=story,
-            playerCharacter=player_character
-        ) 
\ No newline at end of file
+            story=run.results["story"],
+            playerCharacter=run.results["player_character"]
+        )
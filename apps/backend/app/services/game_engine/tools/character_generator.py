@@ -1,6 +1,9 @@
+import asyncio
+import json
 import logging
 import uuid
-from typing import Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+from pydantic import ValidationError
 from app.services.llm import LLMService, ModelName
 from app.schemas.story_generation import (
     CharacterFromLLM,
@@ -16,13 +19,29 @@ from app.prompts import (
     CHARACTER_IMAGE_PROMPT_SYSTEM_PROMPT,
     CHARACTER_IMAGE_PROMPT_USER_TEMPLATE,
     CREATE_CHARACTER_DRAFT_SYSTEM_PROMPT,
-    CREATE_CHARACTER_DRAFT_USER_PROMPT_TEMPLATE
+    CREATE_CHARACTER_DRAFT_USER_PROMPT_TEMPLATE,
+    CREATE_CHARACTERS_BATCH_SYSTEM_PROMPT,
+    CREATE_CHARACTERS_BATCH_USER_PROMPT_TEMPLATE
 )
 from app.utils.json_service import JSONService
-from app.services.image_generation.comfyui_service import ComfyUIService
+from app.services.image_generation.comfyui_service import ComfyUIService, ImagePreviewCallback
+from app.services.image_generation.image_batch import ImageBatch
+from app.services.image_generation.image_variants import get_image_variants
+from app.services.image_generation.scheduler import Priority
 from app.core.config import settings
 from sqlalchemy.orm import Session
 from app.models.character import Character as CharacterModel
+from app.crud import characters as characters_crud
+from app.services.game_engine.tools.deferred_images import (
+    DeferredImageTasks,
+    ImageProgressCallback,
+    ImageReadyCallback,
+    deferred_image_url,
+    entity_preview,
+    entity_progress
+)
+from app.db.unit_of_work import UnitOfWork
+from app.services.game_engine.orchestrators.dag_executor import DagNode
 from langfuse.decorators import observe  # type: ignore
 
 class CharacterGenerator:
@@ -30,9 +49,32 @@ class CharacterGenerator:
     Service for generating characters.        
     """
 
-    def __init__(self, llm_service: Optional[LLMService] = None, db_session: Optional[Session] = None):
+    def __init__(
+        self,
+        llm_service: Optional[LLMService] = None,
+        db_session: Optional[Session] = None,
+        unit_of_work: Optional[UnitOfWork] = None,
+        on_image_progress: Optional[ImageProgressCallback] = None,
+        image_priority: Priority = Priority.INTERACTIVE,
+        image_batch: Optional[ImageBatch] = None,
+        on_image_preview: Optional[ImageReadyCallback] = None,
+        image_profile: Optional[str] = None
+    ):
         self.llm_service = llm_service or LLMService()
         self.db_session = db_session
+        # When set, new characters are collected and written by the owner of the unit of work
+        self.unit_of_work = unit_of_work
+        self.deferred_images = DeferredImageTasks()
+        # Receives the ComfyUI progress of every image, tagged with the entity UUID
+        self.on_image_progress = on_image_progress
+        # Scheduler priority of images a caller waits for, deferred images are at most BACKGROUND
+        self.image_priority = image_priority
+        # When set, deferred images join this batch instead of being queued one by one
+        self.image_batch = image_batch
+        # Receives (entity UUID, provisional image URL) of deferred images while the final image renders
+        self.on_image_preview = on_image_preview
+        # Generation profile of the images, None for the default of the context
+        self.image_profile = image_profile
 
     async def create_character_draft_from_description(
         self,
@@ -107,7 +149,14 @@ class CharacterGenerator:
             character_draft, story, is_player)
 
     @observe(name="generate_character")
-    async def generate_character(self, character_draft: CharacterDraft, story: Story, is_player: bool) -> Character:
+    async def generate_character(
+        self,
+        character_draft: Union[CharacterDraft, dict],
+        story: Story,
+        is_player: bool,
+        on_image_ready: Optional[ImageReadyCallback] = None,
+        persist: bool = True
+    ) -> Character:
         """
         Orchestrates the entire character generation process.
 
@@ -115,6 +164,11 @@ class CharacterGenerator:
             character_draft: Character draft to be used for character generation
             story: Story object containing description and other details
             is_player: Whether this character is the player character
+            on_image_ready: If given, the character is returned with a placeholder image as soon
+                as its text is ready, and the callback is called with the character UUID and the
+                image URL once the image has been generated in the background
+            persist: Whether to save the character to the database; unsaved characters can be
+                saved later with save_character
 
         Returns:
             Fully generated Character object with description and image prompt
@@ -125,31 +179,198 @@ class CharacterGenerator:
         # 2. Generate detailed character description
         character_description = await self._describe_character(character_draft, story, character_uuid)
         
-        # 3. Create character JSON from description
-        character_from_llm = await self._create_character_json(character_description, character_uuid)
-        
-        # 4. Generate image prompt for the character
-        image_prompt = await self._generate_image_prompt(character_from_llm, story.description, character_uuid)
+        # 3. Create character JSON and the image prompt, both only depend on the description
+        draft_name = character_draft["name"] if isinstance(character_draft, dict) else character_draft.name
+        character_from_llm, image_prompt = await asyncio.gather(
+            self._create_character_json(character_description, character_uuid),
+            self._generate_image_prompt(draft_name, character_description, story.description, character_uuid)
+        )
         
-        # 5. Generate image for the character
-        image_url = await self._generate_image(image_prompt)
+        # 4. Generate the image, save and return the character
+        return await self._complete_character(
+            character_from_llm, image_prompt, story, is_player, character_uuid, on_image_ready, persist
+        )
+
+    def character_steps(
+        self,
+        character_draft: CharacterDraft,
+        is_player: bool,
+        name: str = "character",
+        story_node: str = "story",
+        story_description_node: str = "story_description"
+    ) -> List[DagNode]:
+        """
+        The steps of generate_character as nodes of a dependency graph.
+
+        The image prompt is written from the draft instead of the generated description, so
+        the image prompt and the image only wait for the story description while the
+        description and profile wait for the complete story.
+
+        Args:
+            character_draft: Character draft to be used for character generation
+            is_player: Whether this character is the player character
+            name: Name of the node producing the saved Character, also used as prefix of the
+                intermediate nodes
+            story_node: Node producing the Story
+            story_description_node: Node producing the story description
+
+        Returns:
+            Nodes to be run by a DagExecutor together with the nodes they depend on
+        """
+        character_uuid = str(uuid.uuid4())
+        draft_summary = f"{character_draft.appearance}\n{character_draft.background}"
+
+        return [
+            DagNode(
+                f"{name}_description",
+                lambda story: self._describe_character(character_draft, story, character_uuid),
+                (story_node,)
+            ),
+            DagNode(
+                f"{name}_json",
+                lambda description: self._create_character_json(description, character_uuid),
+                (f"{name}_description",)
+            ),
+            DagNode(
+                f"{name}_image_prompt",
+                lambda story_description: self._generate_image_prompt(
+                    character_draft.name, draft_summary, story_description, character_uuid
+                ),
+                (story_description_node,)
+            ),
+            DagNode(
+                f"{name}_image",
+                lambda image_prompt: self._generate_image(image_prompt, character_uuid),
+                (f"{name}_image_prompt",)
+            ),
+            DagNode(
+                name,
+                lambda story, character_from_llm, image_prompt, image_url: self._complete_character(
+                    character_from_llm, image_prompt, story, is_player, character_uuid,
+                    on_image_ready=None, persist=True, image_url=image_url
+                ),
+                (story_node, f"{name}_json", f"{name}_image_prompt", f"{name}_image")
+            ),
+        ]
+
+    @observe(name="generate_characters")
+    async def generate_characters(
+        self,
+        character_drafts: List[Union[CharacterDraft, dict]],
+        story: Story,
+        is_player: bool = False,
+        on_image_ready: Optional[ImageReadyCallback] = None,
+        persist: bool = True
+    ) -> List[Character]:
+        """
+        Generate several characters with a single LLM call for their descriptions and profiles.
+
+        Image prompts and images are generated concurrently for all characters. Entries of the
+        batch response that fail validation are regenerated one by one with generate_character.
 
-        # 6. Create complete Character object with UUID
+        Args:
+            character_drafts: Character drafts to be used for character generation
+            story: Story object containing description and other details
+            is_player: Whether these characters are player characters
+            on_image_ready: Same as for generate_character, called once per character
+            persist: Whether to save the characters to the database
+
+        Returns:
+            The generated characters, in the order of the drafts
+        """
+        if not character_drafts:
+            return []
+
+        character_uuids = [str(uuid.uuid4()) for _ in character_drafts]
+        profiles = await self._create_characters_json(character_drafts, story, character_uuids)
+
+        async def complete(index: int) -> Character:
+            character_from_llm = profiles[index]
+            if character_from_llm is None:
+                logging.warning(f"Regenerating character {index} of the batch on its own")
+                return await self.generate_character(
+                    character_drafts[index], story, is_player, on_image_ready, persist
+                )
+            image_prompt = await self._generate_image_prompt(
+                character_from_llm.name, character_from_llm.description, story.description, character_uuids[index]
+            )
+            return await self._complete_character(
+                character_from_llm, image_prompt, story, is_player, character_uuids[index], on_image_ready, persist
+            )
+
+        return list(await asyncio.gather(*(complete(index) for index in range(len(character_drafts)))))
+
+    async def _complete_character(
+        self,
+        character_from_llm: CharacterFromLLM,
+        image_prompt: str,
+        story: Story,
+        is_player: bool,
+        character_uuid: str,
+        on_image_ready: Optional[ImageReadyCallback],
+        persist: bool,
+        image_url: Optional[str] = None
+    ) -> Character:
+        """Generate (or schedule) the image of a character profile, save it and return the Character"""
+        # Generate image for the character, unless it was already generated or is delivered later
+        if image_url is None:
+            if on_image_ready is None:
+                image_url = await self._generate_image(image_prompt, character_uuid)
+            else:
+                image_url = settings.PLACEHOLDER_IMAGE_URL
+
+        # Create complete Character object with UUID
         character = Character(
             **character_from_llm.model_dump(),
             imageUrl=image_url,
+            imageVariants=get_image_variants().urls(image_url),
             role="player" if is_player else "npc",
             uuid=character_uuid
         )
         
-        # 7. Save to database as a side effect
-        if story.id is not None:
+        # Save to database as a side effect
+        if not persist:
+            logging.debug(f"Character {character.name} generated without saving to the database")
+        elif story.id is not None:
             await self._save_character_to_db(character, story.id, image_prompt)
         else:
             logging.warning("Story ID is None, skipping database save")
+
+        # Generate the image in the background
+        if on_image_ready is not None:
+            self.deferred_images.schedule(
+                character_uuid,
+                self._deferred_image(image_prompt, character_uuid),
+                lambda url: self._update_character_image(character_uuid, url),
+                on_image_ready
+            )
         
-        # 8. Return the Pydantic Character object
+        # Return the Pydantic Character object
         return character
+
+    async def save_character(self, character: Character, story_id: int, image_prompt: str = "") -> CharacterModel:
+        """
+        Save a character that was generated with persist=False.
+
+        Args:
+            character: The generated character
+            story_id: ID of the story to associate with
+            image_prompt: The image prompt used to generate the character image, if known
+
+        Returns:
+            The saved database model
+        """
+        return await self._save_character_to_db(character, story_id, image_prompt)
+
+    def _update_character_image(self, character_uuid: str, image_url: str) -> None:
+        """Store the final image URL and its variants of a character generated with a placeholder"""
+        image_variants = get_image_variants().urls(image_url)
+        pending = self.unit_of_work.get(character_uuid) if self.unit_of_work is not None else None
+        if pending is not None:
+            pending.image_dir = image_url
+            pending.image_variants = image_variants or None
+        elif self.db_session is not None:
+            characters_crud.update_character_image(self.db_session, character_uuid, image_url, image_variants)
          
         
     async def _save_character_to_db(self, character: Character, story_id: int, image_prompt: str) -> CharacterModel:
@@ -174,7 +395,6 @@ class CharacterGenerator:
             relationships_str = ""
             if hasattr(character, 'relationships') and character.relationships:
                 # Convert relationships to JSON string
-                import json
                 try:
                     relationships_str = json.dumps(character.relationships)
                 except Exception as e:
@@ -192,12 +412,19 @@ class CharacterGenerator:
                 speaking_style="", # Not in schema, add if needed
                 relationships=relationships_str,
                 image_dir=character.imageUrl,
+                image_variants=character.imageVariants or None,
                 image_prompt=image_prompt,
                 relationship_level=0,  # Default starting level
                 story_id=story_id,
                 uuid=character.uuid  # Use the UUID from character object
             )
             
+            # Defer the insert to the unit of work if there is one
+            if self.unit_of_work is not None:
+                self.unit_of_work.add(db_character)
+                logging.info(f"Character {character.name} added to the unit of work")
+                return db_character
+
             # Add to database session if available
             if self.db_session is not None:
                 self.db_session.add(db_character)
@@ -250,30 +477,70 @@ class CharacterGenerator:
 
         return await self.llm_service.extract_content(response)
 
+    def _deferred_image(self, image_prompt: str, character_uuid: str) -> Callable[[], Awaitable[str]]:
+        """
+        Generation of a deferred image, added to the image batch right away if there is one.
+        """
+        on_preview = entity_preview(self.on_image_preview, character_uuid)
+        if self.image_batch is None:
+            priority = max(self.image_priority, Priority.BACKGROUND)
+            return lambda: deferred_image_url(
+                self._generate_image_result(image_prompt, character_uuid, priority, on_preview)
+            )
+        batched = self.image_batch.add(
+            image_prompt, "character", entity_progress(self.on_image_progress, character_uuid), on_preview, self.image_profile
+        )
+        return lambda: deferred_image_url(batched)
+
+    async def _generate_image(
+        self,
+        image_prompt: str,
+        character_uuid: Optional[str] = None,
+        priority: Optional[Priority] = None,
+        on_preview: Optional[ImagePreviewCallback] = None
+    ) -> str:
+        """
+        Generate an image for a character, the placeholder image if the generation failed.
+        """
+        result_dict = await self._generate_image_result(image_prompt, character_uuid, priority, on_preview)
+        if not result_dict.get("success") or not result_dict.get("imagePath"):
+            logging.error(
+                f"Image generation failed for character {character_uuid}: {result_dict.get('error')}"
+            )
+            return settings.PLACEHOLDER_IMAGE_URL
+        return f"{settings.BACKEND_URL}{result_dict['imagePath']}"
+
     @observe(name="generate_image")
-    async def _generate_image(self, image_prompt: str) -> str:
+    async def _generate_image_result(
+        self,
+        image_prompt: str,
+        character_uuid: Optional[str] = None,
+        priority: Optional[Priority] = None,
+        on_preview: Optional[ImagePreviewCallback] = None
+    ) -> Dict[str, Any]:
         """
-        Generate an image for a character.
+        Generate an image for a character, returning the result dictionary of ComfyUIService.generate_image.
         """
-        import asyncio
-        
         comfyui_service = ComfyUIService()
         logging.info(f"Generating image for prompt: {image_prompt}")
         
-        # Run the synchronous generate_image method in a thread pool
-        loop = asyncio.get_event_loop()
-        result_dict = await loop.run_in_executor(
-            None, 
-            lambda: comfyui_service.generate_image(image_prompt, "character")
+        result_dict = await comfyui_service.generate_image(
+            image_prompt,
+            "character",
+            on_progress=entity_progress(self.on_image_progress, character_uuid),
+            priority=self.image_priority if priority is None else priority,
+            on_preview=on_preview,
+            profile=self.image_profile
         )
         
         logging.info(f"Generated image: {result_dict}")
-        return f"{settings.BACKEND_URL}{result_dict['imagePath']}"
+        return result_dict
 
     @observe(name="generate_image_prompt")
     async def _generate_image_prompt(
         self,
-        character: CharacterFromLLM,
+        character_name: str,
+        character_description: str,
         story_description: str,
         character_uuid: str
     ) -> str:
@@ -281,15 +548,16 @@ class CharacterGenerator:
         Generate a detailed image prompt for a character.
 
         Args:
-            character: The detailed character to generate an image prompt for
+            character_name: Name of the character
+            character_description: Detailed narrative description of the character
             story_description: The story description for context
 
         Returns:
             A detailed image prompt for the character
         """
         user_prompt = CHARACTER_IMAGE_PROMPT_USER_TEMPLATE.format(
-            character_name=character.name,
-            character_description=character.description,
+            character_name=character_name,
+            character_description=character_description,
             story_description=story_description
         )
 
@@ -310,6 +578,81 @@ class CharacterGenerator:
 
         return await self.llm_service.extract_content(response)
 
+    @observe(name="create_characters_json")
+    async def _create_characters_json(
+        self,
+        character_drafts: List[Union[CharacterDraft, dict]],
+        story: Story,
+        character_uuids: List[str]
+    ) -> List[Optional[CharacterFromLLM]]:
+        """
+        Describe and structure several characters with one LLM call.
+
+        Args:
+            character_drafts: Character drafts to be used for character generation
+            story: Story object containing description and other details
+            character_uuids: UUIDs of the characters, in the order of the drafts
+
+        Returns:
+            One profile per draft, None for entries that are missing or fail validation
+        """
+        drafts = [draft if isinstance(draft, dict) else draft.model_dump() for draft in character_drafts]
+        user_prompt = CREATE_CHARACTERS_BATCH_USER_PROMPT_TEMPLATE.format(
+            story_description=story.description,
+            story_rules=story.rules,
+            character_drafts=json.dumps(drafts, indent=2)
+        )
+
+        messages = [
+            self.llm_service.create_message("system", CREATE_CHARACTERS_BATCH_SYSTEM_PROMPT),
+            self.llm_service.create_message("user", user_prompt)
+        ]
+
+        response = await self.llm_service.generate_completion(
+            messages=messages,
+            model=ModelName.GPT41_MINI,
+            temperature=0.7,
+            stream=False,
+            metadata={
+                "character_uuids": ",".join(character_uuids)
+            }
+        )
+
+        response_text = await self.llm_service.extract_content(response)
+
+        try:
+            characters: List[Optional[CharacterFromLLM]] = list(
+                JSONService.parse_and_validate_json_list(response_text, CharacterFromLLM)
+            )
+        except ValueError as e:
+            logging.warning(f"Batch character response failed validation, validating entries one by one: {e}")
+            characters = self._validate_character_entries(response_text)
+
+        # Missing entries are regenerated, extra entries are dropped
+        characters = characters[:len(drafts)]
+        characters += [None] * (len(drafts) - len(characters))
+        return characters
+
+    @staticmethod
+    def _validate_character_entries(response_text: str) -> List[Optional[CharacterFromLLM]]:
+        """Validate the entries of a batch response individually, None for invalid ones"""
+        try:
+            data = JSONService.parse_json_response(response_text)
+        except ValueError as e:
+            logging.warning(f"Batch character response is not valid JSON: {e}")
+            return []
+        if not isinstance(data, list):
+            return []
+
+        characters: List[Optional[CharacterFromLLM]] = []
+        for index, item in enumerate(data):
+            try:
+                characters.append(CharacterFromLLM.model_validate(item))
+            except ValidationError as e:
+                logging.warning(f"Batch character entry {index} failed validation: {e}")
+                characters.append(None)
+        return characters
+
     @observe(name="create_character_json")
     async def _create_character_json(
         self,
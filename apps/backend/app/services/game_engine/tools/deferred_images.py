@@ -0,0 +1,128 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Coroutine, Dict, Optional, Set
+
+from app.core.config import settings
+from app.schemas.comfyui import GenerationProgressResponse
+
+# Called with (entity uuid, image url) once the image of an entity is ready
+ImageReadyCallback = Callable[[str, str], Coroutine[Any, Any, None]]
+# Called with the progress of the image generation of an entity
+ImageProgressCallback = Callable[[GenerationProgressResponse], Coroutine[Any, Any, None]]
+
+
+def entity_progress(
+    on_progress: Optional[ImageProgressCallback], entity_uuid: Optional[str]
+) -> Optional[ImageProgressCallback]:
+    """Tag the progress events of an image generation with the entity it belongs to"""
+    if on_progress is None or entity_uuid is None:
+        return on_progress
+
+    async def report(progress: GenerationProgressResponse) -> None:
+        await on_progress(progress.model_copy(update={"entityUuid": entity_uuid}))
+
+    return report
+
+
+def entity_preview(
+    on_preview: Optional[ImageReadyCallback], entity_uuid: str
+) -> Optional[Callable[[Dict[str, Any]], Awaitable[None]]]:
+    """Pass the preview of an entity's image on as (entity uuid, provisional image url)"""
+    if on_preview is None:
+        return None
+
+    async def report(result: Dict[str, Any]) -> None:
+        await on_preview(entity_uuid, f"{settings.BACKEND_URL}{result['imagePath']}")
+
+    return report
+
+
+async def deferred_image_url(result: Awaitable[Dict[str, Any]]) -> str:
+    """
+    URL of a deferred image from the result dictionary of ComfyUIService.generate_image.
+
+    Raises:
+        RuntimeError: The generation failed, so DeferredImageTasks keeps the placeholder
+    """
+    result_dict = await result
+    if not result_dict.get("success") or not result_dict.get("imagePath"):
+        raise RuntimeError(result_dict.get("error") or "Image generation failed")
+    return f"{settings.BACKEND_URL}{result_dict['imagePath']}"
+
+
+class DeferredImageTasks:
+    """
+    Tracks image generations that run in the background after an entity was returned
+    with a placeholder image.
+
+    Each task generates the image, persists the final URL and notifies the caller
+    through an ImageReadyCallback. Failures are logged and leave the placeholder in place.
+    """
+
+    def __init__(self):
+        self._tasks: Set[asyncio.Task[None]] = set()
+
+    @property
+    def pending(self) -> int:
+        """Number of image generations still running"""
+        return len(self._tasks)
+
+    def schedule(
+        self,
+        entity_uuid: str,
+        generate: Callable[[], Awaitable[str]],
+        persist: Callable[[str], None],
+        on_image_ready: ImageReadyCallback
+    ) -> asyncio.Task[None]:
+        """
+        Start generating an image in the background.
+
+        Args:
+            entity_uuid: UUID of the entity the image belongs to
+            generate: Coroutine factory returning the final image URL
+            persist: Stores the final image URL (e.g. in the database)
+            on_image_ready: Async callback notified with the entity UUID and image URL
+
+        Returns:
+            The background task
+        """
+        task = asyncio.create_task(self._run(entity_uuid, generate, persist, on_image_ready))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def wait(self, timeout: Optional[float] = None) -> None:
+        """Wait until all pending image generations have finished"""
+        if self._tasks:
+            await asyncio.wait(set(self._tasks), timeout=timeout)
+
+    def cancel(self) -> None:
+        """Cancel all pending image generations"""
+        for task in list(self._tasks):
+            task.cancel()
+
+    @staticmethod
+    async def _run(
+        entity_uuid: str,
+        generate: Callable[[], Awaitable[str]],
+        persist: Callable[[str], None],
+        on_image_ready: ImageReadyCallback
+    ) -> None:
+        try:
+            image_url = await generate()
+        except asyncio.CancelledError:
+            logging.info(f"Image generation for {entity_uuid} was cancelled")
+            raise
+        except Exception as e:
+            logging.exception(f"Deferred image generation failed for {entity_uuid}: {e}")
+            return
+
+        try:
+            persist(image_url)
+        except Exception as e:
+            logging.exception(f"Failed to store image URL for {entity_uuid}: {e}")
+
+        try:
+            await on_image_ready(entity_uuid, image_url)
+        except Exception as e:
+            logging.error(f"Error executing on_image_ready callback for {entity_uuid}: {e}")
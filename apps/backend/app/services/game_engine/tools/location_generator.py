@@ -1,6 +1,7 @@
+import asyncio
 import logging
 import uuid
-from typing import Optional
+from typing import Any, Awaitable, Callable, Dict, Optional
 from sqlalchemy.orm import Session
 from app.services.llm import LLMService, ModelName
 from app.schemas.story_generation import (
@@ -17,27 +18,74 @@ from app.prompts.location_generator import (
     CREATE_LOCATION_JSON_USER_PROMPT_TEMPLATE,
 )
 from app.utils.json_service import JSONService
-from app.services.image_generation.comfyui_service import ComfyUIService
+from app.services.image_generation.comfyui_service import ComfyUIService, ImagePreviewCallback
+from app.services.image_generation.image_batch import ImageBatch
+from app.services.image_generation.image_variants import get_image_variants
+from app.services.image_generation.scheduler import Priority
 from app.core.config import settings
 from sqlalchemy.orm import Session
 from app.models.location import Location as LocationModel
+from app.crud import locations as locations_crud
+from app.services.game_engine.tools.deferred_images import (
+    DeferredImageTasks,
+    ImageProgressCallback,
+    ImageReadyCallback,
+    deferred_image_url,
+    entity_preview,
+    entity_progress
+)
+from app.db.unit_of_work import UnitOfWork
 from langfuse.decorators import observe  # type: ignore
 class LocationGenerator:
     """
     Service for generating locations.
     """
-    def __init__(self, llm_service: Optional[LLMService] = None, db_session: Optional[Session] = None):
+    def __init__(
+        self,
+        llm_service: Optional[LLMService] = None,
+        db_session: Optional[Session] = None,
+        unit_of_work: Optional[UnitOfWork] = None,
+        on_image_progress: Optional[ImageProgressCallback] = None,
+        image_priority: Priority = Priority.INTERACTIVE,
+        image_batch: Optional[ImageBatch] = None,
+        on_image_preview: Optional[ImageReadyCallback] = None,
+        image_profile: Optional[str] = None
+    ):
         self.llm_service = llm_service or LLMService()
         self.db_session = db_session
+        # When set, new locations are collected and written by the owner of the unit of work
+        self.unit_of_work = unit_of_work
+        self.deferred_images = DeferredImageTasks()
+        # Receives the ComfyUI progress of every image, tagged with the entity UUID
+        self.on_image_progress = on_image_progress
+        # Scheduler priority of images a caller waits for, deferred images are at most BACKGROUND
+        self.image_priority = image_priority
+        # When set, deferred images join this batch instead of being queued one by one
+        self.image_batch = image_batch
+        # Receives (entity UUID, provisional image URL) of deferred images while the final image renders
+        self.on_image_preview = on_image_preview
+        # Generation profile of the images, None for the default of the context
+        self.image_profile = image_profile
 
     @observe(name="generate_location")
-    async def generate_location(self, story: Story, description: str) -> Location:
+    async def generate_location(
+        self,
+        story: Story,
+        description: str,
+        on_image_ready: Optional[ImageReadyCallback] = None,
+        persist: bool = True
+    ) -> Location:
         """
         Generate a complete location.
 
         Args:
             story: Story object containing description and other details
             description: Optional description to guide location generation
+            on_image_ready: If given, the location is returned with a placeholder image as soon
+                as its text is ready, and the callback is called with the location UUID and the
+                image URL once the image has been generated in the background
+            persist: Whether to save the location to the database; unsaved locations can be
+                saved later with save_location
 
         Returns:
             Location object containing location details and image URL
@@ -48,31 +96,71 @@ class LocationGenerator:
         # 2. Generate detailed location description
         location_description = await self._describe_location(story, description, location_uuid)
         
-        # 3. Create location JSON from description
-        location_from_llm = await self._create_location_json(location_description, location_uuid)
-
-        # 4. Generate image prompt for the location
-        image_prompt = await self._generate_image_prompt(location_from_llm, story.description, location_uuid)
+        # 3. Create location JSON and the image prompt, both only depend on the description.
+        # The name is not known before the JSON is parsed, so the guiding description labels the image prompt
+        location_from_llm, image_prompt = await asyncio.gather(
+            self._create_location_json(location_description, location_uuid),
+            self._generate_image_prompt(description, location_description, story.description, location_uuid)
+        )
 
-        # 5. Generate image for the location
-        image_url = await self._generate_image(image_prompt)
+        # 4. Generate image for the location, unless it is delivered later
+        if on_image_ready is None:
+            image_url = await self._generate_image(image_prompt, location_uuid)
+        else:
+            image_url = settings.PLACEHOLDER_IMAGE_URL
         
-        # 6. Create the final location with image URL and UUID
+        # 5. Create the final location with image URL and UUID
         location = Location(
             **location_from_llm.model_dump(),
             imageUrl=image_url,
+            imageVariants=get_image_variants().urls(image_url),
             uuid=location_uuid
         )
         
-        # 7. Save to database as a side effect
-        if story.id is not None and self.db_session is not None:
+        # 6. Save to database as a side effect
+        if not persist:
+            logging.debug(f"Location {location.name} generated without saving to the database")
+        elif story.id is not None and self.db_session is not None:
             await self._save_location_to_db(location, story.id, image_prompt)
         else:
             logging.warning("Story ID is None or no database session, skipping database save")
+
+        # 7. Generate the image in the background
+        if on_image_ready is not None:
+            self.deferred_images.schedule(
+                location_uuid,
+                self._deferred_image(image_prompt, location_uuid),
+                lambda url: self._update_location_image(location_uuid, url),
+                on_image_ready
+            )
         
         # 8. Return the Pydantic Location object
         return location
 
+    async def save_location(self, location: Location, story_id: int, image_prompt: str = "") -> LocationModel:
+        """
+        Save a location that was generated with persist=False.
+
+        Args:
+            location: The generated location, its id is set once saved
+            story_id: ID of the story to associate with
+            image_prompt: The image prompt used to generate the location image, if known
+
+        Returns:
+            The saved database model
+        """
+        return await self._save_location_to_db(location, story_id, image_prompt)
+
+    def _update_location_image(self, location_uuid: str, image_url: str) -> None:
+        """Store the final image URL and its variants of a location generated with a placeholder"""
+        image_variants = get_image_variants().urls(image_url)
+        pending = self.unit_of_work.get(location_uuid) if self.unit_of_work is not None else None
+        if pending is not None:
+            pending.image_dir = image_url
+            pending.image_variants = image_variants or None
+        elif self.db_session is not None:
+            locations_crud.update_location_image(self.db_session, location_uuid, image_url, image_variants)
+
     
     @observe(name="describe_location")
     async def _describe_location(self, story: Story, description: str, location_uuid: str) -> str:
@@ -109,7 +197,8 @@ class LocationGenerator:
     @observe(name="generate_image_prompt")
     async def _generate_image_prompt(
         self,
-        location: LocationFromLLM,
+        location_name: str,
+        location_description: str,
         story_description: str,
         location_uuid: str
     ) -> str:
@@ -117,7 +206,8 @@ class LocationGenerator:
         Generate a detailed image prompt for a location.
 
         Args:
-            location: The detailed location to generate an image prompt for
+            location_name: Name or short label of the location
+            location_description: Detailed narrative description of the location
             story_description: The story description for context
             location_uuid: Unique identifier for the location
 
@@ -125,8 +215,8 @@ class LocationGenerator:
             A detailed image prompt for the location
         """
         user_prompt = LOCATION_IMAGE_PROMPT_USER_TEMPLATE.format(
-            location_name=location.name,
-            location_description=location.description,
+            location_name=location_name,
+            location_description=location_description,
             story_description=story_description
         )
 
@@ -148,25 +238,64 @@ class LocationGenerator:
 
         return await self.llm_service.extract_content(response)
 
+    def _deferred_image(self, image_prompt: str, location_uuid: str) -> Callable[[], Awaitable[str]]:
+        """
+        Generation of a deferred image, added to the image batch right away if there is one.
+        """
+        on_preview = entity_preview(self.on_image_preview, location_uuid)
+        if self.image_batch is None:
+            priority = max(self.image_priority, Priority.BACKGROUND)
+            return lambda: deferred_image_url(
+                self._generate_image_result(image_prompt, location_uuid, priority, on_preview)
+            )
+        batched = self.image_batch.add(
+            image_prompt, "location", entity_progress(self.on_image_progress, location_uuid), on_preview, self.image_profile
+        )
+        return lambda: deferred_image_url(batched)
+
+    async def _generate_image(
+        self,
+        image_prompt: str,
+        location_uuid: Optional[str] = None,
+        priority: Optional[Priority] = None,
+        on_preview: Optional[ImagePreviewCallback] = None
+    ) -> str:
+        """
+        Generate an image for a location, the placeholder image if the generation failed.
+        """
+        result_dict = await self._generate_image_result(image_prompt, location_uuid, priority, on_preview)
+        if not result_dict.get("success") or not result_dict.get("imagePath"):
+            logging.error(
+                f"Image generation failed for location {location_uuid}: {result_dict.get('error')}"
+            )
+            return settings.PLACEHOLDER_IMAGE_URL
+        return f"{settings.BACKEND_URL}{result_dict['imagePath']}"
+
     @observe(name="generate_image")
-    async def _generate_image(self, image_prompt: str) -> str:
+    async def _generate_image_result(
+        self,
+        image_prompt: str,
+        location_uuid: Optional[str] = None,
+        priority: Optional[Priority] = None,
+        on_preview: Optional[ImagePreviewCallback] = None
+    ) -> Dict[str, Any]:
         """
-        Generate an image for a location.
+        Generate an image for a location, returning the result dictionary of ComfyUIService.generate_image.
         """
-        import asyncio
-        
         comfyui_service = ComfyUIService()
         logging.info(f"Generating image for prompt: {image_prompt}")
         
-        # Run the synchronous generate_image method in a thread pool
-        loop = asyncio.get_event_loop()
-        result_dict = await loop.run_in_executor(
-            None, 
-            lambda: comfyui_service.generate_image(image_prompt, "location")
+        result_dict = await comfyui_service.generate_image(
+            image_prompt,
+            "location",
+            on_progress=entity_progress(self.on_image_progress, location_uuid),
+            priority=self.image_priority if priority is None else priority,
+            on_preview=on_preview,
+            profile=self.image_profile
         )
         
         logging.info(f"Generated image: {result_dict}")
-        return f"{settings.BACKEND_URL}{result_dict['imagePath']}"
+        return result_dict
     
     @observe(name="create_location_json")
     async def _create_location_json(
@@ -238,11 +367,18 @@ class LocationGenerator:
                 description=location.description,
                 rules=", ".join(location.rules) if hasattr(location, 'rules') and location.rules else "",
                 image_dir=location.imageUrl,
+                image_variants=location.imageVariants or None,
                 image_prompt=image_prompt,
                 story_id=story_id,
                 uuid=location.uuid
             )
             
+            # Defer the insert to the unit of work if there is one
+            if self.unit_of_work is not None:
+                self.unit_of_work.add(db_location)
+                logging.info(f"Location {location.name} added to the unit of work")
+                return db_location
+
             # Add to database session if available
             if self.db_session is not None:
                 self.db_session.add(db_location)
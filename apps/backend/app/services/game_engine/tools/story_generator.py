@@ -10,6 +10,7 @@ from app.schemas.story_generation import (
 )
 from app.utils.json_service import JSONService
 from app.models.story import Story as StoryModel
+from app.services.game_engine.orchestrators.dag_executor import DagNode
 
 class StoryGenerator:
     """
@@ -29,6 +30,27 @@ class StoryGenerator:
         # Generate story rules
         rules = await self._generate_story_rules(description)
 
+        return self._build_story(user_id, story_input, description, rules)
+
+    def story_steps(self, user_id: int, story_input: StoryInput) -> List[DagNode]:
+        """
+        The steps of generate_story as nodes of a dependency graph.
+
+        Produces the nodes "story_description", "story_rules" and "story" (the saved Story),
+        so other pipelines can start as soon as the part of the story they need is ready.
+        """
+        return [
+            DagNode("story_description", lambda: self._generate_story_description(story_input)),
+            DagNode("story_rules", self._generate_story_rules, ("story_description",)),
+            DagNode(
+                "story",
+                lambda description, rules: self._build_story(user_id, story_input, description, rules),
+                ("story_description", "story_rules")
+            ),
+        ]
+
+    def _build_story(self, user_id: int, story_input: StoryInput, description: str, rules: List[str]) -> Story:
+        """Create the Story from its generated parts and save it to the database"""
         # Create title from input
         title = f"{story_input.theme}, {story_input.genre}, {story_input.year}"
         
@@ -0,0 +1,238 @@
+import hashlib
+import logging
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Literal, Optional
+
+import httpx
+from app.core.config import settings
+from app.services.image_generation.comfyui_events import ComfyUIEventListener
+from app.services.image_generation.reference_assets import ReferenceAssets
+
+
+@dataclass(frozen=True)
+class DownloadedImage:
+    """An image streamed to disk"""
+    path: Path
+    size: int
+    sha256: str
+
+
+# Where a prompt was when it was cancelled
+PromptState = Literal["pending", "running", "finished"]
+
+
+class ComfyUIClient:
+    """
+    Asynchronous client for the ComfyUI HTTP API.
+
+    A single instance is shared by all image generations, so its connection pool is
+    reused and waiting for ComfyUI does not occupy any thread. Job completion and
+    progress come from the /ws event feed unless use_websocket is disabled.
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        max_connections: int = settings.COMFYUI_MAX_CONNECTIONS,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        use_websocket: bool = settings.COMFYUI_USE_WEBSOCKET
+    ):
+        self.base_url = base_url or settings.COMFYUI_API_URL or ""
+        self.events = ComfyUIEventListener(self.base_url) if use_websocket else None
+        # Reference images already uploaded to this backend
+        self.references = ReferenceAssets(self)
+        # Prompts cancelled after they were queued, and the GPU time they had used
+        self.abandoned = 0
+        self.wasted_gpu_seconds = 0.0
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=transport,
+        )
+
+    async def queue_prompt(self, prompt: Dict[str, Any], client_id: str) -> Dict[str, Any]:
+        """Send a workflow prompt to ComfyUI's queue"""
+        try:
+            response = await self._client.post("/prompt", json={"prompt": prompt, "client_id": client_id})
+        except httpx.HTTPError as e:
+            raise ConnectionError(f"Failed to queue prompt: {str(e)}")
+
+        if response.status_code == 400:
+            logging.error(f"Error details from ComfyUI: {response.text}")
+            raise ValueError(f"Bad request to ComfyUI: {response.text}")
+        if response.status_code != 200:
+            raise ConnectionError(f"Failed to connect to ComfyUI: HTTP {response.status_code}")
+        return response.json()
+
+    async def get_queue(self) -> Dict[str, Any]:
+        """Running and pending prompts of the backend, as queue_running and queue_pending"""
+        try:
+            response = await self._client.get("/queue", timeout=5.0)
+        except httpx.HTTPError as e:
+            raise ConnectionError(f"Failed to get queue: {str(e)}")
+        if response.status_code != 200:
+            raise ConnectionError(f"Failed to get queue: HTTP {response.status_code}")
+        return response.json()
+
+    async def get_queue_depth(self) -> int:
+        """Number of running and pending prompts on the backend"""
+        queue = await self.get_queue()
+        return len(queue.get("queue_running", [])) + len(queue.get("queue_pending", []))
+
+    async def cancel_prompt(self, prompt_id: str) -> PromptState:
+        """
+        Stop a prompt: delete it from the queue while it is pending, interrupt it while it runs.
+
+        The interrupt names the prompt; ComfyUI versions that ignore the name interrupt
+        whatever runs, so the prompt is only interrupted after /queue showed it running.
+
+        Returns:
+            Where the prompt was, "finished" if it was in neither list
+
+        Raises:
+            ConnectionError: The backend is unreachable
+        """
+        queue = await self.get_queue()
+        if any(item[1] == prompt_id for item in queue.get("queue_pending", [])):
+            path, body, state = "/queue", {"delete": [prompt_id]}, "pending"
+        elif any(item[1] == prompt_id for item in queue.get("queue_running", [])):
+            path, body, state = "/interrupt", {"prompt_id": prompt_id}, "running"
+        else:
+            return "finished"
+        try:
+            response = await self._client.post(path, json=body, timeout=5.0)
+        except httpx.HTTPError as e:
+            raise ConnectionError(f"Failed to cancel prompt {prompt_id}: {str(e)}")
+        if response.status_code != 200:
+            raise ConnectionError(f"Failed to cancel prompt {prompt_id}: HTTP {response.status_code}")
+        return state
+
+    async def get_history(self, prompt_id: str) -> Dict[str, Any]:
+        """Get the generation history of a prompt, empty if it is not available"""
+        try:
+            response = await self._client.get(f"/history/{prompt_id}", timeout=10.0)
+        except httpx.HTTPError as e:
+            logging.error(f"Error getting history: {str(e)}")
+            return {}
+
+        if response.status_code != 200:
+            logging.error(f"Failed to get history, status code: {response.status_code}")
+            return {}
+        return response.json()
+
+    async def download_image(
+        self,
+        filename: str,
+        destination: Path,
+        subfolder: str = "",
+        folder_type: str = "output",
+        chunk_size: int = settings.COMFYUI_DOWNLOAD_CHUNK_SIZE
+    ) -> Optional[DownloadedImage]:
+        """
+        Stream an image to a file without holding it in memory.
+
+        The image is written in chunks to a temporary file next to destination while its
+        SHA-256 is computed, then renamed into place, so readers never see a partial file.
+
+        Args:
+            filename: Name of the image on the ComfyUI server
+            destination: Local file to create or replace
+            subfolder: Subfolder of the image on the ComfyUI server
+            folder_type: ComfyUI folder of the image ('output', 'input' or 'temp')
+            chunk_size: Bytes read and written at a time
+
+        Returns:
+            The downloaded image, None if it could not be downloaded
+        """
+        params = {"filename": filename, "subfolder": subfolder, "type": folder_type}
+        logging.info(f"Streaming image from ComfyUI: {self.base_url}/view with params {params}")
+        fd, temp_name = tempfile.mkstemp(prefix=f".{destination.name}.", suffix=".part", dir=destination.parent)
+        try:
+            sha256 = hashlib.sha256()
+            size = 0
+            with os.fdopen(fd, "wb") as f:
+                async with self._client.stream("GET", "/view", params=params) as response:
+                    if response.status_code != 200:
+                        await response.aread()
+                        logging.error(f"Failed to get image, status code: {response.status_code}, response: {response.text}")
+                        return None
+                    async for chunk in response.aiter_bytes(chunk_size):
+                        sha256.update(chunk)
+                        f.write(chunk)
+                        size += len(chunk)
+            if size == 0:
+                logging.error("Failed to download image - empty response")
+                return None
+            os.replace(temp_name, destination)
+        except httpx.ConnectError as e:
+            logging.error(f"Connection error getting image: {str(e)}. Check if ComfyUI is running at {self.base_url}")
+            return None
+        except httpx.HTTPError as e:
+            logging.error(f"Error getting image: {str(e)}")
+            return None
+        except OSError as e:
+            logging.error(f"Error saving image to {destination}: {str(e)}")
+            return None
+        finally:
+            if os.path.exists(temp_name):
+                os.unlink(temp_name)
+
+        logging.info(f"Image streamed to {destination}: {size} bytes")
+        return DownloadedImage(destination, size, sha256.hexdigest())
+
+    async def upload_image(self, image_path: Path, overwrite: bool = True, name: Optional[str] = None) -> Optional[str]:
+        """
+        Upload an input image, e.g. a reference image for a LoadImage node.
+
+        Args:
+            image_path: Local image file
+            overwrite: Replace an existing input image with the same name
+            name: Name to store the image under, defaults to the file name
+
+        Returns:
+            Name of the image on the ComfyUI server, None on failure
+        """
+        try:
+            image_data = image_path.read_bytes()
+        except OSError as e:
+            logging.error(f"Failed to read image {image_path}: {str(e)}")
+            return None
+
+        try:
+            response = await self._client.post(
+                "/upload/image",
+                files={"image": (name or image_path.name, image_data)},
+                data={"overwrite": "true" if overwrite else "false"},
+            )
+        except httpx.HTTPError as e:
+            logging.error(f"An error occurred while uploading the image: {str(e)}")
+            return None
+
+        if response.status_code != 200:
+            logging.error(f"Error uploading image: {response.text}")
+            return None
+        uploaded_name = response.json().get("name", name or image_path.name)
+        logging.info(f"Image '{image_path.name}' was uploaded to ComfyUI as '{uploaded_name}'")
+        return uploaded_name
+
+    async def get_object_info(self, node_class: str) -> Dict[str, Any]:
+        """Get the definition of a node class, including the choices of its inputs; empty on failure"""
+        try:
+            response = await self._client.get(f"/object_info/{node_class}", timeout=10.0)
+        except httpx.HTTPError as e:
+            logging.error(f"Error getting object info of {node_class}: {str(e)}")
+            return {}
+
+        if response.status_code != 200:
+            logging.error(f"Failed to get object info of {node_class}, status code: {response.status_code}")
+            return {}
+        return response.json().get(node_class, {})
+
+    async def close(self) -> None:
+        if self.events is not None:
+            await self.events.close()
+        await self._client.aclose()
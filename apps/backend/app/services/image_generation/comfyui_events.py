@@ -0,0 +1,176 @@
+import asyncio
+import json
+import logging
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import websockets
+
+# Called with the current and the total number of sampling steps
+ProgressCallback = Callable[[int, int], Awaitable[None]]
+
+
+class ComfyUIExecutionError(ValueError):
+    """ComfyUI reported that a prompt failed or was interrupted"""
+
+
+@dataclass
+class _Event:
+    kind: str  # "progress", "done", "error" or "disconnected"
+    value: int = 0
+    total: int = 0
+    message: str = ""
+
+
+class ComfyUIEventListener:
+    """
+    Listens to ComfyUI's /ws progress feed and completes jobs on its events.
+
+    ComfyUI only sends the events of a prompt to the client id it was queued with, so
+    prompts must be queued with this listener's client_id. Terminal events of prompts
+    nobody waits for yet are remembered for a while, because a job can finish before
+    its waiter is registered. When the connection drops, all waiters are released so
+    they can fall back to polling; the listener reconnects in the background.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        client_id: Optional[str] = None,
+        reconnect_delay: float = 5.0,
+        connect_timeout: float = 2.0,
+        finished_size: int = 256
+    ):
+        self.ws_url = base_url.replace("https://", "wss://", 1).replace("http://", "ws://", 1).rstrip("/")
+        self.client_id = client_id or str(uuid.uuid4())
+        self.reconnect_delay = reconnect_delay
+        self.connect_timeout = connect_timeout
+        self.finished_size = finished_size
+        self._waiters: Dict[str, "asyncio.Queue[_Event]"] = {}
+        self._finished: "OrderedDict[str, _Event]" = OrderedDict()
+        self._connected = asyncio.Event()
+        self._first_attempt = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # Number of successful connections; a reconnect may mean ComfyUI was restarted
+        self.connections = 0
+
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
+
+    async def ensure_started(self) -> bool:
+        """
+        Start listening if not done yet.
+
+        Returns:
+            Whether the feed is connected; only the very first call waits for the connection
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="comfyui-events")
+        if not self._first_attempt.is_set():
+            try:
+                await asyncio.wait_for(self._first_attempt.wait(), self.connect_timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.connected
+
+    async def wait(self, prompt_id: str, timeout: float, on_progress: Optional[ProgressCallback] = None) -> bool:
+        """
+        Wait until a prompt has been executed.
+
+        Args:
+            prompt_id: Prompt queued with this listener's client_id
+            timeout: Seconds to wait before raising asyncio.TimeoutError
+            on_progress: Called for each sampling step
+
+        Returns:
+            True once the prompt is done, False if the feed was lost before that
+
+        Raises:
+            ComfyUIExecutionError: The prompt failed or was interrupted
+        """
+        finished = self._finished.pop(prompt_id, None)
+        if finished is not None:
+            return self._result(prompt_id, finished)
+        if not self.connected:
+            return False
+
+        queue: "asyncio.Queue[_Event]" = asyncio.Queue()
+        self._waiters[prompt_id] = queue
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        try:
+            while True:
+                event = await asyncio.wait_for(queue.get(), max(0.0, deadline - loop.time()))
+                if event.kind == "progress":
+                    if on_progress is not None:
+                        await on_progress(event.value, event.total)
+                    continue
+                return self._result(prompt_id, event)
+        finally:
+            self._waiters.pop(prompt_id, None)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    @staticmethod
+    def _result(prompt_id: str, event: _Event) -> bool:
+        if event.kind == "error":
+            raise ComfyUIExecutionError(f"ComfyUI failed to execute prompt {prompt_id}: {event.message}")
+        return event.kind == "done"
+
+    async def _run(self) -> None:
+        url = f"{self.ws_url}/ws?clientId={self.client_id}"
+        while True:
+            try:
+                async with websockets.connect(url, max_size=None) as websocket:
+                    logging.info(f"Listening to ComfyUI events at {url}")
+                    self.connections += 1
+                    self._connected.set()
+                    self._first_attempt.set()
+                    async for message in websocket:
+                        # Binary messages are latent previews
+                        if isinstance(message, str):
+                            self._dispatch(json.loads(message))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning(f"ComfyUI event feed unavailable ({e}), falling back to polling")
+            finally:
+                self._connected.clear()
+                self._first_attempt.set()
+                for queue in self._waiters.values():
+                    queue.put_nowait(_Event("disconnected"))
+            await asyncio.sleep(self.reconnect_delay)
+
+    def _dispatch(self, message: Dict[str, Any]) -> None:
+        """Route a feed message to the waiter of its prompt"""
+        kind = message.get("type")
+        data = message.get("data") or {}
+        prompt_id = data.get("prompt_id")
+        if not prompt_id:
+            return
+
+        if kind == "progress":
+            event = _Event("progress", value=int(data.get("value", 0)), total=int(data.get("max", 0)))
+        elif (kind == "executing" and data.get("node") is None) or kind == "execution_success":
+            event = _Event("done")
+        elif kind == "execution_error":
+            event = _Event("error", message=str(data.get("exception_message", "execution error")))
+        elif kind == "execution_interrupted":
+            event = _Event("error", message="execution interrupted")
+        else:
+            return
+
+        queue = self._waiters.get(prompt_id)
+        if queue is not None:
+            queue.put_nowait(event)
+        elif event.kind != "progress":
+            self._finished[prompt_id] = event
+            while len(self._finished) > self.finished_size:
+                self._finished.popitem(last=False)
@@ -1,54 +1,86 @@
+import asyncio
 import json
 import logging
-import os
+import time
 import uuid
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
 
-import requests
 from app.core.config import settings
+from app.schemas.comfyui import GenerationProgressResponse
 from app.services.image_generation import WorkflowLoaderFactory
+from app.services.image_generation.comfyui_client import ComfyUIClient, DownloadedImage
+from app.services.image_generation.comfyui_events import ComfyUIExecutionError
+from app.services.image_generation.image_cache import get_image_cache
+from app.services.image_generation.image_variants import get_image_variants
+from app.services.image_generation.media_store import get_media_store
+from app.services.image_generation.reference_assets import reference_name
+from app.services.image_generation.scheduler import ComfyUIScheduler, Priority, get_comfyui_scheduler
+from app.services.image_generation.workflow_batch import merge_workflows
+from app.services.image_generation.workflow_models import workflow_models
+from app.services.image_generation.workflow_preview import preview_workflow
+
+GenerationProgressCallback = Callable[[GenerationProgressResponse], Awaitable[None]]
+# Called with the result of the quick preview of an image, before the final image is ready
+ImagePreviewCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# How long to wait for the history of an interrupted prompt, to count the GPU time it used
+ABANDON_HISTORY_ATTEMPTS = 10
+ABANDON_HISTORY_INTERVAL = 0.5
+# Cancellations of abandoned prompts still talking to ComfyUI
+_abandon_tasks: Set["asyncio.Task[None]"] = set()
+
+
+@dataclass
+class ImageRequest:
+    """One image of a batch passed to ComfyUIService.generate_batch"""
+    prompt: str
+    context_type: str = "character"
+    on_progress: Optional[GenerationProgressCallback] = None
+    on_preview: Optional[ImagePreviewCallback] = None
+    # Generation profile, None for the default of the context
+    profile: Optional[str] = None
+
+
+@dataclass
+class _JobImage:
+    """An image produced by a ComfyUI job"""
+    generation_id: str
+    cache_key: str
+    on_progress: Optional[GenerationProgressCallback]
+    # SaveImage node of the image in a merged job, None to take the first image of the job
+    output_node: Optional[str] = None
+    # Previews are neither cached nor rendered as variants
+    preview: bool = False
 
 
 class ComfyUIService:
-    def __init__(self):
-        self.output_dir = Path(settings.MEDIA_ROOT) / "comfyui"
-        self.output_dir.mkdir(parents=True, exist_ok=True)
-        self.client_id = str(uuid.uuid4())
-        # Define ComfyUI connection once
-        self.comfy_url = settings.COMFYUI_API_URL
-
-    def _queue_prompt(self, prompt: Dict[str, Any], client_id: Optional[str] = None, timeout: int = 30) -> Dict[str, Any]:
+    def __init__(self, client: Optional[ComfyUIClient] = None, scheduler: Optional[ComfyUIScheduler] = None):
+        # Generated images are stored by content hash
+        self.store = get_media_store()
+        # Jobs are balanced over the shared backends, or all sent to the given client
+        if scheduler is None:
+            scheduler = ComfyUIScheduler([client]) if client is not None else get_comfyui_scheduler()
+        self.scheduler = scheduler
+        self.image_cache = get_image_cache()
+        self.variants = get_image_variants()
+
+    async def _queue_prompt(self, client: ComfyUIClient, prompt: Dict[str, Any]) -> Dict[str, Any]:
         """Send a workflow prompt to ComfyUI's queue"""
-        if client_id is None:
-            client_id = self.client_id
-
-        try:
-            p = {"prompt": prompt, "client_id": client_id}
-            headers = {'Content-Type': 'application/json'}
-            print("Queuing the prompt")
-            response = requests.post(
-                f"{self.comfy_url}/prompt",
-                json=p,
-                headers=headers,
-                timeout=timeout
-            )
-
-            if response.status_code == 400:
-                logging.error(f"Error details from requests: {response.text}")
-                raise ValueError(f"Bad request to ComfyUI: {response.text}")
-
-            if response.status_code != 200:
-                raise ConnectionError(
-                    f"Failed to connect to ComfyUI: HTTP {response.status_code}")
-
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            raise ConnectionError(f"Failed to queue prompt: {str(e)}")
-        except Exception as e:
-            raise Exception(f"Failed to queue prompt: {str(e)}")
-
-    def _create_workflow(self, prompt: str, generation_id: str, context_type: str = "character") -> Dict[str, Any]:
+        # Events are only sent to the client id a prompt was queued with
+        client_id = client.events.client_id if client.events else str(uuid.uuid4())
+        logging.debug(f"Queuing the prompt on {client.base_url}")
+        return await client.queue_prompt(prompt, client_id)
+
+    async def _create_workflow(
+        self,
+        prompt: str,
+        generation_id: str,
+        context_type: str = "character",
+        pin_seed: bool = False,
+        profile: Optional[str] = None
+    ) -> Tuple[Dict[str, Any], Optional[Path]]:
         """
         Create ComfyUI workflow JSON with the given prompt and context
 
@@ -56,235 +88,568 @@ class ComfyUIService:
             prompt: Text prompt for image generation
             generation_id: Unique ID for the generation
             context_type: Type of context ('character' or 'location')
+            pin_seed: Derive the seed from the prompt
+            profile: Generation profile setting the sampling parameters, None for the default of the context
 
         Returns:
-            Workflow dictionary ready to be sent to ComfyUI
+            Workflow dictionary ready to be sent to ComfyUI, and the local reference image it
+            uses, which must be uploaded to the backend that runs it
         """
         # Use the factory to create the appropriate loader
         loader = WorkflowLoaderFactory.create_loader(context_type)
-        workflow: Dict[str, Any] = loader.load_workflow(prompt, generation_id)
+        loader.use_profile(profile)
+        if pin_seed:
+            loader.pin_seed(prompt)
+
+        # Reference images are stored under a content-derived name on every backend
+        reference_image = None
+        reference_image_path = loader.reference_image_path()
+        if reference_image_path is not None:
+            try:
+                reference_image = await asyncio.to_thread(reference_name, reference_image_path)
+            except OSError as e:
+                logging.error(f"Failed to read reference image for {context_type} generation: {e}")
+                reference_image_path = None
+
+        workflow: Dict[str, Any] = loader.load_workflow(prompt, generation_id, reference_image)
         
-        return workflow
+        return workflow, reference_image_path
 
-    def _get_history(self, prompt_id: str) -> Dict[str, Any]:
+    async def _get_history(self, client: ComfyUIClient, prompt_id: str) -> Dict[str, Any]:
         """Get generation history from ComfyUI"""
-        try:
-            response = requests.get(
-                f"{self.comfy_url}/history/{prompt_id}", timeout=10)
+        return await client.get_history(prompt_id)
 
-            if response.status_code == 200:
-                return response.json()
-            else:
-                logging.error(
-                    f"Failed to get history, status code: {response.status_code}")
-                return {}
+    async def _download_image(
+        self, client: ComfyUIClient, filename: str, subfolder: str, folder_type: str, local_filename: str
+    ) -> Optional[DownloadedImage]:
+        """
+        Stream a generated image into the staging directory of the media store
 
-        except Exception as e:
-            logging.error(f"Error getting history: {str(e)}")
-            return {}
+        Args:
+            client: Backend that generated the image
+            filename: Name of the image on the ComfyUI server
+            subfolder: Subfolder of the image on the ComfyUI server
+            folder_type: ComfyUI folder of the image
+            local_filename: Name for the saved file
 
-    def _get_image(self, filename: str, subfolder: str = "", folder_type: str = "output") -> bytes:
-        """Get raw image data from ComfyUI"""
-        try:
-            params = {
-                "filename": filename,
-                "subfolder": subfolder,
-                "type": folder_type
-            }
+        Returns:
+            The saved image, None on failure
+        """
+        return await client.download_image(filename, self.store.staging_path(local_filename), subfolder, folder_type)
+
+    async def _wait_for_completion(
+        self,
+        client: ComfyUIClient,
+        prompt_id: str,
+        use_events: bool,
+        on_progress: Optional[GenerationProgressCallback],
+        max_wait_time: float = 300
+    ) -> bool:
+        """
+        Wait until a queued prompt has been executed.
 
-            logging.info(f"Fetching image from ComfyUI: {self.comfy_url}/view with params {params}")
-            response = requests.get(
-                f"{self.comfy_url}/view", params=params, timeout=10)
-
-            if response.status_code == 200:
-                logging.info(f"Image downloaded successfully: {len(response.content)} bytes")
-                return response.content
-            else:
-                logging.error(
-                    f"Failed to get image, status code: {response.status_code}, response: {response.text}")
-                return b""
-
-        except requests.exceptions.ConnectionError as e:
-            logging.error(
-                f"Connection error getting image: {str(e)}. Check if ComfyUI is running at {self.comfy_url}")
-            return b""
-        except Exception as e:
-            logging.error(f"Error getting image: {str(e)}")
-            return b""
+        Returns:
+            False on timeout
 
-    def _save_image_bytes(self, image_bytes: bytes, filename: str) -> str:
+        Raises:
+            ComfyUIExecutionError: The prompt failed
         """
-        Save image bytes to a file in the output directory
+        start_time = time.time()
+        if use_events:
+            async def forward(step: int, total_steps: int) -> None:
+                await self._report_progress(on_progress, prompt_id, step, total_steps, "running")
 
-        Args:
-            image_bytes: The raw image data
-            filename: Name for the saved file
+            try:
+                if await client.events.wait(prompt_id, max_wait_time, forward):
+                    logging.info(f"Generation complete after {time.time() - start_time:.1f} seconds")
+                    return True
+            except asyncio.TimeoutError:
+                logging.error(f"Timeout waiting for image generation after {max_wait_time} seconds")
+                return False
+            logging.warning(f"Lost the ComfyUI event feed while waiting for {prompt_id}, polling history")
+
+        return await self._poll_history(client, prompt_id, max_wait_time - (time.time() - start_time))
+
+    async def _poll_history(
+        self, client: ComfyUIClient, prompt_id: str, max_wait_time: float, poll_interval: float = 2
+    ) -> bool:
+        """Poll the history of a prompt until it has outputs, False on timeout"""
+        start_time = time.time()
+        while time.time() - start_time < max_wait_time:
+            # Check if the job is complete by getting history
+            history = await self._get_history(client, prompt_id)
+            prompt_outputs = history.get(prompt_id, {}).get("outputs", {})
+
+            if prompt_outputs:
+                logging.info(f"Generation complete after {int(time.time() - start_time)} seconds")
+                return True
+
+            # Log progress periodically
+            if int((time.time() - start_time) % 10) == 0:
+                logging.info(f"Still waiting for image generation... ({int(time.time() - start_time)}s elapsed)")
+
+            # Wait before polling again
+            await asyncio.sleep(poll_interval)
+
+        logging.error(f"Timeout waiting for image generation after {max_wait_time} seconds")
+        return False
+
+    @staticmethod
+    async def _report_progress(
+        on_progress: Optional[GenerationProgressCallback],
+        prompt_id: str,
+        step: int,
+        total_steps: int,
+        status: str
+    ) -> None:
+        if on_progress is None:
+            return
+        try:
+            await on_progress(GenerationProgressResponse(
+                promptId=prompt_id, step=step, totalSteps=total_steps, status=status
+            ))
+        except Exception as e:
+            logging.warning(f"Failed to report generation progress of {prompt_id}: {e}")
+
+    @staticmethod
+    def _fan_out(callbacks: Sequence[Optional[GenerationProgressCallback]]) -> Optional[GenerationProgressCallback]:
+        """One progress callback reporting to the callbacks of all images of a job"""
+        targets = [callback for callback in callbacks if callback is not None]
+        if len(targets) <= 1:
+            return targets[0] if targets else None
+
+        async def report(progress: GenerationProgressResponse) -> None:
+            for callback in targets:
+                try:
+                    await callback(progress)
+                except Exception as e:
+                    logging.warning(f"Failed to report generation progress of {progress.promptId}: {e}")
+
+        return report
+
+    @staticmethod
+    def _gpu_seconds(prompt_history: Dict[str, Any]) -> Optional[float]:
+        """Execution time of a prompt from the timestamps of its status messages, None if unknown"""
+        timestamps: Dict[str, float] = {}
+        for message in prompt_history.get("status", {}).get("messages", []):
+            try:
+                event_type, data = message
+                timestamps[event_type] = float(data["timestamp"])
+            except (TypeError, ValueError, KeyError):
+                continue
+        start = timestamps.get("execution_start")
+        end = timestamps.get(
+            "execution_success", timestamps.get("execution_error", timestamps.get("execution_interrupted"))
+        )
+        if start is None or end is None:
+            return None
+        # ComfyUI timestamps are in milliseconds
+        return max(0.0, (end - start) / 1000)
+
+    @staticmethod
+    def _failed(images: Sequence[_JobImage], error: str) -> List[Dict[str, Any]]:
+        return [{"success": False, "error": error, "imagePath": ""} for _ in images]
+
+    async def _generate_on_backend(
+        self,
+        client: ComfyUIClient,
+        workflow: Dict[str, Any],
+        reference_image_paths: Sequence[Path],
+        images: Sequence[_JobImage],
+        on_queued: Optional[Callable[[], None]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Run a workflow on one backend and save the images it produces.
+
+        on_queued is called once the prompt is in the backend's queue.
 
         Returns:
-            Path to the saved file or empty string on failure
+            One result per image, in order
+
+        Raises:
+            ConnectionError: The backend is unreachable, the scheduler retries on another one
         """
+        for reference_image_path in reference_image_paths:
+            if await client.references.ensure_uploaded(reference_image_path) is None:
+                raise ConnectionError(f"Failed to upload reference image to {client.base_url}")
+
+        # Connect to the event feed before queuing, so no event of the job is missed
+        use_events = await client.events.ensure_started() if client.events else False
+
+        # Queue the prompt and get prompt ID
+        logging.info(f"Queuing workflow to ComfyUI")
+        queue_response = await self._queue_prompt(client, workflow)
+        if not queue_response or "prompt_id" not in queue_response:
+            logging.error(f"Failed to queue prompt. Response: {queue_response}")
+            return self._failed(images, "Failed to queue prompt")
+
+        prompt_id = queue_response["prompt_id"]
+        logging.info(f"Prompt queued with ID: {prompt_id}")
         try:
-            if not image_bytes:
-                logging.error("Cannot save empty image data")
-                return ""
-
-            # Create full path within output directory
-            file_path = self.output_dir / filename
+            return await self._complete_on_backend(client, prompt_id, use_events, images, on_queued)
+        except asyncio.CancelledError:
+            # Stop the prompt on ComfyUI too, the caller no longer waits for it
+            self._abandon_in_background(client, prompt_id)
+            raise
+
+    async def _complete_on_backend(
+        self,
+        client: ComfyUIClient,
+        prompt_id: str,
+        use_events: bool,
+        images: Sequence[_JobImage],
+        on_queued: Optional[Callable[[], None]] = None
+    ) -> List[Dict[str, Any]]:
+        """Wait for a queued prompt and save the images it produces"""
+        if on_queued is not None:
+            on_queued()
+
+        on_progress = self._fan_out([image.on_progress for image in images])
+        await self._report_progress(on_progress, prompt_id, 0, 0, "queued")
+        try:
+            completed = await self._wait_for_completion(
+                client, prompt_id, use_events, on_progress, max_wait_time=300 * len(images)
+            )
+        except ComfyUIExecutionError as e:
+            logging.error(str(e))
+            return self._failed(images, str(e))
+        if not completed:
+            self._abandon_in_background(client, prompt_id)
+            return self._failed(images, "Timeout waiting for image generation")
+        await self._report_progress(on_progress, prompt_id, 1, 1, "completed")
+
+        logging.info(f"Generation complete, processing results")
+
+        # Get history to find output image
+        history = await self._get_history(client, prompt_id)
+        if not history:
+            logging.error("Failed to get generation history - empty response")
+            return self._failed(images, "Failed to get generation history")
+
+        logging.debug(f"History data: {json.dumps(history, indent=2)}")
+
+        # Get outputs from the prompt history
+        prompt_history = history.get(prompt_id, {})
+        prompt_outputs = prompt_history.get("outputs", {})
+        if not prompt_outputs:
+            logging.error(f"No outputs found in history for prompt ID: {prompt_id}")
+            return self._failed(images, "No outputs in history")
+
+        gpu_seconds = self._gpu_seconds(prompt_history)
+        if len(images) > 1:
+            logging.info(f"Batch of {len(images)} images ran for {gpu_seconds} GPU seconds")
+        results = await asyncio.gather(*(
+            self._save_output(client, prompt_id, prompt_outputs, image) for image in images
+        ))
+        for result in results:
+            if result["success"]:
+                result.update({"gpuSeconds": gpu_seconds, "batchSize": len(images)})
+        return list(results)
+
+    def _abandon_in_background(self, client: ComfyUIClient, prompt_id: str) -> None:
+        task = asyncio.create_task(self._abandon(client, prompt_id))
+        _abandon_tasks.add(task)
+        task.add_done_callback(_abandon_tasks.discard)
+
+    @classmethod
+    async def _abandon(cls, client: ComfyUIClient, prompt_id: str) -> None:
+        """Delete or interrupt a prompt nobody waits for, and count the GPU time it used"""
+        try:
+            state = await client.cancel_prompt(prompt_id)
+            gpu_seconds = None
+            if state != "pending":
+                # ComfyUI writes the history of an interrupted prompt once the running node stops
+                for _ in range(ABANDON_HISTORY_ATTEMPTS):
+                    prompt_history = (await client.get_history(prompt_id)).get(prompt_id)
+                    if prompt_history is not None:
+                        gpu_seconds = cls._gpu_seconds(prompt_history)
+                        break
+                    await asyncio.sleep(ABANDON_HISTORY_INTERVAL)
+            client.abandoned += 1
+            client.wasted_gpu_seconds += gpu_seconds or 0.0
+            logging.info(
+                f"Stopped abandoned prompt {prompt_id} on {client.base_url} ({state}), "
+                f"{gpu_seconds if gpu_seconds is not None else 'unknown'} GPU seconds wasted"
+            )
+        except Exception as e:
+            logging.warning(f"Failed to cancel abandoned prompt {prompt_id} on {client.base_url}: {e}")
 
-            # Write bytes to file
-            with open(file_path, "wb") as f:
-                f.write(image_bytes)
+    async def _save_output(
+        self, client: ComfyUIClient, prompt_id: str, prompt_outputs: Dict[str, Any], image: _JobImage
+    ) -> Dict[str, Any]:
+        """Download the output image of one image of a job into the media store"""
+        try:
+            logging.debug("Parsing history to find output image")
+
+            # Take the image of the output node, or of the first node with images
+            image_data = None
+            for node_id, node_output in prompt_outputs.items():
+                if image.output_node is not None and node_id != image.output_node:
+                    continue
+                if "images" in node_output and node_output["images"]:
+                    image_data = node_output["images"][0]
+                    break
 
-            logging.info(f"Image saved to {file_path}")
-            return str(file_path)
+            if not image_data:
+                logging.error("No images found in history")
+                return {"success": False, "error": "No images found in history", "imagePath": ""}
+
+            filename = image_data.get("filename")
+            subfolder = image_data.get("subfolder", "")
+            type = image_data.get("type", "")
+
+            if not filename:
+                logging.error("Image filename not found in history")
+                return {"success": False, "error": "Image filename not found", "imagePath": ""}
+
+            logging.info(f"Found image: {filename} in folder: {subfolder}")
+
+            # Stream the image to disk, then store it under its content hash
+            local_filename = f"{image.generation_id}_{filename}"
+            logging.info(f"Downloading image from ComfyUI as: {local_filename}")
+            downloaded = await self._download_image(client, filename, subfolder, type, local_filename)
+            if downloaded is None:
+                return {"success": False, "error": "Failed to download image", "imagePath": ""}
+            logging.debug(f"Downloaded image size: {downloaded.size} bytes, sha256: {downloaded.sha256}")
+            stored_path, relative_path = self.store.publish(downloaded.path, downloaded.sha256)
+            file_path = str(stored_path)
+
+            variants: Dict[str, str] = {}
+            if not image.preview:
+                self.image_cache.put(image.cache_key, relative_path, file_path)
+                variants = await self.variants.create(stored_path, relative_path)
+
+            logging.info(f"Image generation complete. Saved to: {file_path}")
+            return {
+                "success": True,
+                "imagePath": relative_path,
+                "promptId": prompt_id,
+                "sha256": downloaded.sha256,
+                "imageVariants": variants,
+                "imagePaths": {
+                    "base": f"/media/comfyui",
+                    "images": [self.store.relative_path(relative_path)]
+                }
+            }
 
+        except (KeyError, IndexError) as e:
+            logging.error(f"Error parsing history: {str(e)}")
+            logging.debug(f"History outputs: {prompt_outputs}")
+            return {"success": False, "error": f"Error parsing history: {str(e)}", "imagePath": ""}
+
+    async def _cached_result(self, cache_key: str, prompt: str) -> Optional[Dict[str, Any]]:
+        """Result of an image served from the cache, None on a cache miss"""
+        cached_path = self.image_cache.get(cache_key)
+        if not cached_path:
+            return None
+        logging.info(f"Image cache hit for prompt '{prompt}': {cached_path} (stats: {self.image_cache.stats()})")
+        variants = await self.variants.create(self.store.file_path(cached_path), cached_path)
+        return {
+            "success": True,
+            "imagePath": cached_path,
+            "promptId": None,
+            "cached": True,
+            "imageVariants": variants,
+            "imagePaths": {
+                "base": f"/media/comfyui",
+                "images": [self.store.relative_path(cached_path)]
+            }
+        }
+
+    @staticmethod
+    def _preview_progress(on_progress: Optional[GenerationProgressCallback]) -> Optional[GenerationProgressCallback]:
+        """Mark the progress events of a preview"""
+        if on_progress is None:
+            return None
+
+        async def report(progress: GenerationProgressResponse) -> None:
+            await on_progress(progress.model_copy(update={"preview": True}))
+
+        return report
+
+    async def _generate_previews(
+        self,
+        previews: Sequence[Tuple[Dict[str, Any], _JobImage, ImagePreviewCallback]],
+        reference_image_paths: Sequence[Path],
+        priority: Priority,
+        queued: asyncio.Event
+    ) -> None:
+        """Render the previews of a batch as one job and pass each to its callback"""
+        workflow = previews[0][0]
+        images = [image for _, image, _ in previews]
+        if len(previews) > 1:
+            workflow, output_nodes = merge_workflows([workflow for workflow, _, _ in previews])
+            for image, output_node in zip(images, output_nodes):
+                image.output_node = output_node
+        try:
+            results = await self.scheduler.run(
+                lambda client: self._generate_on_backend(client, workflow, reference_image_paths, images, queued.set),
+                Priority(max(Priority.INTERACTIVE, priority - 1)),
+                workflow_models(workflow)
+            )
         except Exception as e:
-            logging.error(f"Error saving image: {str(e)}")
-            return ""
-
-    def generate_image(self, prompt: str, context_type: str = "character") -> Dict[str, Any]:
+            logging.warning(f"Preview generation failed, waiting for the final images: {e}")
+            return
+        finally:
+            queued.set()
+
+        for (_, _, on_preview), result in zip(previews, results):
+            if not result["success"]:
+                logging.warning(f"Preview generation failed: {result.get('error')}")
+                continue
+            try:
+                await on_preview({**result, "preview": True})
+            except Exception as e:
+                logging.warning(f"Failed to deliver image preview {result['imagePath']}: {e}")
+
+    async def generate_image(
+        self,
+        prompt: str,
+        context_type: str = "character",
+        pin_seed: Optional[bool] = None,
+        on_progress: Optional[GenerationProgressCallback] = None,
+        priority: Priority = Priority.INTERACTIVE,
+        on_preview: Optional[ImagePreviewCallback] = None,
+        profile: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         Generate an image from a text prompt and save it to disk
 
+        Identical workflows are served from the image cache without queuing a job. Other jobs
+        are run by the scheduler on one of the ComfyUI backends. Thumbnails and modern-format
+        variants of the image are returned as imageVariants. Completion is taken from
+        ComfyUI's event feed, with history polling as fallback. Cancelling the calling task
+        stops waiting for the job.
+
         Args:
             prompt: Text description for image generation
             context_type: Type of context ('character' or 'location')
+            pin_seed: Derive the seed from the prompt, defaults to settings.IMAGE_CACHE_PIN_SEED
+            on_progress: Called when the job is queued, for each sampling step and on completion
+            priority: Priority class of the job in the scheduler
+            on_preview: Called with a quick preview of the image while the final image renders,
+                see generate_batch
+            profile: Generation profile (fast, balanced or quality), None for the default of the context
 
         Returns:
             Dictionary with image information
         """
-        try:
-            import time
-            logging.info(
-                f"Starting image generation for prompt: '{prompt}' (context: {context_type})")
-
-            # Create a unique ID for this generation
-            generation_id = str(uuid.uuid4())[:8]
-            logging.debug(f"Generation ID: {generation_id}")
-
-            # Create workflow with the prompt and context
-            logging.debug(f"Creating workflow with prompt: '{prompt}'")
-            workflow = self._create_workflow(prompt, generation_id, context_type)
-            logging.debug(f"Workflow created successfully")
-
-            # Queue the prompt and get prompt ID
-            logging.info(f"Queuing workflow to ComfyUI")
-            queue_response = self._queue_prompt(workflow)
-            if not queue_response or "prompt_id" not in queue_response:
-                logging.error(f"Failed to queue prompt. Response: {queue_response}")
-                return {"success": False, "error": "Failed to queue prompt", "imagePath": ""}
-
-            prompt_id = queue_response["prompt_id"]
-            logging.info(f"Prompt queued with ID: {prompt_id}")
-
-            # Poll for job completion instead of using WebSockets
-            max_wait_time = 300  # 5 minutes timeout
-            start_time = time.time()
-            poll_interval = 2  # Check every 2 seconds
-            
-            # Poll until job is complete or timeout occurs
-            while time.time() - start_time < max_wait_time:
-                # Check if the job is complete by getting history
-                history = self._get_history(prompt_id)
-                prompt_outputs = history.get(prompt_id, {}).get("outputs", {})
-                
-                if prompt_outputs:
-                    logging.info(f"Generation complete after {int(time.time() - start_time)} seconds")
-                    break
-                    
-                # Log progress periodically
-                if int((time.time() - start_time) % 10) == 0:
-                    logging.info(f"Still waiting for image generation... ({int(time.time() - start_time)}s elapsed)")
-                
-                # Wait before polling again
-                time.sleep(poll_interval)
-            else:
-                # Loop completed without breaking - timeout occurred
-                logging.error(f"Timeout waiting for image generation after {max_wait_time} seconds")
-                return {"success": False, "error": "Timeout waiting for image generation", "imagePath": ""}
+        request = ImageRequest(prompt, context_type, on_progress, on_preview, profile)
+        results = await self.generate_batch([request], pin_seed, priority)
+        return results[0]
+
+    async def generate_batch(
+        self,
+        requests: Sequence[ImageRequest],
+        pin_seed: Optional[bool] = None,
+        priority: Priority = Priority.BACKGROUND
+    ) -> List[Dict[str, Any]]:
+        """
+        Generate several images, e.g. the location and characters of a scene, as one ComfyUI job
 
-            logging.info(f"Generation complete, processing results")
-            
-            # Get history to find output image
-            history = self._get_history(prompt_id)
-            if not history:
-                logging.error("Failed to get generation history - empty response")
-                return {"success": False, "error": "Failed to get generation history", "imagePath": ""}
+        Images in the image cache are served from it. The workflows of the other images are
+        merged into one graph that shares their common nodes (see merge_workflows), which is
+        queued once on a single backend; each SaveImage output is returned to the request it
+        belongs to. Results of a job carry its execution time as gpuSeconds and its number of
+        images as batchSize.
 
-            logging.debug(f"History data: {json.dumps(history, indent=2)}")
+        With IMAGE_PREVIEW_ENABLED, requests with an on_preview callback are first rendered with
+        few steps at a reduced size (see preview_workflow) by a job of higher priority, which
+        is queued before the final job. Each preview is passed to its callback with preview
+        set, unless the final image is ready first; progress events of the preview job are
+        marked as preview. Previews are not cached.
 
-            # Extract image filename from history
-            try:
-                logging.debug("Parsing history to find output image")
-
-                # Get outputs from the prompt history
-                prompt_outputs = history.get(prompt_id, {}).get("outputs", {})
-                if not prompt_outputs:
-                    logging.error(f"No outputs found in history for prompt ID: {prompt_id}")
-                    return {"success": False, "error": "No outputs in history", "imagePath": ""}
-
-                # Find the first node with images
-                image_data = None
-                for _, node_output in prompt_outputs.items():
-                    if "images" in node_output and node_output["images"]:
-                        image_data = node_output["images"][0]
-                        break
-
-                if not image_data:
-                    logging.error("No images found in history")
-                    return {"success": False, "error": "No images found in history", "imagePath": ""}
-
-                filename = image_data.get("filename")
-                subfolder = image_data.get("subfolder", "")
-                type = image_data.get("type", "")
-
-                if not filename:
-                    logging.error("Image filename not found in history")
-                    return {"success": False, "error": "Image filename not found", "imagePath": ""}
-
-                logging.info(f"Found image: {filename} in folder: {subfolder}")
-
-                # Get the image data
-                logging.info(f"Downloading image from ComfyUI")
-                image_bytes = self._get_image(filename, subfolder, type)
-                if not image_bytes:
-                    logging.error("Failed to download image - empty response")
-                    return {"success": False, "error": "Failed to download image", "imagePath": ""}
-
-                logging.debug(f"Downloaded image size: {len(image_bytes)} bytes")
-
-                # Save the image locally
-                local_filename = f"{generation_id}_{filename}"
-                logging.info(f"Saving image as: {local_filename}")
-                file_path = self._save_image_bytes(image_bytes, local_filename)
-
-                if not file_path:
-                    logging.error("Failed to save image locally")
-                    return {"success": False, "error": "Failed to save image locally", "imagePath": ""}
-
-                # Create relative path for frontend
-                relative_path = f"/media/comfyui/{os.path.basename(file_path)}"
-
-                logging.info(f"Image generation complete. Saved to: {file_path}")
-                return {
-                    "success": True,
-                    "imagePath": relative_path,
-                    "promptId": prompt_id,
-                    "imagePaths": {
-                        "base": f"/media/comfyui",
-                        "images": [os.path.basename(file_path)]
-                    }
-                }
+        Args:
+            requests: Images to generate
+            pin_seed: Derive the seeds from the prompts, defaults to settings.IMAGE_CACHE_PIN_SEED
+            priority: Priority class of the job in the scheduler
 
-            except (KeyError, IndexError) as e:
-                logging.error(f"Error parsing history: {str(e)}")
-                logging.debug(f"History structure: {history}")
-                return {"success": False, "error": f"Error parsing history: {str(e)}", "imagePath": ""}
+        Returns:
+            One dictionary with image information per request, in order
+        """
+        if pin_seed is None:
+            pin_seed = settings.IMAGE_CACHE_PIN_SEED
+        results: List[Optional[Dict[str, Any]]] = [None] * len(requests)
+        try:
+            workflows: List[Dict[str, Any]] = []
+            reference_image_paths: List[Path] = []
+            images: List[_JobImage] = []
+            indices: List[int] = []
+            previews: List[Tuple[Dict[str, Any], _JobImage, ImagePreviewCallback]] = []
+            for index, request in enumerate(requests):
+                logging.info(
+                    f"Starting image generation for prompt: '{request.prompt}' (context: {request.context_type})")
+
+                # Create a unique ID for this generation
+                generation_id = str(uuid.uuid4())[:8]
+                logging.debug(f"Generation ID: {generation_id}")
+
+                # Create workflow with the prompt and context
+                logging.debug(f"Creating workflow with prompt: '{request.prompt}'")
+                workflow, reference_image_path = await self._create_workflow(
+                    request.prompt, generation_id, request.context_type, pin_seed, request.profile
+                )
+                logging.debug(f"Workflow created successfully")
+
+                # Serve identical workflows from the cache
+                cache_key = self.image_cache.key(workflow, pin_seed)
+                results[index] = await self._cached_result(cache_key, request.prompt)
+                if results[index] is not None:
+                    continue
+
+                workflows.append(workflow)
+                if reference_image_path is not None and reference_image_path not in reference_image_paths:
+                    reference_image_paths.append(reference_image_path)
+                images.append(_JobImage(generation_id, cache_key, request.on_progress))
+                indices.append(index)
+                if request.on_preview is not None and settings.IMAGE_PREVIEW_ENABLED:
+                    preview = _JobImage(
+                        f"{generation_id}_preview", cache_key, self._preview_progress(request.on_progress), preview=True
+                    )
+                    preview_graph = preview_workflow(
+                        workflow, settings.IMAGE_PREVIEW_STEPS, settings.IMAGE_PREVIEW_SCALE
+                    )
+                    previews.append((preview_graph, preview, request.on_preview))
+
+            if workflows:
+                job_workflow = workflows[0]
+                if len(workflows) > 1:
+                    job_workflow, output_nodes = merge_workflows(workflows)
+                    for image, output_node in zip(images, output_nodes):
+                        image.output_node = output_node
+                    logging.info(
+                        f"Merged {len(workflows)} workflows into one job of {len(job_workflow)} nodes "
+                        f"({sum(len(workflow) for workflow in workflows)} unmerged)"
+                    )
+
+                preview_task = None
+                try:
+                    if previews:
+                        # The final job waits until the preview job is queued, so a backend runs the preview first
+                        preview_queued = asyncio.Event()
+                        preview_task = asyncio.create_task(
+                            self._generate_previews(previews, reference_image_paths, priority, preview_queued)
+                        )
+                        await preview_queued.wait()
+                    generated = await self.scheduler.run(
+                        lambda client: self._generate_on_backend(client, job_workflow, reference_image_paths, images),
+                        priority,
+                        workflow_models(job_workflow)
+                    )
+                finally:
+                    # A preview arriving after the final image would replace it
+                    if preview_task is not None:
+                        preview_task.cancel()
+                        await asyncio.gather(preview_task, return_exceptions=True)
+                for index, result in zip(indices, generated):
+                    results[index] = result
 
         except Exception as e:
             logging.error(f"Error generating image: {str(e)}")
             import traceback
             logging.error(traceback.format_exc())
-            return {"success": False, "error": f"Error generating image: {str(e)}", "imagePath": ""}
-
-    
\ No newline at end of file
+            return [
+                result or {"success": False, "error": f"Error generating image: {str(e)}", "imagePath": ""}
+                for result in results
+            ]
+        return [result or {"success": False, "error": "No image generated", "imagePath": ""} for result in results]
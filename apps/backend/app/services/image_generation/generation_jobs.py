@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Literal, Optional
+
+from app.core.config import settings
+from app.schemas.comfyui import GenerationProgressResponse
+from app.services.image_generation.comfyui_service import ComfyUIService
+
+JobStatus = Literal["queued", "running", "completed", "failed"]
+
+
+@dataclass
+class GenerationJob:
+    """An image generation started through the API, run in the background"""
+    id: str
+    prompt: str
+    context_type: str
+    profile: Optional[str] = None
+    status: JobStatus = "queued"
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    # Last progress event of the job
+    progress: Optional[GenerationProgressResponse] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    _subscribers: List["asyncio.Queue[GenerationProgressResponse]"] = field(default_factory=list, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "jobId": self.id,
+            "status": self.status,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+        }
+
+    def _publish(self, progress: GenerationProgressResponse) -> None:
+        self.progress = progress
+        for queue in self._subscribers:
+            queue.put_nowait(progress)
+
+
+class GenerationJobs:
+    """
+    Image generations of the /comfyui API, decoupled from the requests that start them.
+
+    submit returns a job right away while the image is generated by a background task;
+    the job can then be polled with get or followed with events. Finished jobs are kept
+    for ttl seconds.
+    """
+
+    def __init__(
+        self,
+        service_factory: Callable[[], ComfyUIService] = ComfyUIService,
+        ttl: float = settings.COMFYUI_JOB_TTL
+    ):
+        self.service_factory = service_factory
+        self.ttl = ttl
+        self._jobs: Dict[str, GenerationJob] = {}
+        self._tasks: Dict[str, "asyncio.Task[None]"] = {}
+
+    def submit(self, prompt: str, context_type: str = "character", profile: Optional[str] = None) -> GenerationJob:
+        """Start generating an image and return its job"""
+        self._prune()
+        job = GenerationJob(id=str(uuid.uuid4()), prompt=prompt, context_type=context_type, profile=profile)
+        self._jobs[job.id] = job
+        task = asyncio.create_task(self._run(job))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+        return job
+
+    def get(self, job_id: str) -> Optional[GenerationJob]:
+        return self._jobs.get(job_id)
+
+    async def events(self, job: GenerationJob, keepalive: Optional[float] = None) -> AsyncIterator[
+        Optional[GenerationProgressResponse]
+    ]:
+        """
+        Progress of a job, starting with its last progress event and ending with the event
+        of its completion or failure.
+
+        Args:
+            job: Job to follow
+            keepalive: Yield None after this many seconds without an event
+        """
+        queue: "asyncio.Queue[GenerationProgressResponse]" = asyncio.Queue()
+        job._subscribers.append(queue)
+        try:
+            # Later events are in the queue, which was subscribed before the last event was taken
+            if job.progress is not None:
+                yield job.progress
+                if job.done:
+                    return
+            while True:
+                try:
+                    progress = await asyncio.wait_for(queue.get(), keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                yield progress
+                if progress.status in ("completed", "failed"):
+                    return
+        finally:
+            job._subscribers.remove(queue)
+
+    async def close(self) -> None:
+        """Cancel the jobs that are still running"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, job: GenerationJob) -> None:
+        async def on_progress(progress: GenerationProgressResponse) -> None:
+            # The job completes once the image is stored, not when ComfyUI finished
+            if progress.status == "completed":
+                return
+            job.status = "running"
+            job._publish(progress.model_copy(update={"jobId": job.id}))
+
+        try:
+            result = await self.service_factory().generate_image(
+                job.prompt, job.context_type, on_progress=on_progress, profile=job.profile
+            )
+        except asyncio.CancelledError:
+            self._finish(job, None, "Cancelled")
+            raise
+        except Exception as e:
+            logging.exception(f"Image generation job {job.id} failed: {e}")
+            result = {"success": False, "error": f"Error generating image: {e}", "imagePath": ""}
+        self._finish(job, result, None if result.get("success") else result.get("error") or "Generation failed")
+
+    @staticmethod
+    def _finish(job: GenerationJob, result: Optional[Dict[str, Any]], error: Optional[str]) -> None:
+        job.result = result
+        job.error = error
+        job.status = "failed" if error else "completed"
+        job.finished_at = time.time()
+        prompt_id = (result or {}).get("promptId") or (job.progress.promptId if job.progress else "")
+        job._publish(GenerationProgressResponse(
+            promptId=prompt_id, step=1, totalSteps=1, status=job.status, jobId=job.id
+        ))
+
+    def _prune(self) -> None:
+        """Forget finished jobs older than the ttl"""
+        cutoff = time.time() - self.ttl
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at is not None and job.finished_at < cutoff:
+                del self._jobs[job_id]
+
+
+_generation_jobs: Optional[GenerationJobs] = None
+
+
+def get_generation_jobs() -> GenerationJobs:
+    """Jobs of the /comfyui API"""
+    global _generation_jobs
+    if _generation_jobs is None:
+        _generation_jobs = GenerationJobs()
+    return _generation_jobs
+
+
+async def close_generation_jobs() -> None:
+    global _generation_jobs
+    if _generation_jobs is not None:
+        await _generation_jobs.close()
+        _generation_jobs = None
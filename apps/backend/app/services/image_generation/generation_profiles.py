@@ -0,0 +1,45 @@
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from app.core.config import settings
+
+
+@dataclass(frozen=True)
+class GenerationProfile:
+    """Fixed sampling parameters trading render time against image quality"""
+    name: str
+    sampler_name: str
+    scheduler: str
+    steps: int
+    cfg: float
+
+
+# Samplers are single-evaluation per step; heun and dpm_2 evaluate the model twice per step
+GENERATION_PROFILES: Dict[str, GenerationProfile] = {
+    profile.name: profile for profile in (
+        GenerationProfile("fast", sampler_name="euler", scheduler="normal", steps=10, cfg=7.0),
+        GenerationProfile("balanced", sampler_name="euler_ancestral", scheduler="normal", steps=20, cfg=7.5),
+        GenerationProfile("quality", sampler_name="dpmpp_2m", scheduler="karras", steps=30, cfg=7.5),
+    )
+}
+
+
+def get_generation_profile(name: Optional[str], context_type: str = "character") -> GenerationProfile:
+    """
+    Look up a generation profile.
+
+    Args:
+        name: Profile name, None for the default of the context
+        context_type: Type of context ('character' or 'location')
+
+    Raises:
+        ValueError: The profile does not exist
+    """
+    if name is None:
+        name = settings.IMAGE_PROFILE_LOCATION if context_type == "location" else settings.IMAGE_PROFILE_CHARACTER
+    try:
+        return GENERATION_PROFILES[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown generation profile '{name}', expected one of {', '.join(GENERATION_PROFILES)}"
+        ) from None
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.services.image_generation.comfyui_service import (
+    ComfyUIService,
+    GenerationProgressCallback,
+    ImagePreviewCallback,
+    ImageRequest
+)
+from app.services.image_generation.scheduler import Priority
+
+ImageResult = Dict[str, Any]
+
+
+class ImageBatch:
+    """
+    Collects the images of a scene and generates them as one ComfyUI job.
+
+    Images are added while the entities of a scene are created, each add returning a
+    future of the image's result. submit sends everything added since the last submit to
+    ComfyUIService.generate_batch in the background. A batch is submitted on its own once
+    it holds max_size images, or window seconds after its first image was added, so an
+    image is never held back indefinitely.
+    """
+
+    def __init__(
+        self,
+        service: Optional[ComfyUIService] = None,
+        priority: Priority = Priority.BACKGROUND,
+        max_size: int = settings.COMFYUI_SCENE_BATCH_MAX_IMAGES,
+        window: float = settings.COMFYUI_SCENE_BATCH_WINDOW
+    ):
+        self._service = service
+        self.priority = priority
+        self.max_size = max(1, max_size)
+        self.window = window
+        self._pending: List[Tuple[ImageRequest, "asyncio.Future[ImageResult]"]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task[None]] = set()
+        # Totals over the jobs of this batch, for comparing against one job per image
+        self.jobs = 0
+        self.images = 0
+        self.gpu_seconds = 0.0
+
+    def add(
+        self,
+        prompt: str,
+        context_type: str,
+        on_progress: Optional[GenerationProgressCallback] = None,
+        on_preview: Optional[ImagePreviewCallback] = None,
+        profile: Optional[str] = None
+    ) -> "asyncio.Future[ImageResult]":
+        """
+        Add an image to the next job, optionally preceded by a preview job (see
+        ComfyUIService.generate_batch).
+
+        Returns:
+            Future of the result dictionary of ComfyUIService.generate_image
+        """
+        loop = asyncio.get_running_loop()
+        future: "asyncio.Future[ImageResult]" = loop.create_future()
+        self._pending.append((ImageRequest(prompt, context_type, on_progress, on_preview, profile), future))
+        if len(self._pending) >= self.max_size:
+            self.submit()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self.submit)
+        return future
+
+    def submit(self) -> None:
+        """Start generating the images added since the last submit"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        task = asyncio.create_task(self._run(pending))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def cancel(self) -> None:
+        """Drop the images not submitted yet and cancel the running jobs"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for _, future in self._pending:
+            future.cancel()
+        self._pending = []
+        for task in list(self._tasks):
+            task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"jobs": self.jobs, "images": self.images, "gpuSeconds": round(self.gpu_seconds, 3)}
+
+    async def _run(self, pending: List[Tuple[ImageRequest, "asyncio.Future[ImageResult]"]]) -> None:
+        service = self._service or ComfyUIService()
+        try:
+            results = await service.generate_batch([request for request, _ in pending], priority=self.priority)
+            for (_, future), result in zip(pending, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            for _, future in pending:
+                if not future.done():
+                    future.cancel()
+
+        # Results of the same job share its GPU time
+        job_seconds = {
+            result["promptId"]: result["gpuSeconds"] for result in results
+            if result.get("promptId") and result.get("gpuSeconds") is not None
+        }
+        self.jobs += len(job_seconds)
+        self.images += len(pending)
+        self.gpu_seconds += sum(job_seconds.values())
+        logging.info(
+            f"Generated a batch of {len(pending)} images in {len(job_seconds)} ComfyUI jobs "
+            f"({sum(job_seconds.values()):.1f} GPU seconds, batch totals: {self.stats()})"
+        )
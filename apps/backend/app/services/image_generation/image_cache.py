@@ -0,0 +1,153 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import shutil
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+# Inputs that change on every generation without changing the image
+VOLATILE_INPUTS = {"SaveImage": ("filename_prefix",)}
+# Sampling inputs that are randomized per generation unless the seed is pinned; the other
+# sampling inputs come from the generation profile and are part of the key
+SAMPLING_INPUTS = {"KSampler": ("seed",)}
+
+
+class ImageCache:
+    """
+    Bounded LRU cache of generated images keyed on the patched ComfyUI workflow.
+
+    The key is a SHA-256 of the normalized workflow (which contains the prompt). Volatile
+    inputs such as the SaveImage filename prefix are always ignored. Without a pinned seed
+    the seed is ignored as well, so any earlier image for the same prompt, workflow and
+    generation profile is a hit; with a pinned seed it is derived from the prompt and is
+    part of the key.
+
+    The index is kept in memory and mirrored to a JSON file under CACHE_ROOT so cached images
+    survive restarts; it is only used from the event loop. Evicted entries are only forgotten,
+    their files are left to the media garbage collector, which keeps them while entities
+    reference them.
+    """
+
+    def __init__(self, index_path: Path, max_entries: int = settings.IMAGE_CACHE_SIZE):
+        self.index_path = index_path
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._load()
+
+    @staticmethod
+    def key(workflow: Dict[str, Any], pin_seed: bool) -> str:
+        """
+        Compute the cache key of a patched workflow.
+
+        Args:
+            workflow: Workflow ready to be queued, including the prompt
+            pin_seed: Whether the seed was derived from the prompt
+
+        Returns:
+            Hex digest identifying the image the workflow would produce
+        """
+        normalized = copy.deepcopy(workflow)
+        ignored = dict(VOLATILE_INPUTS)
+        if not pin_seed:
+            ignored.update(SAMPLING_INPUTS)
+        for node in normalized.values():
+            for name in ignored.get(node.get("class_type", ""), ()):
+                node.get("inputs", {}).pop(name, None)
+        canonical = json.dumps({"pinned": pin_seed, "workflow": normalized}, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the media path of a cached image, or None on a miss"""
+        entry = self._entries.get(key)
+        if entry is not None and not os.path.exists(entry["filePath"]):
+            # The file was removed behind our back
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry["imagePath"]
+
+    def put(self, key: str, image_path: str, file_path: str) -> None:
+        """
+        Store a generated image.
+
+        Args:
+            key: Cache key of the workflow that produced the image
+            image_path: Media path returned to clients
+            file_path: Location of the image on disk
+        """
+        self._entries[key] = {"imagePath": image_path, "filePath": file_path}
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        self._save()
+
+    def image_paths(self) -> List[str]:
+        """Media paths of all cached images"""
+        return [entry["imagePath"] for entry in self._entries.values()]
+
+    @property
+    def hit_rate(self) -> Optional[float]:
+        """Share of lookups that were hits, None before the first lookup"""
+        total = self.hits + self.misses
+        return self.hits / total if total else None
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache metrics"""
+        return {
+            "entries": len(self._entries),
+            "maxEntries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hitRate": self.hit_rate,
+        }
+
+    def _load(self) -> None:
+        try:
+            with open(self.index_path, "r") as f:
+                entries = json.load(f)
+            self._entries = OrderedDict(list(entries.items())[-self.max_entries:])
+        except FileNotFoundError:
+            pass
+        except (json.JSONDecodeError, AttributeError) as e:
+            logging.warning(f"Ignoring invalid image cache index {self.index_path}: {e}")
+
+    def _save(self) -> None:
+        try:
+            temp_path = self.index_path.with_suffix(".tmp")
+            with open(temp_path, "w") as f:
+                json.dump(self._entries, f)
+            os.replace(temp_path, self.index_path)
+        except OSError as e:
+            logging.error(f"Failed to write image cache index {self.index_path}: {e}")
+
+
+_image_cache: Optional[ImageCache] = None
+
+
+def get_image_cache() -> ImageCache:
+    """Shared image cache, indexed in CACHE_ROOT"""
+    global _image_cache
+    if _image_cache is None:
+        cache_dir = Path(settings.CACHE_ROOT)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        index_path = cache_dir / "image_cache.json"
+        # Earlier versions kept the index in the publicly served media directory
+        public_index = Path(settings.MEDIA_ROOT) / "comfyui" / "image_cache.json"
+        if public_index.exists() and not index_path.exists():
+            shutil.move(public_index, index_path)
+        _image_cache = ImageCache(index_path)
+    return _image_cache
@@ -0,0 +1,167 @@
+import asyncio
+import importlib.util
+import logging
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+
+from app.core.config import settings
+
+
+def render_variants(source: str, widths: Sequence[int], formats: Sequence[str], quality: int) -> Dict[str, str]:
+    """
+    Write the derivatives of an image next to it, runs in a worker process.
+
+    For every format a full-size variant named after the format is written, plus one
+    variant per width smaller than the image, named "<format>_<width>". Existing variant
+    files are kept, and formats the installed Pillow cannot write are skipped.
+
+    Args:
+        source: Image file
+        widths: Widths of the downscaled variants, the aspect ratio is kept
+        formats: Pillow format names of the variants, e.g. 'webp' or 'avif'
+        quality: Encoder quality of lossy formats
+
+    Returns:
+        Variant names mapped to the file names of the variants
+    """
+    from PIL import Image
+
+    Image.init()
+    source_path = Path(source)
+    formats = [fmt for fmt in formats if fmt.upper() in Image.SAVE]
+    variants: Dict[str, str] = {}
+    with Image.open(source_path) as image:
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        for width in [None, *sorted(set(widths))]:
+            if width is not None and width >= image.width:
+                continue
+            resized = None
+            for fmt in formats:
+                name = fmt if width is None else f"{fmt}_{width}"
+                filename = f"{source_path.stem}_{name}.{fmt}"
+                target = source_path.with_name(filename)
+                if not target.exists():
+                    if resized is None:
+                        resized = image if width is None else image.resize(
+                            (width, max(1, round(image.height * width / image.width))), Image.Resampling.LANCZOS
+                        )
+                    temp = source_path.with_name(f".{filename}.part")
+                    resized.save(temp, format=fmt.upper(), quality=quality)
+                    os.replace(temp, target)
+                variants[name] = filename
+    return variants
+
+
+class ImageVariants:
+    """
+    Thumbnails and modern-format variants of generated images.
+
+    Variants are rendered by Pillow in a process pool, so encoding never blocks the event
+    loop or holds the GIL of the server process. The variants of recently processed images
+    are remembered by media path, so callers that only have an image URL can look them up.
+    Without Pillow installed images are served without variants.
+    """
+
+    def __init__(
+        self,
+        widths: Sequence[int] = settings.IMAGE_VARIANT_WIDTHS,
+        formats: Sequence[str] = settings.IMAGE_VARIANT_FORMATS,
+        quality: int = settings.IMAGE_VARIANT_QUALITY,
+        max_workers: int = settings.IMAGE_VARIANT_WORKERS,
+        max_entries: int = 4096
+    ):
+        self.widths = list(widths)
+        self.formats = list(formats)
+        self.quality = quality
+        self.max_workers = max_workers
+        self.max_entries = max_entries
+        self.enabled = max_workers > 0 and bool(self.formats) and importlib.util.find_spec("PIL") is not None
+        if max_workers > 0 and not self.enabled and self.formats:
+            logging.warning("Pillow is not installed, generated images are served without variants")
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._variants: "OrderedDict[str, Dict[str, str]]" = OrderedDict()
+
+    async def create(self, file_path: Path, media_path: str) -> Dict[str, str]:
+        """
+        Render the variants of an image, unless they were already rendered.
+
+        Args:
+            file_path: Image file on disk
+            media_path: Path the image is served under, e.g. /media/comfyui/image.png
+
+        Returns:
+            Variant names mapped to the media paths of the variants, empty on failure
+        """
+        variants = self._variants.get(media_path)
+        if variants is not None:
+            return variants
+        if not self.enabled:
+            return {}
+
+        if self._pool is None:
+            # Spawned workers do not inherit the event loop and connections of the server
+            self._pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            filenames = await asyncio.get_running_loop().run_in_executor(
+                self._pool, render_variants, str(file_path), self.widths, self.formats, self.quality
+            )
+        except Exception as e:
+            logging.error(f"Failed to render variants of {file_path}: {e}")
+            return {}
+
+        base = media_path.rsplit("/", 1)[0]
+        variants = {name: f"{base}/{filename}" for name, filename in filenames.items()}
+        self._variants[media_path] = variants
+        while len(self._variants) > self.max_entries:
+            self._variants.popitem(last=False)
+        logging.info(f"Rendered {len(variants)} variants of {media_path}")
+        return variants
+
+    def urls(self, image_url: str) -> Dict[str, str]:
+        """
+        Variant URLs of a processed image.
+
+        Args:
+            image_url: Media path of the image, optionally prefixed with settings.BACKEND_URL
+
+        Returns:
+            Variant names mapped to URLs in the same form, empty if the image has no variants
+        """
+        prefix = settings.BACKEND_URL or ""
+        if not prefix or not image_url.startswith(prefix):
+            prefix = ""
+        variants = self._variants.get(image_url[len(prefix):], {})
+        return {name: f"{prefix}{path}" for name, path in variants.items()}
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+_image_variants: Optional[ImageVariants] = None
+_image_variants_lock = threading.Lock()
+
+
+def get_image_variants() -> ImageVariants:
+    """Shared image variant renderer"""
+    global _image_variants
+    with _image_variants_lock:
+        if _image_variants is None:
+            _image_variants = ImageVariants()
+        return _image_variants
+
+
+def close_image_variants() -> None:
+    """Stop the worker processes, called on application shutdown"""
+    global _image_variants
+    with _image_variants_lock:
+        if _image_variants is not None:
+            _image_variants.close()
+            _image_variants = None
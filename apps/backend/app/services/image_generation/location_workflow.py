@@ -1,57 +1,38 @@
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from .workflow_loader import WorkflowLoader
 
 
 class LocationWorkflowLoader(WorkflowLoader):
     """Loader for location generation workflows"""
+
+    context_type = "location"
     
     def __init__(self):
         super().__init__()
         self.workflow_file = "locations_api.json"
     
-    def load_workflow(self, prompt: str, generation_id: str) -> Dict[str, Any]:
+    def load_workflow(self, prompt: str, generation_id: str, reference_image: Optional[str] = None) -> Dict[str, Any]:
         """Load a location workflow and customize it with the given prompt"""
-        workflow = self._load_workflow_file(self.workflow_file)
+        template = self._load_template(self.workflow_file)
         
-        if not workflow:
+        if template is None:
             logging.warning(f"Location workflow not found, using fallback")
             return {}
         
-        # Customize the workflow with the prompt and random parameters
+        workflow = template.instantiate()
+        
+        # Customize the workflow with the prompt, a random seed and the generation profile
         random_seed = self._generate_random_seed()
         
-        # Find the text encode node (typically contains the prompt)
-        for _, node in workflow.items():
-            if node.get("class_type") == "CLIPTextEncode" and "text" in node.get("inputs", {}):
-                # Don't override an empty negative prompt
-                if node["inputs"]["text"] != "":
-                    node["inputs"]["text"] = prompt
+        for node_id in template.prompt_nodes:
+            workflow[node_id]["inputs"]["text"] = prompt
         
-        # Find the KSampler node to update random parameters
-        for _, node in workflow.items():
-            if node.get("class_type") == "KSampler":
-                node["inputs"]["seed"] = random_seed
-                node["inputs"]["steps"] = self._get_random_steps()
-                node["inputs"]["cfg"] = self._get_random_cfg()
-                node["inputs"]["sampler_name"] = self._get_random_sampler()
+        for node_id in template.sampler_nodes:
+            inputs = workflow[node_id]["inputs"]
+            inputs["seed"] = random_seed
+            self._apply_profile(inputs)
         
-        # Find the SaveImage node (if any) to add our generation ID
-        for _, node in workflow.items():
-            if node.get("class_type") == "SaveImage":
-                node["inputs"]["filename_prefix"] = f"location_{generation_id}_{random_seed}"
-                break
-        else:
-            # If no SaveImage node, add one connecting to the output node
-            output_node_id = self._find_output_node_id(workflow)
-            if output_node_id:
-                new_node_id = str(max(int(k) for k in workflow.keys()) + 1)
-                workflow[new_node_id] = {
-                    "class_type": "SaveImage",
-                    "inputs": {
-                        "filename_prefix": f"location_{generation_id}_{random_seed}",
-                        "images": [output_node_id, 0]
-                    }
-                }
+        self._set_filename_prefix(template, workflow, f"location_{generation_id}_{random_seed}")
         
-        return workflow 
\ No newline at end of file
+        return workflow
@@ -0,0 +1,98 @@
+import asyncio
+import logging
+from typing import Iterable, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud import characters as characters_crud
+from app.crud import locations as locations_crud
+from app.db.session import SessionLocal
+from app.services.game_engine.orchestrators.entity_reservoir import reserved_image_urls
+from app.services.image_generation.image_cache import get_image_cache
+from app.services.image_generation.media_store import GarbageCollection, MediaStore, StorageUsage, get_media_store
+
+
+def live_image_urls() -> List[str]:
+    """Image URLs only held in memory: cached images and entities in reservoirs"""
+    return [*get_image_cache().image_paths(), *reserved_image_urls()]
+
+
+def referenced_owners(db: Session, store: MediaStore, extra_urls: Optional[Iterable[str]] = None) -> Set[str]:
+    """
+    Reference index of the store: owners of the images of all characters and locations.
+
+    Args:
+        db: Database session
+        store: Media store the index is built for
+        extra_urls: Further referenced image URLs, defaults to live_image_urls()
+    """
+    if extra_urls is None:
+        extra_urls = live_image_urls()
+    urls = [*characters_crud.get_character_image_urls(db), *locations_crud.get_location_image_urls(db), *extra_urls]
+    return store.referenced_owners(urls)
+
+
+def storage_usage(db: Session, store: Optional[MediaStore] = None) -> StorageUsage:
+    """Disk usage of generated images, split by whether they are referenced"""
+    store = store or get_media_store()
+    return store.usage(referenced_owners(db, store))
+
+
+def collect_media_garbage(
+    db: Session,
+    store: Optional[MediaStore] = None,
+    extra_urls: Optional[Iterable[str]] = None,
+    dry_run: bool = False
+) -> GarbageCollection:
+    """Delete generated images that are neither referenced nor younger than the grace period"""
+    store = store or get_media_store()
+    return store.collect_garbage(referenced_owners(db, store, extra_urls), dry_run)
+
+
+class MediaGarbageCollector:
+    """
+    Background task deleting unreferenced generated images every interval seconds.
+
+    The in-memory references are taken on the event loop; the database query and the
+    directory scan run in a worker thread.
+    """
+
+    def __init__(self, interval: float = settings.MEDIA_GC_INTERVAL):
+        self.interval = interval
+        self._task: Optional[asyncio.Task[None]] = None
+
+    def start(self) -> None:
+        if self.interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def collect(self) -> GarbageCollection:
+        return await asyncio.to_thread(self._collect, live_image_urls())
+
+    @staticmethod
+    def _collect(extra_urls: List[str]) -> GarbageCollection:
+        db = SessionLocal()
+        try:
+            return collect_media_garbage(db, extra_urls=extra_urls)
+        finally:
+            db.close()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.collect()
+            except Exception as e:
+                logging.exception(f"Media garbage collection failed: {e}")
+
+
+media_garbage_collector = MediaGarbageCollector()
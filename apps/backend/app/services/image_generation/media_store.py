@@ -0,0 +1,257 @@
+import logging
+import os
+import re
+import shutil
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from app.core.config import settings
+
+# Files the store may delete, anything else in the directory (e.g. the image cache index) is left alone
+MEDIA_SUFFIXES = (".png", ".jpg", ".jpeg", ".webp", ".avif", ".part")
+# Content-addressed files: <first two hex digits>/<sha256>[_<variant>].<ext>
+CONTENT_PATH = re.compile(r"^([0-9a-f]{2})/(\1[0-9a-f]{62})(?:_[^/]*)?\.[^./]+$")
+# Files of the previous flat layout: <generation id>_<ComfyUI filename>[_<variant>].<ext>
+LEGACY_PATH = re.compile(r"^[0-9a-f]{8}_[^/]+$")
+# Prefix of downloads in the staging directory among the relative paths of the store
+STAGING_PREFIX = ".staging/"
+
+
+@dataclass
+class StorageUsage:
+    """Disk usage of the media store"""
+    files: int = 0
+    bytes: int = 0
+    referenced_files: int = 0
+    referenced_bytes: int = 0
+    legacy_files: int = 0
+    by_kind: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def unreferenced_bytes(self) -> int:
+        return self.bytes - self.referenced_bytes
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "files": self.files,
+            "bytes": self.bytes,
+            "referencedFiles": self.referenced_files,
+            "referencedBytes": self.referenced_bytes,
+            "unreferencedFiles": self.files - self.referenced_files,
+            "unreferencedBytes": self.unreferenced_bytes,
+            "legacyFiles": self.legacy_files,
+            "bytesByKind": dict(self.by_kind),
+        }
+
+
+@dataclass
+class GarbageCollection:
+    """Outcome of one garbage collection"""
+    scanned: int = 0
+    deleted_files: int = 0
+    deleted_bytes: int = 0
+    # Unreferenced files kept because they are younger than the grace period
+    recent_files: int = 0
+    dry_run: bool = False
+
+
+class MediaStore:
+    """
+    Content-addressed store of generated images.
+
+    Images are stored under the SHA-256 of their content, sharded by its first two hex
+    digits, so identical images share one file. Variants are stored next to their image
+    and share its name as prefix, which makes them belong to the same owner.
+
+    Files are collected once no reference (an image URL of a character, location, cached
+    image or reserved entity) points at their owner and they are older than the grace
+    period; publishing an existing image refreshes its mtime, so content that is about to
+    be referenced again is never collected. Files of the previous flat layout are kept
+    while referenced and collected like any other file otherwise. Anything else under the
+    root, such as the workflow reference images, is not part of the store and never touched.
+
+    Downloads are staged under CACHE_ROOT rather than the publicly served root, so partial
+    or not yet published images are never served.
+    """
+
+    def __init__(
+        self,
+        root: Optional[Path] = None,
+        media_prefix: str = "/media/comfyui",
+        grace_period: float = settings.MEDIA_GC_GRACE_PERIOD,
+        staging_dir: Optional[Path] = None
+    ):
+        self.root = root or Path(settings.MEDIA_ROOT) / "comfyui"
+        self.media_prefix = media_prefix.rstrip("/")
+        self.grace_period = grace_period
+        self.staging_dir = staging_dir or Path(settings.CACHE_ROOT) / "media_staging"
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+
+    def staging_path(self, name: str) -> Path:
+        """Location to download a new image to before it is published"""
+        return self.staging_dir / name
+
+    def publish(self, staged: Path, sha256: str) -> Tuple[Path, str]:
+        """
+        Move a downloaded image to its content address.
+
+        Args:
+            staged: Downloaded image, removed if the content is already stored
+            sha256: Hex digest of the image
+
+        Returns:
+            The stored file and the media path it is served under
+        """
+        relative = f"{sha256[:2]}/{sha256}{staged.suffix.lower()}"
+        target = self.root / relative
+        if target.exists():
+            staged.unlink(missing_ok=True)
+            os.utime(target)
+            logging.info(f"Image {sha256[:16]} is already stored, reusing {relative}")
+        else:
+            target.parent.mkdir(exist_ok=True)
+            # The staging directory may be on another file system than the store
+            shutil.move(staged, target)
+        return target, f"{self.media_prefix}/{relative}"
+
+    def file_path(self, media_path: str) -> Path:
+        """File of a media path returned by publish"""
+        return self.root / media_path[len(self.media_prefix) + 1:]
+
+    def relative_path(self, image_url: str) -> Optional[str]:
+        """
+        Path within the store of an image URL or media path, None for images elsewhere.
+
+        Only the path of a URL is matched, so URLs stored under an earlier BACKEND_URL,
+        another scheme or another host still reference their file.
+        """
+        path = urlsplit(image_url).path
+        if not path.startswith(self.media_prefix + "/"):
+            return None
+        return path[len(self.media_prefix) + 1:]
+
+    def referenced_owners(self, image_urls: Iterable[Optional[str]]) -> Set[str]:
+        """Owners of the files the given image URLs point at"""
+        owners = set()
+        for image_url in image_urls:
+            relative = self.relative_path(image_url) if image_url else None
+            if relative is not None:
+                owners.add(self._owner(relative))
+        return owners
+
+    def usage(self, referenced: Set[str]) -> StorageUsage:
+        """Disk usage, split by whether files are referenced"""
+        usage = StorageUsage()
+        for relative, stat in self._files():
+            usage.files += 1
+            usage.bytes += stat.st_size
+            kind = "staging" if relative.startswith(STAGING_PREFIX) else Path(relative).suffix.lstrip(".") or "other"
+            usage.by_kind[kind] = usage.by_kind.get(kind, 0) + stat.st_size
+            if CONTENT_PATH.match(relative) is None and not relative.startswith(STAGING_PREFIX):
+                usage.legacy_files += 1
+            if self._is_referenced(relative, referenced):
+                usage.referenced_files += 1
+                usage.referenced_bytes += stat.st_size
+        return usage
+
+    def collect_garbage(self, referenced: Set[str], dry_run: bool = False) -> GarbageCollection:
+        """
+        Delete the files of unreferenced owners that are older than the grace period.
+
+        Args:
+            referenced: Owners from referenced_owners, collected after the store was last published to
+            dry_run: Only count what would be deleted
+        """
+        result = GarbageCollection(dry_run=dry_run)
+        cutoff = time.time() - self.grace_period
+        for relative, stat in self._files():
+            result.scanned += 1
+            if self._is_referenced(relative, referenced):
+                continue
+            if stat.st_mtime > cutoff:
+                result.recent_files += 1
+                continue
+            if not dry_run:
+                try:
+                    self._path(relative).unlink()
+                except FileNotFoundError:
+                    continue
+                except OSError as e:
+                    logging.error(f"Failed to delete unreferenced media file {relative}: {e}")
+                    continue
+            result.deleted_files += 1
+            result.deleted_bytes += stat.st_size
+        verb = "Would delete" if dry_run else "Deleted"
+        logging.info(
+            f"Media GC: {verb} {result.deleted_files} of {result.scanned} files ({result.deleted_bytes} bytes), "
+            f"{result.recent_files} unreferenced files within the grace period"
+        )
+        return result
+
+    def _files(self) -> Iterator[Tuple[str, os.stat_result]]:
+        """Relative paths and stats of the media files in the store, staged downloads under STAGING_PREFIX"""
+        for base, prefix in ((self.root, ""), (self.staging_dir, STAGING_PREFIX)):
+            for directory, subdirectories, filenames in os.walk(base):
+                # The staging directory may be inside the root, it is walked on its own
+                subdirectories[:] = [name for name in subdirectories if Path(directory) / name != self.staging_dir]
+                for filename in filenames:
+                    if not filename.lower().endswith(MEDIA_SUFFIXES):
+                        continue
+                    path = Path(directory) / filename
+                    relative = prefix + path.relative_to(base).as_posix()
+                    if not self._is_stored(relative):
+                        continue
+                    try:
+                        stat = path.stat()
+                    except FileNotFoundError:
+                        continue
+                    yield relative, stat
+
+    def _path(self, relative: str) -> Path:
+        if relative.startswith(STAGING_PREFIX):
+            return self.staging_dir / relative[len(STAGING_PREFIX):]
+        return self.root / relative
+
+    @staticmethod
+    def _is_stored(relative: str) -> bool:
+        """Whether a file was written by the store: staged, content-addressed or of the flat layout"""
+        return (
+            relative.startswith(STAGING_PREFIX)
+            or CONTENT_PATH.match(relative) is not None
+            or LEGACY_PATH.match(relative) is not None
+        )
+
+    @staticmethod
+    def _owner(relative: str) -> str:
+        """The image a file belongs to: content files by digest, legacy files by their own path"""
+        match = CONTENT_PATH.match(relative)
+        if match is not None:
+            return f"{match.group(1)}/{match.group(2)}"
+        return relative.rsplit(".", 1)[0]
+
+    def _is_referenced(self, relative: str, referenced: Set[str]) -> bool:
+        if relative.startswith(STAGING_PREFIX):
+            return False
+        owner = self._owner(relative)
+        if owner in referenced:
+            return True
+        if CONTENT_PATH.match(relative) is not None:
+            return False
+        # Legacy variants are named <image stem>_<variant>
+        parts = owner.split("_")
+        return any("_".join(parts[:i]) in referenced for i in range(1, len(parts)))
+
+
+_media_store: Optional[MediaStore] = None
+
+
+def get_media_store() -> MediaStore:
+    """Shared store under MEDIA_ROOT/comfyui"""
+    global _media_store
+    if _media_store is None:
+        _media_store = MediaStore()
+    return _media_store
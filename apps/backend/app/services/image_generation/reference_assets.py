@@ -0,0 +1,118 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    from app.services.image_generation.comfyui_client import ComfyUIClient
+
+# SHA-256 of local files by (path, mtime, size), shared by all backends
+_digests: Dict[Tuple[str, int, int], str] = {}
+
+
+def file_digest(path: Path) -> str:
+    """SHA-256 of a file, recomputed only when the file changes"""
+    stat = os.stat(path)
+    key = (str(path), stat.st_mtime_ns, stat.st_size)
+    digest = _digests.get(key)
+    if digest is None:
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha256.update(chunk)
+        digest = sha256.hexdigest()
+        _digests[key] = digest
+    return digest
+
+
+def reference_name(path: Path) -> str:
+    """Name a reference image is stored under on ComfyUI backends"""
+    return f"ref_{file_digest(path)[:16]}{path.suffix.lower()}"
+
+
+@dataclass
+class _Upload:
+    name: str
+    verified_at: float
+    connection: int
+
+
+class ReferenceAssets:
+    """
+    Reference images uploaded to one ComfyUI backend.
+
+    Images are stored under a name derived from their content hash, so each unique file
+    is uploaded at most once and a changed file gets a new name. Uploads are re-verified
+    against the backend's LoadImage choices when the event feed reconnected (the backend
+    may have been restarted with a fresh input folder) or after verify_interval seconds.
+    """
+
+    def __init__(self, client: "ComfyUIClient", verify_interval: float = settings.COMFYUI_REFERENCE_VERIFY_INTERVAL):
+        self.client = client
+        self.verify_interval = verify_interval
+        self._uploads: Dict[str, _Upload] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.uploads = 0
+        self.reuses = 0
+
+    async def ensure_uploaded(self, path: Path) -> Optional[str]:
+        """
+        Make sure a local image is available on the backend.
+
+        Args:
+            path: Local reference image
+
+        Returns:
+            Server-side name to use in LoadImage nodes, None if the upload failed
+        """
+        try:
+            name = await asyncio.to_thread(reference_name, path)
+        except OSError as e:
+            logging.error(f"Failed to read reference image {path}: {e}")
+            return None
+
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            upload = self._uploads.get(name)
+            if upload is not None and not self._needs_verification(upload):
+                self.reuses += 1
+                return upload.name
+
+            if upload is not None and await self._is_available(name):
+                upload.verified_at = time.monotonic()
+                upload.connection = self._connection()
+                self.reuses += 1
+                return name
+
+            uploaded_name = await self.client.upload_image(path, overwrite=True, name=name)
+            if uploaded_name is None:
+                self._uploads.pop(name, None)
+                return None
+            self.uploads += 1
+            self._uploads[name] = _Upload(uploaded_name, time.monotonic(), self._connection())
+            logging.info(f"Reference image {path} uploaded to {self.client.base_url} as {uploaded_name}")
+            return uploaded_name
+
+    def _connection(self) -> int:
+        return self.client.events.connections if self.client.events is not None else 0
+
+    def _needs_verification(self, upload: _Upload) -> bool:
+        return (
+            upload.connection != self._connection()
+            or time.monotonic() - upload.verified_at > self.verify_interval
+        )
+
+    async def _is_available(self, name: str) -> bool:
+        """Whether the backend lists the image as a LoadImage choice"""
+        info = await self.client.get_object_info("LoadImage")
+        try:
+            choices = info["input"]["required"]["image"][0]
+        except (KeyError, IndexError, TypeError):
+            return False
+        return name in choices
@@ -0,0 +1,303 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Optional, Sequence, TypeVar
+
+from app.core.config import settings
+from app.services.image_generation.comfyui_client import ComfyUIClient
+
+T = TypeVar("T")
+
+
+class Priority(IntEnum):
+    """Priority classes of image jobs, lower values are dispatched first"""
+    INTERACTIVE = 0  # A player is waiting for the image
+    BACKGROUND = 1  # The entity was already shown with a placeholder
+    BULK = 2  # Prefetching, e.g. reservoir refills
+
+
+class NoBackendAvailableError(ConnectionError):
+    """No ComfyUI backend could run a job"""
+
+
+@dataclass
+class BackendState:
+    """Load and health of one ComfyUI backend"""
+    client: ComfyUIClient
+    max_in_flight: int
+    in_flight: int = 0
+    # Jobs queued on the backend by other clients, from the last /queue check
+    foreign_depth: int = 0
+    depth_checked_at: float = float("-inf")
+    unavailable_until: float = float("-inf")
+    completed: int = 0
+    failures: int = 0
+    # Models of the last job dispatched to the backend, and how often they changed
+    loaded_models: FrozenSet[str] = frozenset()
+    model_switches: int = 0
+
+    @property
+    def url(self) -> str:
+        return self.client.base_url
+
+    @property
+    def load(self) -> int:
+        return self.foreign_depth + self.in_flight
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.unavailable_until
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "inFlight": self.in_flight,
+            "maxInFlight": self.max_in_flight,
+            "queueDepth": self.foreign_depth,
+            "healthy": self.healthy(time.monotonic()),
+            "completed": self.completed,
+            "failures": self.failures,
+            "modelSwitches": self.model_switches,
+            "abandoned": self.client.abandoned,
+            "wastedGpuSeconds": round(self.client.wasted_gpu_seconds, 3),
+        }
+
+    def assign(self, models: FrozenSet[str]) -> None:
+        """Take a slot for a job loading models"""
+        self.in_flight += 1
+        if models and models != self.loaded_models:
+            if self.loaded_models:
+                self.model_switches += 1
+            self.loaded_models = models
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    sequence: int
+    exclude: FrozenSet[str] = field(compare=False)
+    future: "asyncio.Future[Optional[BackendState]]" = field(compare=False)
+    models: FrozenSet[str] = field(default=frozenset(), compare=False)
+    enqueued_at: float = field(default_factory=time.monotonic, compare=False)
+
+
+class ComfyUIScheduler:
+    """
+    Dispatches image jobs over several ComfyUI backends.
+
+    Jobs wait for a slot by priority class, then FIFO. Each backend runs at most
+    max_in_flight jobs of this process; among free healthy backends the one with the
+    lowest load (its /queue depth from other clients plus our in-flight jobs) is chosen.
+    Unless a job is INTERACTIVE it cannot take the last reserved_slots free slots, so
+    bulk work never starves a live scene. A job that fails with a ConnectionError marks
+    its backend unavailable for retry_cooldown seconds and is retried on another backend;
+    when no healthy backend is left, jobs fail right away instead of waiting.
+
+    Jobs name the models their workflow loads. A job goes preferably to a backend that
+    last ran the same models, and when no free backend has its models loaded, a later job
+    of the same priority class that matches one is dispatched first, so ComfyUI does not
+    swap checkpoints between every job. A job is passed over for at most affinity_max_wait
+    seconds.
+    """
+
+    def __init__(
+        self,
+        clients: Sequence[ComfyUIClient],
+        max_in_flight: int = settings.COMFYUI_MAX_IN_FLIGHT,
+        max_attempts: int = settings.COMFYUI_MAX_ATTEMPTS,
+        reserved_slots: int = settings.COMFYUI_RESERVED_INTERACTIVE_SLOTS,
+        retry_cooldown: float = 30.0,
+        depth_ttl: float = 1.0,
+        affinity_max_wait: float = settings.COMFYUI_AFFINITY_MAX_WAIT
+    ):
+        if not clients:
+            raise ValueError("At least one ComfyUI backend is required")
+        self.backends = [BackendState(client, max_in_flight) for client in clients]
+        self.max_attempts = max_attempts
+        self.retry_cooldown = retry_cooldown
+        self.depth_ttl = depth_ttl
+        self.affinity_max_wait = affinity_max_wait
+        # Never reserve the only slot, otherwise non-interactive jobs could not run at all
+        self.reserved_slots = min(reserved_slots, max(0, len(self.backends) * max_in_flight - 1))
+        self._waiters: List[_Waiter] = []
+        self._sequence = itertools.count()
+        self._refresh_lock = asyncio.Lock()
+
+    async def run(
+        self,
+        job: Callable[[ComfyUIClient], Awaitable[T]],
+        priority: Priority = Priority.INTERACTIVE,
+        models: FrozenSet[str] = frozenset()
+    ) -> T:
+        """
+        Run a job on a backend.
+
+        Args:
+            job: Called with the client of the chosen backend
+            priority: Priority class of the job
+            models: Models loaded by the job's workflow (see workflow_models)
+
+        Returns:
+            The result of the job
+
+        Raises:
+            ConnectionError: The job failed on every backend it was tried on
+        """
+        tried: List[str] = []
+        last_error: Optional[ConnectionError] = None
+        for _ in range(self.max_attempts):
+            backend = await self._acquire(priority, frozenset(tried), models)
+            if backend is None:
+                break
+            tried.append(backend.url)
+            try:
+                result = await job(backend.client)
+                backend.completed += 1
+                return result
+            except ConnectionError as e:
+                last_error = e
+                self._mark_failed(backend, e)
+            finally:
+                self._release(backend)
+        if last_error is not None:
+            raise last_error
+        raise NoBackendAvailableError("No ComfyUI backend available")
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Load and health of every backend"""
+        return [backend.stats() for backend in self.backends]
+
+    @property
+    def model_switches(self) -> int:
+        """Jobs dispatched to a backend that last ran other models"""
+        return sum(backend.model_switches for backend in self.backends)
+
+    async def close(self) -> None:
+        for backend in self.backends:
+            await backend.client.close()
+
+    async def _acquire(
+        self, priority: Priority, exclude: FrozenSet[str], models: FrozenSet[str] = frozenset()
+    ) -> Optional[BackendState]:
+        """Wait for a slot on a backend not in exclude, None if there is no such backend"""
+        await self._refresh_queue_depths()
+        future: "asyncio.Future[Optional[BackendState]]" = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, _Waiter(int(priority), next(self._sequence), exclude, future, models))
+        self._dispatch()
+        try:
+            return await future
+        except asyncio.CancelledError:
+            # The slot may have been assigned just before the cancellation
+            if future.done() and not future.cancelled() and future.result() is not None:
+                self._release(future.result())
+            raise
+
+    def _release(self, backend: BackendState) -> None:
+        backend.in_flight -= 1
+        self._dispatch()
+
+    def _mark_failed(self, backend: BackendState, error: Exception) -> None:
+        backend.failures += 1
+        backend.unavailable_until = time.monotonic() + self.retry_cooldown
+        logging.warning(f"ComfyUI backend {backend.url} failed ({error}), unavailable for {self.retry_cooldown}s")
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Assign free backends to waiters in priority order"""
+        now = time.monotonic()
+        while self._waiters:
+            waiter = self._waiters[0]
+            if waiter.future.done():
+                heapq.heappop(self._waiters)
+                continue
+
+            candidates = [
+                backend for backend in self.backends if backend.url not in waiter.exclude and backend.healthy(now)
+            ]
+            if not candidates:
+                heapq.heappop(self._waiters)
+                waiter.future.set_result(None)
+                continue
+
+            free = [b for b in candidates if b.in_flight < b.max_in_flight]
+            free_slots = sum(b.max_in_flight - b.in_flight for b in self.backends if b.healthy(now))
+            if not free or (waiter.priority != Priority.INTERACTIVE and free_slots <= self.reserved_slots):
+                # Waiters are served strictly in priority order
+                return
+
+            if (
+                waiter.models and now - waiter.enqueued_at < self.affinity_max_wait
+                and not any(b.loaded_models == waiter.models for b in free)
+            ):
+                affine = self._affine_waiter(waiter.priority, now)
+                if affine is not None:
+                    waiter = affine
+                    free = [b for b in self._free_backends(waiter, now) if b.loaded_models == waiter.models]
+
+            # Prefer a backend that has the job's models loaded, then the least loaded one
+            backend = min(free, key=lambda b: (b.loaded_models != waiter.models, b.load, b.in_flight))
+            backend.assign(waiter.models)
+            if waiter is self._waiters[0]:
+                heapq.heappop(self._waiters)
+            else:
+                self._waiters.remove(waiter)
+                heapq.heapify(self._waiters)
+            waiter.future.set_result(backend)
+
+    def _affine_waiter(self, priority: int, now: float) -> Optional[_Waiter]:
+        """First waiter of a priority class whose models are loaded on a free backend it may run on"""
+        for waiter in sorted(self._waiters):
+            if waiter.priority != priority:
+                break
+            if waiter.future.done() or not waiter.models:
+                continue
+            if any(b.loaded_models == waiter.models for b in self._free_backends(waiter, now)):
+                return waiter
+        return None
+
+    def _free_backends(self, waiter: _Waiter, now: float) -> List[BackendState]:
+        return [
+            b for b in self.backends
+            if b.url not in waiter.exclude and b.healthy(now) and b.in_flight < b.max_in_flight
+        ]
+
+    async def _refresh_queue_depths(self) -> None:
+        """Update the /queue depth of backends whose last check is older than depth_ttl"""
+        async with self._refresh_lock:
+            now = time.monotonic()
+            stale = [b for b in self.backends if b.healthy(now) and now - b.depth_checked_at > self.depth_ttl]
+            if not stale:
+                return
+            results = await asyncio.gather(
+                *(backend.client.get_queue_depth() for backend in stale), return_exceptions=True
+            )
+            for backend, result in zip(stale, results):
+                backend.depth_checked_at = time.monotonic()
+                if isinstance(result, BaseException):
+                    # Only failed jobs mark a backend unavailable, the last known depth is kept
+                    logging.warning(f"Failed to get the queue depth of {backend.url}: {result}")
+                else:
+                    backend.foreign_depth = max(0, result - backend.in_flight)
+
+
+_scheduler: Optional[ComfyUIScheduler] = None
+
+
+def get_comfyui_scheduler() -> ComfyUIScheduler:
+    """Shared scheduler over the backends in settings.COMFYUI_API_URLS"""
+    global _scheduler
+    if _scheduler is None:
+        urls = settings.COMFYUI_API_URLS or [""]
+        _scheduler = ComfyUIScheduler([ComfyUIClient(base_url=url) for url in urls])
+    return _scheduler
+
+
+async def close_comfyui_scheduler() -> None:
+    """Close the connections to all backends, called on application shutdown"""
+    global _scheduler
+    if _scheduler is not None:
+        await _scheduler.close()
+        _scheduler = None
@@ -0,0 +1,75 @@
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Nodes that write an image per workflow and must never be shared between workflows
+OUTPUT_NODE_TYPES = ("SaveImage", "PreviewImage")
+
+
+def is_link(value: Any) -> bool:
+    """Whether an input value is a link [node id, output index] to another node"""
+    return isinstance(value, list) and len(value) == 2 and isinstance(value[0], str) and isinstance(value[1], int)
+
+
+def _topological_order(workflow: Dict[str, Any]) -> List[str]:
+    """Node ids of a workflow so that every node comes after the nodes it links to"""
+    order: List[str] = []
+    visited = set()
+
+    def visit(node_id: str) -> None:
+        if node_id in visited or node_id not in workflow:
+            return
+        visited.add(node_id)
+        for value in workflow[node_id].get("inputs", {}).values():
+            if is_link(value):
+                visit(value[0])
+        order.append(node_id)
+
+    for node_id in workflow:
+        visit(node_id)
+    return order
+
+
+def merge_workflows(workflows: Sequence[Dict[str, Any]]) -> Tuple[Dict[str, Any], List[Optional[str]]]:
+    """
+    Merge workflows into one graph that ComfyUI runs as a single prompt.
+
+    Nodes are renumbered, and a node with the same type and inputs as a node already in the
+    merged graph (after its links were renumbered) is replaced by that node, so a checkpoint
+    loaded by every workflow is loaded once and an unchanged negative prompt or reference
+    image is encoded once. Output nodes are never shared.
+
+    Args:
+        workflows: API-format workflows, left unchanged
+
+    Returns:
+        The merged workflow, and for each workflow the id of its SaveImage node in the
+        merged graph, None for workflows without one
+    """
+    merged: Dict[str, Any] = {}
+    shared: Dict[str, str] = {}
+    save_nodes: List[Optional[str]] = []
+    for workflow in workflows:
+        renumbered: Dict[str, str] = {}
+        for node_id in _topological_order(workflow):
+            node = workflow[node_id]
+            inputs = {
+                name: [renumbered[value[0]], value[1]] if is_link(value) and value[0] in renumbered else value
+                for name, value in node.get("inputs", {}).items()
+            }
+            signature = None
+            if node.get("class_type") not in OUTPUT_NODE_TYPES:
+                signature = json.dumps([node.get("class_type"), inputs], sort_keys=True, default=str)
+                if signature in shared:
+                    renumbered[node_id] = shared[signature]
+                    continue
+
+            merged_id = str(len(merged) + 1)
+            merged[merged_id] = {**node, "inputs": inputs}
+            renumbered[node_id] = merged_id
+            if signature is not None:
+                shared[signature] = merged_id
+
+        save_node = next((node_id for node_id, node in workflow.items() if node.get("class_type") == "SaveImage"), None)
+        save_nodes.append(renumbered.get(save_node) if save_node is not None else None)
+    return merged, save_nodes
+
@@ -25,4 +25,10 @@ class WorkflowLoaderFactory:
         else:
             # Default to character if unknown
             logging.warning(f"Unknown context type: {context_type}, using character workflow")
-            return CharacterWorkflowLoader() 
\ No newline at end of file
+            return CharacterWorkflowLoader() 
+
+    @staticmethod
+    def preload_templates() -> None:
+        """Compile the workflow templates of all contexts, so the first image does not pay for it"""
+        for loader in (CharacterWorkflowLoader(), LocationWorkflowLoader()):
+            loader._load_template(loader.workflow_file)
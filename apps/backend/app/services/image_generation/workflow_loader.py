@@ -1,76 +1,93 @@
-import json
+import hashlib
 import random
-import logging
 from abc import ABC, abstractmethod
 from typing import Dict, Any, Optional
 from pathlib import Path
 from app.core.config import settings
+from .generation_profiles import GenerationProfile, get_generation_profile
+from .workflow_templates import CompiledWorkflow, workflow_templates
 
 
 class WorkflowLoader(ABC):
     """Abstract base class for loading ComfyUI workflows from JSON files"""
+
+    # Context of the workflow, selects the default generation profile
+    context_type = "character"
     
     def __init__(self):
         """Initialize the workflow loader"""
         self.workflow_dir = Path(settings.COMFYUI_WORKFLOWS_DIR)
+        self._random = random.Random()
+        self.profile: GenerationProfile = get_generation_profile(None, self.context_type)
+
+    def pin_seed(self, prompt: str) -> None:
+        """
+        Derive the seed from the prompt, so the same prompt always produces the same workflow
+        """
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        self._random = random.Random(int.from_bytes(digest[:8], "big"))
+
+    def use_profile(self, name: Optional[str]) -> None:
+        """
+        Sample with a named generation profile, None for the default profile of the context
+
+        Raises:
+            ValueError: The profile does not exist
+        """
+        self.profile = get_generation_profile(name, self.context_type)
     
+    def reference_image_path(self) -> Optional[Path]:
+        """Local reference image that must be uploaded to ComfyUI before the workflow is queued"""
+        return None
+
     @abstractmethod
-    def load_workflow(self, prompt: str, generation_id: str) -> Dict[str, Any]:
+    def load_workflow(self, prompt: str, generation_id: str, reference_image: Optional[str] = None) -> Dict[str, Any]:
         """
         Load a workflow from a JSON file and customize it with the given prompt
         
         Args:
             prompt: Text prompt for image generation
             generation_id: Unique ID for the generation
+            reference_image: Server-side name of the uploaded reference image, if any
             
         Returns:
             Workflow dictionary ready to be sent to ComfyUI
         """
         pass
     
-    def _load_workflow_file(self, filename: str) -> Dict[str, Any]:
+    def _load_template(self, filename: str) -> Optional[CompiledWorkflow]:
         """
-        Load a workflow from a JSON file
+        Get the compiled template of a workflow file
         
         Args:
             filename: Name of the JSON file to load
             
         Returns:
-            Loaded workflow as a dictionary
+            Compiled template, parsed once and reloaded when the file changes, or None
         """
-        filepath = self.workflow_dir / filename
-        try:
-            with open(filepath, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            logging.error(f"Workflow file not found: {filepath}")
-            # Return an empty workflow as fallback
-            return {}
-        except json.JSONDecodeError:
-            logging.error(f"Invalid JSON in workflow file: {filepath}")
-            return {}
+        return workflow_templates.get(self.workflow_dir / filename)
+
+    def _set_filename_prefix(self, template: CompiledWorkflow, workflow: Dict[str, Any], prefix: str) -> None:
+        """Set the prefix of the saved image, adding a SaveImage node to templates without one"""
+        if template.save_node is not None:
+            workflow[template.save_node]["inputs"]["filename_prefix"] = prefix
+        elif template.output_node is not None:
+            # If no SaveImage node, add one connecting to the output node
+            workflow[template.next_node_id] = {
+                "class_type": "SaveImage",
+                "inputs": {
+                    "filename_prefix": prefix,
+                    "images": [template.output_node, 0]
+                }
+            }
     
     def _generate_random_seed(self) -> int:
         """Generate a random seed for the workflow"""
-        return random.randint(1, 2147483647)
-    
-    def _get_random_sampler(self) -> str:
-        """Get a random sampler for the workflow"""
-        samplers = ["euler", "euler_ancestral", "heun",
-                    "dpm_2", "dpm_2_ancestral", "lms", "ddim"]
-        return random.choice(samplers)
-    
-    def _get_random_steps(self) -> int:
-        """Get a random number of steps for the workflow"""
-        return random.randint(20, 40)
-    
-    def _get_random_cfg(self) -> float:
-        """Get a random CFG value for the workflow"""
-        return round(random.uniform(6.5, 8.5), 1)
+        return self._random.randint(1, 2147483647)
     
-    def _find_output_node_id(self, workflow: Dict[str, Any]) -> Optional[str]:
-        """Find the ID of the output node in the workflow"""
-        for node_id, node in workflow.items():
-            if node.get("class_type") in ["VAEDecode", "PreviewImage"]:
-                return node_id
-        return None 
\ No newline at end of file
+    def _apply_profile(self, inputs: Dict[str, Any]) -> None:
+        """Set the sampler, scheduler, steps and CFG of a KSampler node from the generation profile"""
+        inputs["sampler_name"] = self.profile.sampler_name
+        inputs["scheduler"] = self.profile.scheduler
+        inputs["steps"] = self.profile.steps
+        inputs["cfg"] = self.profile.cfg
@@ -0,0 +1,29 @@
+from typing import Any, Dict, FrozenSet
+
+# Inputs of model-loader nodes naming the model files they load
+MODEL_LOADER_INPUTS = {
+    "CheckpointLoaderSimple": ("ckpt_name",),
+    "CheckpointLoader": ("ckpt_name",),
+    "UNETLoader": ("unet_name",),
+    "VAELoader": ("vae_name",),
+    "LoraLoader": ("lora_name",),
+    "LoraLoaderModelOnly": ("lora_name",),
+    "ControlNetLoader": ("control_net_name",),
+}
+
+
+def workflow_models(workflow: Dict[str, Any]) -> FrozenSet[str]:
+    """
+    Model files loaded by a workflow, as "<loader type>:<file>".
+
+    Jobs with the same models run back to back on a backend without ComfyUI swapping
+    models in and out of GPU memory.
+    """
+    models = set()
+    for node in workflow.values():
+        class_type = node.get("class_type")
+        for name in MODEL_LOADER_INPUTS.get(class_type, ()):
+            value = node.get("inputs", {}).get(name)
+            if isinstance(value, str):
+                models.add(f"{class_type}:{value}")
+    return frozenset(models)
@@ -0,0 +1,45 @@
+from typing import Any, Dict
+
+from app.services.image_generation.workflow_batch import is_link
+
+
+def _preview_size(size: Any, scale: float) -> Any:
+    """A latent image side scaled down, kept a multiple of 8 and at least 64 pixels"""
+    if not isinstance(size, int):
+        return size
+    return max(64, int(size * scale) // 8 * 8)
+
+
+def preview_workflow(workflow: Dict[str, Any], steps: int, scale: float) -> Dict[str, Any]:
+    """
+    Copy of a workflow rendering a quick, provisional version of its image.
+
+    Samplers run at most steps steps, empty latent images are scaled by scale, and images
+    encoded into latents (e.g. reference images) are scaled down before encoding. Saved
+    images get the filename prefix "preview_".
+
+    Args:
+        workflow: API-format workflow, left unchanged
+        steps: Maximum sampling steps
+        scale: Factor for the image size
+    """
+    preview = {node_id: {**node, "inputs": dict(node.get("inputs", {}))} for node_id, node in workflow.items()}
+    next_id = max((int(node_id) for node_id in preview if node_id.isdigit()), default=0) + 1
+    for node_id, node in list(preview.items()):
+        class_type = node.get("class_type")
+        inputs = node["inputs"]
+        if class_type == "KSampler" and isinstance(inputs.get("steps"), int):
+            inputs["steps"] = min(inputs["steps"], steps)
+        elif class_type == "EmptyLatentImage":
+            inputs["width"] = _preview_size(inputs.get("width"), scale)
+            inputs["height"] = _preview_size(inputs.get("height"), scale)
+        elif class_type == "VAEEncode" and is_link(inputs.get("pixels")) and scale < 1:
+            preview[str(next_id)] = {
+                "class_type": "ImageScaleBy",
+                "inputs": {"image": inputs["pixels"], "upscale_method": "bilinear", "scale_by": scale},
+            }
+            inputs["pixels"] = [str(next_id), 0]
+            next_id += 1
+        elif class_type == "SaveImage":
+            inputs["filename_prefix"] = f"preview_{inputs.get('filename_prefix', 'ComfyUI')}"
+    return preview
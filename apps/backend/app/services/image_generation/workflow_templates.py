@@ -0,0 +1,125 @@
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class CompiledWorkflow:
+    """
+    A parsed workflow template with the ids of the nodes that are patched per image.
+
+    The template itself is never modified; instantiate returns a copy in which only the
+    node dicts and their inputs are new objects. Input values such as node links are
+    shared with the template, so patches must replace inputs instead of mutating them.
+    """
+    path: Path
+    mtime_ns: int
+    nodes: Dict[str, Dict[str, Any]]
+    prompt_nodes: Tuple[str, ...] = ()
+    sampler_nodes: Tuple[str, ...] = ()
+    load_image_nodes: Tuple[str, ...] = ()
+    save_node: Optional[str] = None
+    output_node: Optional[str] = None
+    # Id for a SaveImage node added to templates without one
+    next_node_id: str = field(default="1")
+
+    @classmethod
+    def compile(cls, path: Path) -> "CompiledWorkflow":
+        """
+        Parse a workflow file and index its patch points.
+
+        Raises:
+            OSError: The file cannot be read
+            ValueError: The file is not valid JSON
+        """
+        mtime_ns = os.stat(path).st_mtime_ns
+        with open(path, "r") as f:
+            nodes: Dict[str, Dict[str, Any]] = json.load(f)
+
+        prompt_nodes: List[str] = []
+        sampler_nodes: List[str] = []
+        load_image_nodes: List[str] = []
+        save_node = None
+        output_node = None
+        for node_id, node in nodes.items():
+            class_type = node.get("class_type")
+            inputs = node.get("inputs", {})
+            # Empty texts are negative prompts and are kept as they are
+            if class_type == "CLIPTextEncode" and inputs.get("text", "") != "":
+                prompt_nodes.append(node_id)
+            elif class_type == "KSampler":
+                sampler_nodes.append(node_id)
+            elif class_type == "LoadImage":
+                load_image_nodes.append(node_id)
+            elif class_type == "SaveImage" and save_node is None:
+                save_node = node_id
+            if class_type in ("VAEDecode", "PreviewImage") and output_node is None:
+                output_node = node_id
+
+        numeric_ids = [int(node_id) for node_id in nodes if node_id.isdigit()]
+        return cls(
+            path=path,
+            mtime_ns=mtime_ns,
+            nodes=nodes,
+            prompt_nodes=tuple(prompt_nodes),
+            sampler_nodes=tuple(sampler_nodes),
+            load_image_nodes=tuple(load_image_nodes),
+            save_node=save_node,
+            output_node=output_node,
+            next_node_id=str(max(numeric_ids, default=0) + 1),
+        )
+
+    def instantiate(self) -> Dict[str, Any]:
+        """A copy of the workflow that can be patched without touching the template"""
+        return {node_id: {**node, "inputs": dict(node.get("inputs", {}))} for node_id, node in self.nodes.items()}
+
+
+class WorkflowTemplates:
+    """
+    Compiled workflow templates by file path.
+
+    Each lookup only stats the file; templates are recompiled when the file changed on disk.
+    """
+
+    def __init__(self):
+        self._templates: Dict[Path, CompiledWorkflow] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: Path) -> Optional[CompiledWorkflow]:
+        """Return the compiled template of a workflow file, None if it is missing or invalid"""
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            logging.error(f"Workflow file not found: {path}")
+            return None
+
+        template = self._templates.get(path)
+        if template is not None and template.mtime_ns == mtime_ns:
+            return template
+
+        with self._lock:
+            template = self._templates.get(path)
+            if template is not None and template.mtime_ns == mtime_ns:
+                return template
+            try:
+                template = CompiledWorkflow.compile(path)
+            except FileNotFoundError:
+                logging.error(f"Workflow file not found: {path}")
+                return None
+            except (json.JSONDecodeError, AttributeError):
+                logging.error(f"Invalid JSON in workflow file: {path}")
+                return None
+            logging.info(f"Compiled workflow template {path}")
+            self._templates[path] = template
+            return template
+
+    def clear(self) -> None:
+        with self._lock:
+            self._templates.clear()
+
+
+workflow_templates = WorkflowTemplates()
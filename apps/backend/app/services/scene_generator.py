@@ -1,11 +1,17 @@
 from typing import List, Dict, Any, Optional, Coroutine, Callable
 import logging
 import asyncio
+from contextlib import nullcontext
 
 from app.services.llm import LLMService, ModelName
 from app.schemas.scene_generator import SceneGeneratorState, SceneGenerationResult
 from app.services.game_engine.tools.location_generator import LocationGenerator
 from app.services.game_engine.tools.character_generator import CharacterGenerator
+from app.services.game_engine.tools.deferred_images import ImageProgressCallback, ImageReadyCallback
+from app.services.game_engine.orchestrators.entity_reservoir import EntityReservoir
+from app.services.image_generation.image_batch import ImageBatch
+from app.services.image_generation.image_variants import get_image_variants
+from app.core.config import settings
 from app.schemas.story_generation import Story, Location, Character, Scene
 from langfuse.decorators import observe  # type: ignore
 from langfuse import Langfuse  # type: ignore
@@ -13,13 +19,20 @@ from sqlalchemy.orm import Session
 from app.models.scene import Scene as SceneModel
 from app.crud import scenes as scenes_crud
 from app.crud import characters as characters_crud
+from app.db.unit_of_work import UnitOfWork
 from app.utils.model_converters import convert_character
+from app.services.scene_prompt_builder import ScenePromptBuilder
+from app.prompts.scene_narration import (
+    SCENE_NARRATION_SYSTEM_PROMPT,
+    SCENE_NARRATION_USER_PROMPT_TEMPLATE,
+)
 
 
 # Define callback type hints
 LocationCallback = Callable[[Location], Coroutine[Any, Any, None]]
 CharacterCallback = Callable[[Character], Coroutine[Any, Any, None]]
 ActionCallback = Callable[[str, Optional[str]], Coroutine[Any, Any, None]]
+DescriptionDeltaCallback = Callable[[str], Coroutine[Any, Any, None]]
 
 
 class SceneGeneratorAgent:
@@ -33,6 +46,13 @@ class SceneGeneratorAgent:
         on_location_added: Optional[LocationCallback] = None,
         on_character_added: Optional[CharacterCallback] = None,
         on_action_changed: Optional[ActionCallback] = None,
+        on_description_delta: Optional[DescriptionDeltaCallback] = None,
+        on_location_image_ready: Optional[ImageReadyCallback] = None,
+        on_character_image_ready: Optional[ImageReadyCallback] = None,
+        on_image_progress: Optional[ImageProgressCallback] = None,
+        on_location_image_preview: Optional[ImageReadyCallback] = None,
+        on_character_image_preview: Optional[ImageReadyCallback] = None,
+        reservoir: Optional[EntityReservoir] = None,
         db_session: Optional[Session] = None
     ):
         """
@@ -45,18 +65,45 @@ class SceneGeneratorAgent:
             on_location_added: Async callback triggered when a location is added/selected.
             on_character_added: Async callback triggered when a character is added/selected.
             on_action_changed: Async callback triggered when the agent's current action changes.
+            on_description_delta: Async callback triggered for each streamed chunk of the scene description.
+            on_location_image_ready: Async callback triggered with the location UUID and image URL once
+                the image of a newly generated location is ready.
+            on_character_image_ready: Async callback triggered with the character UUID and image URL once
+                the image of a newly generated character is ready.
+            on_image_progress: Async callback triggered with the ComfyUI progress of every image being generated.
+            on_location_image_preview: Async callback triggered with the location UUID and a provisional image URL
+                once a quick preview of the image of a newly generated location is ready.
+            on_character_image_preview: Async callback triggered with the character UUID and a provisional image URL
+                once a quick preview of the image of a newly generated character is ready.
+            reservoir: Pre-generated NPCs and locations of the story the agent can claim instead of generating.
             db_session: Database session for saving data
         """
         self.llm = llm_service
         self.story = story
         self.player = player
-        self.location_generator = LocationGenerator(llm_service, db_session)
-        self.character_generator = CharacterGenerator(llm_service, db_session)
+        # New locations and characters are written together with the scene in one transaction
+        self.unit_of_work = UnitOfWork(db_session) if db_session is not None else None
+        # The images of the entities created in one agent step are generated as one ComfyUI job
+        self.image_batch = ImageBatch() if settings.COMFYUI_SCENE_BATCHING else None
+        # Previews are only rendered when someone is waiting for them
+        self.location_generator = LocationGenerator(
+            llm_service, db_session, self.unit_of_work, on_image_progress,
+            image_batch=self.image_batch, on_image_preview=on_location_image_preview
+        )
+        self.character_generator = CharacterGenerator(
+            llm_service, db_session, self.unit_of_work, on_image_progress,
+            image_batch=self.image_batch, on_image_preview=on_character_image_preview
+        )
         self.tools = self._register_tools()
+        self.prompt_builder = ScenePromptBuilder()
         self.langfuse = Langfuse()
         self.on_location_added = on_location_added
         self.on_character_added = on_character_added
         self.on_action_changed = on_action_changed
+        self.on_description_delta = on_description_delta
+        self.on_location_image_ready = on_location_image_ready
+        self.on_character_image_ready = on_character_image_ready
+        self.reservoir = reservoir
         self.db_session = db_session
         
         # Initialize with empty state
@@ -85,6 +132,14 @@ class SceneGeneratorAgent:
                     "existing_location_id": {
                         "type": "string", 
                         "description": "UUID of existing location to use (optional)"
+                    },
+                    "reserved_location_id": {
+                        "type": "string",
+                        "description": "UUID of a reserved location to introduce instantly instead of generating one (optional)"
+                    },
+                    "new_name": {
+                        "type": "string",
+                        "description": "New name for the reserved location (optional)"
                     }
                 },
                 "required": []
@@ -110,6 +165,14 @@ class SceneGeneratorAgent:
                     "existing_character_id": {
                         "type": "string",
                         "description": "UUID of existing character to use (optional)"
+                    },
+                    "reserved_character_id": {
+                        "type": "string",
+                        "description": "UUID of a reserved character to introduce instantly instead of generating one (optional)"
+                    },
+                    "new_name": {
+                        "type": "string",
+                        "description": "New name for the reserved character (optional)"
                     }
                 },
                 "required": []
@@ -118,16 +181,16 @@ class SceneGeneratorAgent:
         
         finalize_scene = LLMService.create_tool({
             "name": "finalize_scene",
-            "description": "Complete the scene with selected characters and location",
+            "description": "Complete the scene with selected characters and location. The full scene description is narrated to the player afterwards.",
             "parameters": {
                 "type": "object",
                 "properties": {
-                    "description": {
+                    "outline": {
                         "type": "string", 
-                        "description": "Compelling scene description to display to the user"
+                        "description": "Short outline (2-3 sentences) of what happens in the scene"
                     },
                 },
-                "required": ["description"]
+                "required": ["outline"]
             }
         })
         
@@ -187,6 +250,9 @@ class SceneGeneratorAgent:
         Returns:
             A dictionary containing the generated scene
         """
+        if self.unit_of_work is not None:
+            self.unit_of_work.discard()
+
         # Update state with current data
         self.state = SceneGeneratorState(
             story=self.story,
@@ -204,7 +270,9 @@ class SceneGeneratorAgent:
             # Update scene status to "generating" during generation process
             await self._update_action("scene_status", "Generating new scene...")
             
-            result = await self._run_agent_loop()
+            # The reservoir is not refilled while the scene is being generated
+            async with self.reservoir.busy() if self.reservoir else nullcontext():
+                result = await self._run_agent_loop()
             
             # Save the scene to the database if a session is available
             if self.db_session and self.story.id is not None:
@@ -240,6 +308,8 @@ class SceneGeneratorAgent:
         <tool_usage>
         Use the generate_location tool to select or create a location, generate_character tool to select or create characters, and finalize_scene tool to complete the scene.
         Only call finalize_scene after you have selected both location and at least one character.
+        Reserved characters and locations are already fully generated and are introduced instantly. When one fits the scene,
+        prefer it over generating a new one by passing its UUID as reserved_character_id or reserved_location_id; you may rename it with new_name.
         If you are not sure about what to do next, think step by step and use the appropriate tool.
         </tool_usage>
 
@@ -313,11 +383,27 @@ class SceneGeneratorAgent:
                     tasks: List[Coroutine[Any, Any, None]] = []
                     for call in location_calls:
                         tasks.append(self._handle_location_generation(call["arguments"]))
+                    # New characters requested in the same step are generated as one batch
+                    draft_calls = [
+                        call for call in character_calls
+                        if call["arguments"].get("character_draft")
+                        and not call["arguments"].get("existing_character_id")
+                        and not call["arguments"].get("reserved_character_id")
+                    ]
+                    if len(draft_calls) > 1:
+                        tasks.append(self._handle_character_batch_generation(
+                            [call["arguments"]["character_draft"] for call in draft_calls]
+                        ))
                     for call in character_calls:
-                        tasks.append(self._handle_character_generation(call["arguments"]))
+                        if len(draft_calls) <= 1 or call not in draft_calls:
+                            tasks.append(self._handle_character_generation(call["arguments"]))
                     
                     if tasks:
-                        await asyncio.gather(*tasks)
+                        try:
+                            await asyncio.gather(*tasks)
+                        finally:
+                            if self.image_batch is not None:
+                                self.image_batch.submit()
                         
                         # Log results after parallel processing
                         if location_calls:
@@ -331,7 +417,7 @@ class SceneGeneratorAgent:
                         # Clear any previous error
                         self.state.finalize_scene_error = None
                         try:
-                            self.state.scene_description = call["arguments"]["description"]
+                            self.state.scene_outline = call["arguments"]["outline"]
                             scene_complete = True
                             logging.info(f"Agent step {step_count}: Scene finalized")
                             break
@@ -347,6 +433,9 @@ class SceneGeneratorAgent:
                 logging.warning(f"Scene generation hit maximum steps ({max_steps}) without completion")
                 # Return whatever we have so far
                 self.state.scene_description = self.state.scene_description or "Scene generation timed out before completion."
+            else:
+                # Stream the final description to the client while it is being written
+                self.state.scene_description = await self._narrate_scene()
             
             # Make sure any lingering actions are removed
             for action_type in list(dict(self.state.active_actions).keys()):
@@ -391,15 +480,39 @@ class SceneGeneratorAgent:
                  return
 
 
+        # Claim a pre-generated location from the reservoir
+        elif args.get("reserved_location_id") and self.reservoir:
+            await self._update_action("location", f"Introducing reserved location with UUID: {args['reserved_location_id']}")
+            selected_location = self.reservoir.claim_location(args["reserved_location_id"], args.get("new_name"))
+            if not selected_location:
+                error_msg = f"Reserved location with UUID {args['reserved_location_id']} is no longer available"
+                logging.warning(error_msg)
+                self.state.location_generation_error = error_msg
+                await self._remove_action("location")
+                return
+            try:
+                if self.story.id is not None and self.db_session is not None:
+                    await self.location_generator.save_location(selected_location, self.story.id)
+            except Exception as e:
+                error_msg = f"Error saving reserved location: {e}"
+                logging.error(error_msg)
+                self.state.location_generation_error = error_msg
+                await self._remove_action("location")
+                return
+            self.state.locations_pool = [*self.state.locations_pool, selected_location]
+
         # Otherwise, we need to generate a new location using LocationGenerator
         elif "brief_description" in args and args["brief_description"]:
             await self._update_action("location", f"Creating new location: {args['brief_description']}")
             brief_description = args["brief_description"]
+            if self.reservoir:
+                self.reservoir.record_miss("location")
             try:
                 # Generate a new location using the LocationGenerator
                 new_location = await self.location_generator.generate_location(
                     story=self.story,
-                    description=brief_description
+                    description=brief_description,
+                    on_image_ready=self._handle_location_image_ready
                 )
                 selected_location = new_location
 
@@ -410,7 +523,7 @@ class SceneGeneratorAgent:
                 await self._remove_action("location")
                 return
         else:
-             error_msg = "Location generation requires either 'existing_location_id' or 'brief_description'."
+             error_msg = "Location generation requires either 'existing_location_id', 'reserved_location_id' or 'brief_description'."
              logging.warning(error_msg)
              self.state.location_generation_error = error_msg
              await self._remove_action("location")
@@ -517,6 +630,38 @@ class SceneGeneratorAgent:
                 logging.info(f"Character {found_character.name} already selected.")
                 await self._remove_action("character")
 
+        # Claim a pre-generated character from the reservoir
+        elif args.get("reserved_character_id") and self.reservoir:
+            await self._update_action("character", f"Introducing reserved character with UUID: {args['reserved_character_id']}")
+
+            if len(self.state.selected_characters) >= 3:
+                logging.warning("Cannot introduce reserved character, maximum number of characters (3) already selected.")
+                self.state.character_generation_error = "Maximum number of characters already selected."
+                await self._remove_action("character")
+                return
+
+            reserved_character = self.reservoir.claim_character(args["reserved_character_id"], args.get("new_name"))
+            if not reserved_character:
+                error_msg = f"Reserved character with UUID {args['reserved_character_id']} is no longer available"
+                logging.warning(error_msg)
+                self.state.character_generation_error = error_msg
+                await self._remove_action("character")
+                return
+
+            try:
+                if self.story.id is not None and self.db_session is not None:
+                    await self.character_generator.save_character(reserved_character, self.story.id)
+            except Exception as e:
+                error_msg = f"Error saving reserved character: {e}"
+                logging.error(error_msg)
+                self.state.character_generation_error = error_msg
+                await self._remove_action("character")
+                return
+
+            self.state.selected_characters = [*self.state.selected_characters, reserved_character]
+            self.state.characters_pool = [*self.state.characters_pool, reserved_character]
+            added_character = reserved_character
+
         # Otherwise, generate a new character if we have a draft
         elif "character_draft" in args and args["character_draft"]:
             draft_data = args["character_draft"]
@@ -536,12 +681,16 @@ class SceneGeneratorAgent:
                 await self._remove_action("character")
                 return
 
+            if self.reservoir:
+                self.reservoir.record_miss("character")
+
             try:
                 # Generate a new character using the CharacterGenerator
                 new_character = await self.character_generator.generate_character(
                     character_draft=draft_data,
                     story=self.story,
-                    is_player=False
+                    is_player=False,
+                    on_image_ready=self._handle_character_image_ready
                 )
 
                 # Add to selected characters
@@ -560,7 +709,7 @@ class SceneGeneratorAgent:
                 await self._remove_action("character")
                 return
         else:
-            error_msg = "Character generation requires either 'existing_character_id' or 'character_draft'."
+            error_msg = "Character generation requires either 'existing_character_id', 'reserved_character_id' or 'character_draft'."
             logging.warning(error_msg)
             self.state.character_generation_error = error_msg
             await self._remove_action("character")
@@ -576,139 +725,170 @@ class SceneGeneratorAgent:
         # Remove the action since it's complete
         await self._remove_action("character")
 
-    
+    @observe(name="handle_character_batch_generation")
+    async def _handle_character_batch_generation(self, drafts: List[Dict[str, Any]]) -> None:
+        """Handle several generate_character tool calls with new character drafts in one batch"""
+        self.state.character_generation_error = None
+        errors: List[str] = []
+
+        # Same restrictions as for single drafts
+        allowed_drafts: List[Dict[str, Any]] = []
+        for draft in drafts:
+            if draft["name"] == self.player.name or draft.get("role") == 'player':
+                errors.append(f"Cannot generate character with same name or role as player ({draft['name']})")
+            else:
+                allowed_drafts.append(draft)
+        free_slots = max(0, 3 - len(self.state.selected_characters))
+        if len(allowed_drafts) > free_slots:
+            errors.append("Maximum number of characters already selected.")
+            allowed_drafts = allowed_drafts[:free_slots]
+
+        if allowed_drafts:
+            names = ", ".join(draft["name"] for draft in allowed_drafts)
+            await self._update_action("character", f"Creating new characters: {names}")
+            if self.reservoir:
+                for _ in allowed_drafts:
+                    self.reservoir.record_miss("character")
+
+            try:
+                new_characters = await self.character_generator.generate_characters(
+                    allowed_drafts,
+                    self.story,
+                    is_player=False,
+                    on_image_ready=self._handle_character_image_ready
+                )
+            except Exception as e:
+                logging.error(f"Error generating characters: {e}", exc_info=True)
+                errors.append(f"Error generating characters: {e}")
+                new_characters = []
+
+            self.state.selected_characters = [*self.state.selected_characters, *new_characters]
+            self.state.characters_pool = [*self.state.characters_pool, *new_characters]
+            for character in new_characters:
+                if self.on_character_added:
+                    try:
+                        await self.on_character_added(character)
+                    except Exception as e:
+                        logging.error(f"Error executing on_character_added callback: {e}")
+
+        if errors:
+            logging.warning(f"Character batch generation errors: {errors}")
+            self.state.character_generation_error = " ".join(errors)
+        await self._remove_action("character")
+
+    async def _handle_location_image_ready(self, location_uuid: str, image_url: str) -> None:
+        """Replace the placeholder image of a generated location and notify the caller"""
+        for location in [self.state.selected_location, *self.state.locations_pool]:
+            if location is not None and location.uuid == location_uuid:
+                location.imageUrl = image_url
+                location.imageVariants = get_image_variants().urls(image_url)
+        if self.on_location_image_ready:
+            await self.on_location_image_ready(location_uuid, image_url)
+
+    async def _handle_character_image_ready(self, character_uuid: str, image_url: str) -> None:
+        """Replace the placeholder image of a generated character and notify the caller"""
+        for character in [*self.state.selected_characters, *self.state.characters_pool]:
+            if character.uuid == character_uuid:
+                character.imageUrl = image_url
+                character.imageVariants = get_image_variants().urls(image_url)
+        if self.on_character_image_ready:
+            await self.on_character_image_ready(character_uuid, image_url)
+
+    @property
+    def pending_images(self) -> int:
+        """Number of character and location images still being generated in the background"""
+        return self.location_generator.deferred_images.pending + self.character_generator.deferred_images.pending
+
+    async def wait_for_pending_images(self, timeout: Optional[float] = None) -> None:
+        """Wait until the background image generations of this agent have finished"""
+        await asyncio.gather(
+            self.location_generator.deferred_images.wait(timeout),
+            self.character_generator.deferred_images.wait(timeout)
+        )
+
+    def cancel_pending_images(self) -> None:
+        """Cancel the background image generations of this agent"""
+        self.location_generator.deferred_images.cancel()
+        self.character_generator.deferred_images.cancel()
+        if self.image_batch is not None:
+            self.image_batch.cancel()
+
+    @observe(name="narrate_scene")
+    async def _narrate_scene(self) -> str:
+        """
+        Write the final scene description from the outline, streaming it chunk by chunk
+        through the on_description_delta callback.
+
+        Returns:
+            The complete scene description (the outline if narration fails)
+        """
+        outline = self.state.scene_outline or ""
+        await self._update_action("narration", "Narrating the scene...")
+
+        location = self.state.selected_location
+        characters = "\n".join(
+            f"- {character.name}: {character.description}" for character in self.state.selected_characters
+        ) or "None"
+        previous_scene = self.state.previous_scene.description if self.state.previous_scene else "None"
+
+        user_prompt = SCENE_NARRATION_USER_PROMPT_TEMPLATE.format(
+            story_description=self.state.story.description,
+            player_name=self.state.player.name,
+            player_description=self.state.player.description,
+            location_name=location.name if location else "Unknown",
+            location_description=location.description if location else "",
+            characters=characters,
+            previous_scene=previous_scene,
+            outline=outline
+        )
+
+        messages = [
+            self.llm.create_message("system", SCENE_NARRATION_SYSTEM_PROMPT),
+            self.llm.create_message("user", user_prompt)
+        ]
+
+        chunks: List[str] = []
+        try:
+            stream = await self.llm.generate_completion(
+                messages=messages,
+                model=ModelName.GPT41_MINI,
+                temperature=0.8,
+                stream=True
+            )
+
+            if isinstance(stream, str):
+                chunks.append(stream)
+                await self._send_description_delta(stream)
+            else:
+                async for chunk in stream:
+                    chunks.append(chunk)
+                    await self._send_description_delta(chunk)
+        except Exception as e:
+            logging.error(f"Error narrating scene, falling back to outline: {e}")
+            # SCENE_COMPLETE carries the outline, which replaces any partial text on the client
+            if not chunks:
+                await self._send_description_delta(outline)
+            chunks = [outline]
+        finally:
+            await self._remove_action("narration")
+
+        return "".join(chunks)
+
+    async def _send_description_delta(self, delta: str) -> None:
+        """Pass a chunk of the scene description to the on_description_delta callback"""
+        if not delta or not self.on_description_delta:
+            return
+        try:
+            await self.on_description_delta(delta)
+        except Exception as e:
+            logging.error(f"Error executing on_description_delta callback: {e}")
+
     def _create_user_prompt(self) -> str:
         """Create a user prompt with the current state using XML-style delimiters"""
-        
-        # Format the selected location
-        selected_location_str = "None"
-        if self.state.selected_location:
-            selected_location_str = f"""
-            <uuid>{self.state.selected_location.uuid}</uuid>
-            <name>{self.state.selected_location.name}</name>
-            """
-        
-        # Format the selected characters
-        selected_characters_str = "[]"
-        if self.state.selected_characters:
-            characters: List[str] = []
-            for character in self.state.selected_characters:
-                char_str = f"""
-                <character>
-                    <uuid>{character.uuid}</uuid>
-                    <name>{character.name}</name>
-                </character>
-                """
-                characters.append(char_str)
-            selected_characters_str = "".join(characters)
-        
-        # Format available characters
-        available_characters_str = ""
-        for character in self.state.characters_pool:
-            char_str = f"""
-            <character>
-                <name>{character.name}</name>
-                <role>{character.role}</role>
-                <description>{character.description}</description>
-                <uuid>{character.uuid}</uuid>
-            </character>
-            """
-            available_characters_str += char_str
-        
-        # Format available locations
-        available_locations_str = ""
-        for location in self.state.locations_pool:
-            loc_str = f"""
-            <location>
-                <name>{location.name}</name>
-                <description>{location.description}</description>
-                <uuid>{location.uuid}</uuid>
-            </location>
-            """
-            available_locations_str += loc_str
-        
-        # Format the previous scene if available
-        previous_scene_str = "None"
-        if self.state.previous_scene:
-            scene = self.state.previous_scene
-            characters_xml = ""
-            for character in scene.characters:
-                characters_xml += f"""
-                <character>
-                    <name>{character.name}</name>
-                    <uuid>{character.uuid}</uuid>
-                </character>
-                """
-            
-            previous_scene_str = f"""
-            <scene>
-                <location>
-                    <name>{scene.location.name}</name>
-                    <uuid>{scene.location.uuid}</uuid>
-                </location>
-                <characters>
-                    {characters_xml}
-                </characters>
-                <description>{scene.description}</description>
-                # TODO: Split summary into key events and sentiment or change db to the single string
-                <summary>{scene.summary}</summary>
-            </scene>
-            """
-        
-        # Format error messages
-        error_messages = ""
-        if self.state.location_generation_error:
-            error_messages += f"<location_error>{self.state.location_generation_error}</location_error>\n"
-        if self.state.character_generation_error:
-            error_messages += f"<character_error>{self.state.character_generation_error}</character_error>\n"
-        if self.state.finalize_scene_error:
-            error_messages += f"<finalize_error>{self.state.finalize_scene_error}</finalize_error>\n"
-        
-        # Build the complete prompt with XML delimiters
-        return f"""
-        <context>
-            <story>
-                <uuid>{self.state.story.uuid}</uuid>
-                <title>{self.state.story.title}</title>
-                <description>{self.state.story.description}</description>
-            </story>
-            
-            <player>
-                <uuid>{self.state.player.uuid}</uuid>
-                <name>{self.state.player.name}</name>
-                <role>{self.state.player.role}</role>
-                <description>{self.state.player.description}</description>
-            </player>
-            
-            <previous_scene>{previous_scene_str}</previous_scene>
-            
-            <current_state>
-                <selected_location>
-                {selected_location_str}
-                </selected_location>
-                
-                <selected_characters>
-                {selected_characters_str}
-                </selected_characters>
-                
-                <scene_description>{self.state.scene_description or "None"}</scene_description>
-                
-                <errors>
-                {error_messages}
-                </errors>
-            </current_state>
-            
-            <available_characters>
-            {available_characters_str}
-            </available_characters>
-            
-            <available_locations>
-            {available_locations_str}
-            </available_locations>
-        </context>
-        
-        Based on the context above, continue generating the next scene. If you need to generate a location, use the generate_location tool. If you need to generate characters, use the generate_character tool. When you have selected a location and at least one character, use the finalize_scene tool to complete the scene.
-        """ 
+        if self.reservoir:
+            self.state.reserved_characters = list(self.reservoir.characters)
+            self.state.reserved_locations = list(self.reservoir.locations)
+        return self.prompt_builder.build(self.state)
 
     async def _save_scene_to_db(self, scene_result: SceneGenerationResult, story_id: int) -> SceneModel:
         """
@@ -726,10 +906,11 @@ class SceneGeneratorAgent:
                 raise ValueError("No database session available")
                 
             location = scene_result.location
-            location_id = location.id if location else None
-                
-            # Check if we have a valid location_id 
-            if location_id is None:
+            if location is None:
+                raise ValueError("Cannot create scene without location_id")
+            # A location generated during this scene only gets its id when the unit of work is written
+            pending_location = self.unit_of_work.get(location.uuid) if self.unit_of_work is not None else None
+            if location.id is None and pending_location is None:
                 raise ValueError("Cannot create scene without location_id")
                 
             # Collect character UUIDs instead of IDs
@@ -744,14 +925,25 @@ class SceneGeneratorAgent:
             if not character_uuids:
                 logging.warning("No character UUIDs found to associate with the scene")
             
-            # Create a complete scene in one operation using UUIDs
-            db_scene = scenes_crud.create_complete_scene(
-                self.db_session,
-                story_id,
-                location_id,
-                scene_result.description,
-                character_uuids if character_uuids else None
-            )
+            def create_scene(db: Session) -> SceneModel:
+                location_id = pending_location.id if pending_location is not None else location.id
+                return scenes_crud.create_complete_scene(
+                    db,
+                    story_id,
+                    location_id,
+                    scene_result.description,
+                    character_uuids if character_uuids else None,
+                    commit=False
+                )
+
+            # Write new locations and characters, the scene and its associations in one transaction
+            if self.unit_of_work is not None:
+                db_scene = self.unit_of_work.commit(create_scene)
+            else:
+                db_scene = create_scene(self.db_session)
+                self.db_session.commit()
+            if pending_location is not None:
+                location.id = pending_location.id
             
             # Log completion
             logging.info(f"Scene saved to database with ID {db_scene.id} with status 'active'")
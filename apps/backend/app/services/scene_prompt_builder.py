@@ -0,0 +1,295 @@
+from operator import attrgetter
+from typing import Any, Callable, Dict, List, Tuple
+
+from app.schemas.scene_generator import SceneGeneratorState
+from app.schemas.story_generation import Story, Location, Character, Scene
+
+# The uuid of an entity followed by its content version
+FragmentKey = Tuple[Any, ...]
+
+# Content versions are the fields a fragment renders: an edit to any of them yields a new key
+_story_key = attrgetter("uuid", "title", "description")
+_player_key = attrgetter("uuid", "name", "role", "description")
+_character_key = attrgetter("uuid", "name", "role", "description")
+_selected_character_key = attrgetter("uuid", "name")
+_location_key = attrgetter("uuid", "name", "description")
+_selected_location_key = attrgetter("uuid", "name")
+
+
+def _scene_key(scene: Scene) -> FragmentKey:
+    return (
+        scene.location.uuid,
+        scene.location.name,
+        scene.description,
+        scene.summary,
+        tuple((character.uuid, character.name) for character in scene.characters),
+    )
+
+
+class ScenePromptBuilder:
+    """
+    Incremental builder for the SceneGeneratorAgent user prompt.
+
+    Every entity of the prompt (story, player, previous scene, selections, pools and reserved
+    entities) is rendered once into its XML fragment, cached under its uuid plus a content
+    version, so between agent steps only the entities that changed are rendered again.
+    Sections are assembled with joins, and a section whose keys did not change since the
+    previous step is reused as is. The prompt text is the same as rendering it from scratch.
+    """
+
+    def __init__(self):
+        self._fragments: Dict[str, Dict[FragmentKey, str]] = {}
+        # Kind of a single entity (story, player, ...) -> (its key, its fragment)
+        self._single: Dict[str, Tuple[FragmentKey, str]] = {}
+        # Section name -> (fragment kind, keys of its fragments, joined text)
+        self._sections: Dict[str, Tuple[str, Tuple[FragmentKey, ...], str]] = {}
+        self.renders = 0
+
+    def build(self, state: SceneGeneratorState) -> str:
+        """
+        Build the user prompt for the current agent state.
+
+        Args:
+            state: Current scene generator state
+
+        Returns:
+            The complete user prompt
+        """
+        story = self._fragment("story", state.story, _story_key, _render_story)
+        player = self._fragment("player", state.player, _player_key, _render_player)
+
+        previous_scene = "None"
+        if state.previous_scene:
+            previous_scene = self._fragment("previous_scene", state.previous_scene, _scene_key, _render_previous_scene)
+
+        selected_location = "None"
+        if state.selected_location:
+            selected_location = self._fragment(
+                "selected_location", state.selected_location, _selected_location_key, _render_selected_location
+            )
+
+        selected_characters = self._section(
+            "selected_characters", "selected_character", state.selected_characters,
+            _selected_character_key, _render_selected_character
+        ) or "[]"
+        available_characters = self._section(
+            "available_characters", "character", state.characters_pool, _character_key, _render_character
+        )
+        available_locations = self._section(
+            "available_locations", "location", state.locations_pool, _location_key, _render_location
+        )
+
+        # Reserved entities are only listed while the story's reservoir holds some
+        reserved: List[str] = []
+        if state.reserved_characters:
+            characters = self._section(
+                "reserved_characters", "character", state.reserved_characters, _character_key, _render_character
+            )
+            reserved.append(
+                f"\n            \n            <reserved_characters>\n            {characters}\n"
+                "            </reserved_characters>"
+            )
+        if state.reserved_locations:
+            locations = self._section(
+                "reserved_locations", "location", state.reserved_locations, _location_key, _render_location
+            )
+            reserved.append(
+                f"\n            \n            <reserved_locations>\n            {locations}\n"
+                "            </reserved_locations>"
+            )
+
+        errors: List[str] = []
+        if state.location_generation_error:
+            errors.append(f"<location_error>{state.location_generation_error}</location_error>\n")
+        if state.character_generation_error:
+            errors.append(f"<character_error>{state.character_generation_error}</character_error>\n")
+        if state.finalize_scene_error:
+            errors.append(f"<finalize_error>{state.finalize_scene_error}</finalize_error>\n")
+
+        return "".join([
+            "\n        <context>\n",
+            story,
+            "            \n",
+            player,
+            "            \n"
+            "            <previous_scene>", previous_scene, "</previous_scene>\n"
+            "            \n"
+            "            <current_state>\n"
+            "                <selected_location>\n"
+            "                ", selected_location, "\n"
+            "                </selected_location>\n"
+            "                \n"
+            "                <selected_characters>\n"
+            "                ", selected_characters, "\n"
+            "                </selected_characters>\n"
+            "                \n"
+            "                <scene_description>", state.scene_description or "None", "</scene_description>\n"
+            "                \n"
+            "                <errors>\n"
+            "                ", *errors, "\n"
+            "                </errors>\n"
+            "            </current_state>\n"
+            "            \n"
+            "            <available_characters>\n"
+            "            ", available_characters, "\n"
+            "            </available_characters>\n"
+            "            \n"
+            "            <available_locations>\n"
+            "            ", available_locations, "\n"
+            "            </available_locations>",
+            *reserved,
+            "\n"
+            "        </context>\n"
+            "        \n"
+            "        Based on the context above, continue generating the next scene. "
+            "If you need to generate a location, use the generate_location tool. "
+            "If you need to generate characters, use the generate_character tool. "
+            "When you have selected a location and at least one character, "
+            "use the finalize_scene tool to complete the scene.\n"
+            "        ",
+        ])
+
+    def _fragment(self, kind: str, entity: Any, key: Callable[[Any], FragmentKey], render: Callable[[Any], str]) -> str:
+        """The fragment of a single entity, rendered again only if its key changed"""
+        fragment_key = key(entity)
+        cached = self._single.get(kind)
+        if cached is not None and cached[0] == fragment_key:
+            return cached[1]
+        fragment = render(entity)
+        self.renders += 1
+        self._single[kind] = (fragment_key, fragment)
+        return fragment
+
+    def _section(
+        self,
+        name: str,
+        kind: str,
+        entities: List[Any],
+        key: Callable[[Any], FragmentKey],
+        render: Callable[[Any], str]
+    ) -> str:
+        """Join the fragments of a list of entities, reusing the previous join if no key changed"""
+        keys = tuple(map(key, entities))
+        cached = self._sections.get(name)
+        if cached is not None and cached[1] == keys:
+            return cached[2]
+
+        fragments = self._fragments.setdefault(kind, {})
+        renders = self.renders
+        parts: List[str] = []
+        for fragment_key, entity in zip(keys, entities):
+            fragment = fragments.get(fragment_key)
+            if fragment is None:
+                fragment = fragments[fragment_key] = render(entity)
+                self.renders += 1
+            parts.append(fragment)
+        text = "".join(parts)
+        self._sections[name] = (kind, keys, text)
+        if self.renders != renders:
+            self._prune(kind)
+        return text
+
+    def _prune(self, kind: str) -> None:
+        """Drop the fragments of a kind that no section uses anymore, once they outnumber the used ones"""
+        fragments = self._fragments[kind]
+        live = {
+            fragment_key
+            for section_kind, keys, _ in self._sections.values() if section_kind == kind
+            for fragment_key in keys
+        }
+        if len(fragments) > 2 * len(live) + 64:
+            self._fragments[kind] = {k: v for k, v in fragments.items() if k in live}
+
+
+def _render_story(story: Story) -> str:
+    return (
+        "            <story>\n"
+        f"                <uuid>{story.uuid}</uuid>\n"
+        f"                <title>{story.title}</title>\n"
+        f"                <description>{story.description}</description>\n"
+        "            </story>\n"
+    )
+
+
+def _render_player(player: Character) -> str:
+    return (
+        "            <player>\n"
+        f"                <uuid>{player.uuid}</uuid>\n"
+        f"                <name>{player.name}</name>\n"
+        f"                <role>{player.role}</role>\n"
+        f"                <description>{player.description}</description>\n"
+        "            </player>\n"
+    )
+
+
+def _render_previous_scene(scene: Scene) -> str:
+    characters = "".join([
+        "\n"
+        "                <character>\n"
+        f"                    <name>{character.name}</name>\n"
+        f"                    <uuid>{character.uuid}</uuid>\n"
+        "                </character>\n"
+        "                "
+        for character in scene.characters
+    ])
+    return (
+        "\n"
+        "            <scene>\n"
+        "                <location>\n"
+        f"                    <name>{scene.location.name}</name>\n"
+        f"                    <uuid>{scene.location.uuid}</uuid>\n"
+        "                </location>\n"
+        "                <characters>\n"
+        f"                    {characters}\n"
+        "                </characters>\n"
+        f"                <description>{scene.description}</description>\n"
+        "                # TODO: Split summary into key events and sentiment or change db to the single string\n"
+        f"                <summary>{scene.summary}</summary>\n"
+        "            </scene>\n"
+        "            "
+    )
+
+
+def _render_selected_location(location: Location) -> str:
+    return (
+        "\n"
+        f"            <uuid>{location.uuid}</uuid>\n"
+        f"            <name>{location.name}</name>\n"
+        "            "
+    )
+
+
+def _render_selected_character(character: Character) -> str:
+    return (
+        "\n"
+        "                <character>\n"
+        f"                    <uuid>{character.uuid}</uuid>\n"
+        f"                    <name>{character.name}</name>\n"
+        "                </character>\n"
+        "                "
+    )
+
+
+def _render_character(character: Character) -> str:
+    return (
+        "\n"
+        "            <character>\n"
+        f"                <name>{character.name}</name>\n"
+        f"                <role>{character.role}</role>\n"
+        f"                <description>{character.description}</description>\n"
+        f"                <uuid>{character.uuid}</uuid>\n"
+        "            </character>\n"
+        "            "
+    )
+
+
+def _render_location(location: Location) -> str:
+    return (
+        "\n"
+        "            <location>\n"
+        f"                <name>{location.name}</name>\n"
+        f"                <description>{location.description}</description>\n"
+        f"                <uuid>{location.uuid}</uuid>\n"
+        "            </location>\n"
+        "            "
+    )
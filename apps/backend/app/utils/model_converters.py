@@ -5,6 +5,7 @@ import uuid
 
 from pydantic import BaseModel
 
+from app.core.config import settings
 from app.models.character import Character as CharacterOrmModel
 from app.models.location import Location as LocationOrmModel
 from app.models.scene import Scene as SceneOrmModel
@@ -84,7 +85,8 @@ class ModelConverter:
             
         # Prepare defaults
         defaults: Dict[str, Any] = {
-            "imageUrl": character_orm.image_dir
+            "imageUrl": character_orm.image_dir,
+            "imageVariants": getattr(character_orm, "image_variants", None) or {}
         }
         
             
@@ -145,7 +147,7 @@ class ModelConverter:
     def location_orm_to_pydantic(
         location_orm: LocationOrmModel,
         ensure_uuid: bool = True,
-        default_image_url: str = "/placeholder.png"
+        default_image_url: str = settings.PLACEHOLDER_IMAGE_URL
     ) -> LocationSchema:
         """
         Converts a Location ORM model to a Location Pydantic model.
@@ -169,6 +171,7 @@ class ModelConverter:
         # Ensure imageUrl exists
         if not getattr(location_orm, "imageUrl", None):
             defaults["imageUrl"] = default_image_url
+        defaults["imageVariants"] = getattr(location_orm, "image_variants", None) or {}
             
         # Set default rules if missing
         if not getattr(location_orm, "rules", None):
@@ -202,7 +205,7 @@ class ModelConverter:
 
 def convert_character(
     character_orm: CharacterOrmModel,
-    default_image_url: str = "/placeholder.png"
+    default_image_url: str = settings.PLACEHOLDER_IMAGE_URL
 ) -> CharacterSchema:
     """
     Shorthand function to convert a Character ORM model to a Character Pydantic model.
@@ -221,7 +224,7 @@ def convert_character(
 
 def convert_characters(
     character_orms: List[CharacterOrmModel],
-    default_image_url: str = "/placeholder.png"
+    default_image_url: str = settings.PLACEHOLDER_IMAGE_URL
 ) -> List[CharacterSchema]:
     """
     Convert a list of Character ORM models to Character Pydantic models.
@@ -251,7 +254,7 @@ def convert_characters(
 
 def convert_location(
     location_orm: LocationOrmModel,
-    default_image_url: str = "/placeholder.png"
+    default_image_url: str = settings.PLACEHOLDER_IMAGE_URL
 ) -> LocationSchema:
     """
     Shorthand function to convert a Location ORM model to a Location Pydantic model.
@@ -271,7 +274,7 @@ def convert_location(
 
 def convert_locations(
     location_orms: List[LocationOrmModel],
-    default_image_url: str = "/placeholder.png"
+    default_image_url: str = settings.PLACEHOLDER_IMAGE_URL
 ) -> List[LocationSchema]:
     """
     Convert a list of Location ORM models to Location Pydantic models.
@@ -0,0 +1,98 @@
+import argparse
+import asyncio
+import socket
+import statistics
+import time
+from typing import AsyncIterator, List, Optional, Tuple
+
+from app.routers.game_ws.coalescing import coalesce_chunks
+from app.schemas.conversation import ChatChunkMessage
+
+# A reply of ~600 tokens of 1-6 characters, like the deltas of a streamed chat completion
+TOKENS = [word for _ in range(150) for word in (" The", " lantern", "light", " flick")]
+
+
+async def llm_reply(token_interval: float, arrivals: List[float]) -> AsyncIterator[str]:
+    """Tokens at a steady rate, recording when each one arrived"""
+    for token in TOKENS:
+        await asyncio.sleep(token_interval)
+        arrivals.append(time.perf_counter())
+        yield token
+
+
+async def run(token_interval: float, coalesce: Optional[bool], flush_interval: float, max_bytes: int) -> dict:
+    # Frames go through a real socket, so every frame costs a send syscall
+    sender, receiver = socket.socketpair()
+    reader, receiver_writer = await asyncio.open_connection(sock=receiver)
+    _, writer = await asyncio.open_connection(sock=sender)
+
+    async def drain() -> None:
+        while await reader.read(65536):
+            pass
+
+    drainer = asyncio.create_task(drain())
+    arrivals: List[float] = []
+    delays: List[float] = []
+    frames = 0
+    sent_tokens = 0
+    cpu = 0.0
+    chunks = llm_reply(token_interval, arrivals)
+    if coalesce is None:
+        # Baseline: the reply is consumed but nothing is sent
+        async for _ in chunks:
+            pass
+        writer.close()
+        await drainer
+        receiver_writer.close()
+        return {"frames": 0, "cpu": 0.0, "delays": [0.0]}
+    if coalesce:
+        chunks = coalesce_chunks(chunks, flush_interval, max_bytes)
+    async for chunk in chunks:
+        started = time.process_time()
+        writer.write(ChatChunkMessage(type="chat_chunk", content=chunk).model_dump_json().encode())
+        await writer.drain()
+        cpu += time.process_time() - started
+        frames += 1
+        # How long the oldest token of the frame waited to be sent
+        delays.append(time.perf_counter() - arrivals[sent_tokens])
+        length = 0
+        while length < len(chunk):
+            length += len(TOKENS[sent_tokens])
+            sent_tokens += 1
+    writer.close()
+    await drainer
+    receiver_writer.close()
+    return {"frames": frames, "cpu": cpu, "delays": delays}
+
+
+async def main(token_interval: float, flush_interval: float, max_bytes: int, rounds: int) -> None:
+    print(
+        f"Reply of {len(TOKENS)} tokens, one every {token_interval * 1000:.1f} ms; "
+        f"coalescing every {flush_interval * 1000:.0f} ms or {max_bytes} bytes; median of {rounds} rounds"
+    )
+
+    async def process_cpu(coalesce: Optional[bool]) -> Tuple[float, dict]:
+        started = time.process_time()
+        stats = await run(token_interval, coalesce, flush_interval, max_bytes)
+        return time.process_time() - started, stats
+
+    # CPU of producing the simulated reply alone, subtracted from the process CPU of each mode
+    baseline = statistics.median([(await process_cpu(None))[0] for _ in range(rounds)])
+    for name, coalesce in (("per token", False), ("coalesced", True)):
+        runs = [await process_cpu(coalesce) for _ in range(rounds)]
+        cpu = statistics.median(total for total, _ in runs) - baseline
+        stats = runs[-1][1]
+        print(
+            f"{name:<10} | {stats['frames']:4d} frames | send path CPU {stats['cpu'] * 1000:6.1f} ms "
+            f"| CPU over the bare stream {cpu * 1000:6.1f} ms | max token delay {max(stats['delays']) * 1000:5.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Frames and CPU per streamed chat reply, per token against coalesced")
+    parser.add_argument("--token-interval", type=float, default=0.002, help="Seconds between LLM tokens")
+    parser.add_argument("--flush-interval", type=float, default=0.03)
+    parser.add_argument("--max-bytes", type=int, default=512)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.token_interval, args.flush_interval, args.max_bytes, args.rounds))
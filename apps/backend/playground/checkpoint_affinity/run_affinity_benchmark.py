@@ -0,0 +1,98 @@
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+from app.services.image_generation.comfyui_client import ComfyUIClient
+from app.services.image_generation.comfyui_service import ComfyUIService
+from app.services.image_generation.image_cache import ImageCache
+from app.services.image_generation.media_store import MediaStore
+from app.services.image_generation.scheduler import ComfyUIScheduler, Priority
+
+from tests.services.image_generation.stub_comfyui import create_stub_app
+
+# Location workflows are switched to this checkpoint, characters keep the one of their workflow
+LOCATION_CHECKPOINT = "landscape_xl.safetensors"
+JOBS = 12
+# Stub cost model: seconds per image and seconds to load another checkpoint
+STUB_IMAGE_DELAY = 0.1
+STUB_MODEL_LOAD_DELAY = 0.5
+
+
+class TwoCheckpointService(ComfyUIService):
+    """Service whose location workflows load another checkpoint than its character workflows"""
+
+    async def _create_workflow(self, prompt: str, generation_id: str, context_type: str, *args: Any) -> Tuple[
+        Dict[str, Any], Optional[Path]
+    ]:
+        workflow, reference_image_path = await super()._create_workflow(prompt, generation_id, context_type, *args)
+        if context_type == "location":
+            for node in workflow.values():
+                if node.get("class_type") == "CheckpointLoaderSimple":
+                    node["inputs"]["ckpt_name"] = LOCATION_CHECKPOINT
+        return workflow, reference_image_path
+
+
+async def run(output_dir: Path, comfyui_url: Optional[str], affinity_max_wait: float) -> Dict[str, Any]:
+    if comfyui_url:
+        app = None
+        client = ComfyUIClient(base_url=comfyui_url)
+    else:
+        app = create_stub_app(delay=STUB_IMAGE_DELAY, steps=1, model_load_delay=STUB_MODEL_LOAD_DELAY)
+        client = ComfyUIClient(base_url="http://stub", transport=httpx.ASGITransport(app=app), use_websocket=False)
+    # One job at a time on the backend, so the waiting jobs are ordered by the scheduler
+    scheduler = ComfyUIScheduler([client], max_in_flight=1, reserved_slots=0, affinity_max_wait=affinity_max_wait)
+    service = TwoCheckpointService(scheduler=scheduler)
+    service.store = MediaStore(output_dir, staging_dir=output_dir / "staging")
+    service.image_cache = ImageCache(output_dir / "image_cache.json")
+
+    started = time.perf_counter()
+    # Characters and locations alternate, as when several scenes are created at once
+    tasks = []
+    for i in range(JOBS):
+        context_type = "character" if i % 2 else "location"
+        tasks.append(asyncio.create_task(service.generate_image(
+            f"{'a harbour master' if i % 2 else 'a foggy harbour'}, variant {i}", context_type,
+            priority=Priority.BACKGROUND
+        )))
+        # Queue the jobs in this order
+        await asyncio.sleep(0.02)
+    results = await asyncio.gather(*tasks)
+    wall = time.perf_counter() - started
+    await scheduler.close()
+    failed = [result["error"] for result in results if not result["success"]]
+    if failed:
+        raise SystemExit(f"{len(failed)} images failed: {failed[0]}")
+    return {
+        "wall": wall,
+        "gpu": sum(result.get("gpuSeconds") or 0.0 for result in results),
+        "switches": scheduler.model_switches,
+        "loads": app.state.comfyui.model_loads if app else None,
+    }
+
+
+async def main(comfyui_url: Optional[str], affinity_max_wait: float) -> None:
+    target = comfyui_url or (
+        f"stub ComfyUI ({STUB_IMAGE_DELAY}s per image + {STUB_MODEL_LOAD_DELAY}s per checkpoint load)"
+    )
+    print(f"{JOBS} alternating character and location images on {target}")
+    for name, max_wait in (("FIFO", 0.0), ("affinity", affinity_max_wait)):
+        with tempfile.TemporaryDirectory() as output_dir:
+            stats = await run(Path(output_dir), comfyui_url, max_wait)
+        loads = f" | {stats['loads']} checkpoint loads" if stats["loads"] is not None else ""
+        print(
+            f"{name:<8} | {stats['switches']:2d} model switches{loads} "
+            f"| GPU {stats['gpu']:6.2f} s | wall {stats['wall']:6.2f} s"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Model switches with and without checkpoint-affinity scheduling")
+    parser.add_argument("--comfyui", help="URL of a real ComfyUI backend, defaults to an in-process stub")
+    parser.add_argument("--max-wait", type=float, default=30.0, help="Seconds a job may be passed over")
+    args = parser.parse_args()
+    asyncio.run(main(args.comfyui, args.max_wait))
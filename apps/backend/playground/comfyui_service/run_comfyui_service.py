@@ -1,9 +1,15 @@
+import asyncio
+
 from app.services.image_generation.comfyui_service import ComfyUIService
+from app.services.image_generation.scheduler import close_comfyui_scheduler
 
-def test_comfyui_service():
+async def test_comfyui_service():
     comfyui_service = ComfyUIService()
-    image_path = comfyui_service.generate_image("young dark hair police officer")
-    print(f"Image path: {image_path}")
+    try:
+        image_path = await comfyui_service.generate_image("young dark hair police officer")
+        print(f"Image path: {image_path}")
+    finally:
+        await close_comfyui_scheduler()
 
 if __name__ == "__main__":
-    test_comfyui_service()
\ No newline at end of file
+    asyncio.run(test_comfyui_service())
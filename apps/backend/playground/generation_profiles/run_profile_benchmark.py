@@ -0,0 +1,73 @@
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+from app.services.image_generation.comfyui_client import ComfyUIClient
+from app.services.image_generation.comfyui_service import ComfyUIService
+from app.services.image_generation.generation_profiles import GENERATION_PROFILES
+from app.services.image_generation.image_cache import ImageCache
+from app.services.image_generation.media_store import MediaStore
+from app.services.image_generation.scheduler import ComfyUIScheduler
+
+from tests.services.image_generation.stub_comfyui import create_stub_app
+
+PROMPTS = {
+    "character": "an old sailor with a grey beard",
+    "location": "a fishing harbour at dawn, fog over the water",
+}
+# Stub cost model: seconds of per-prompt overhead and seconds per sampler model evaluation
+STUB_LOAD_DELAY = 0.1
+STUB_STEP_DELAY = 0.02
+
+
+def make_service(output_dir: Path, comfyui_url: Optional[str]) -> ComfyUIService:
+    if comfyui_url:
+        client = ComfyUIClient(base_url=comfyui_url)
+    else:
+        app = create_stub_app(steps=2, load_delay=STUB_LOAD_DELAY, step_delay=STUB_STEP_DELAY)
+        client = ComfyUIClient(base_url="http://stub", transport=httpx.ASGITransport(app=app), use_websocket=False)
+    service = ComfyUIService(scheduler=ComfyUIScheduler([client]))
+    service.store = MediaStore(output_dir, staging_dir=output_dir / "staging")
+    # A fresh cache per run, so no image is served without generating it
+    service.image_cache = ImageCache(output_dir / "image_cache.json")
+    return service
+
+
+async def main(comfyui_url: Optional[str], context_type: str, rounds: int) -> None:
+    target = comfyui_url or f"stub ComfyUI ({STUB_LOAD_DELAY}s per prompt + {STUB_STEP_DELAY}s per model evaluation)"
+    print(f"One {context_type} image per round on {target}, {rounds} rounds")
+    for name, profile in GENERATION_PROFILES.items():
+        gpus, walls = [], []
+        for round_index in range(rounds):
+            with tempfile.TemporaryDirectory() as output_dir:
+                service = make_service(Path(output_dir), comfyui_url)
+                started = time.perf_counter()
+                # A new prompt per round, so ComfyUI cannot reuse the previous round's outputs
+                result = await service.generate_image(
+                    f"{PROMPTS[context_type]}, take {round_index}", context_type, profile=name
+                )
+                walls.append(time.perf_counter() - started)
+                await service.scheduler.close()
+            if not result["success"]:
+                raise SystemExit(f"{name}: generation failed: {result['error']}")
+            gpus.append(result.get("gpuSeconds") or 0.0)
+        print(
+            f"{name:<9} {profile.sampler_name}/{profile.scheduler}, {profile.steps} steps, cfg {profile.cfg} "
+            f"| GPU {statistics.mean(gpus):6.2f} s (min {min(gpus):.2f}, max {max(gpus):.2f}) "
+            f"| wall {statistics.mean(walls):6.2f} s"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render time of each generation profile")
+    parser.add_argument("--comfyui", help="URL of a real ComfyUI backend, defaults to an in-process stub")
+    parser.add_argument("--context", choices=sorted(PROMPTS), default="character")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.comfyui, args.context, args.rounds))
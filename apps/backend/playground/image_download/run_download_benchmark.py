@@ -0,0 +1,64 @@
+import asyncio
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import httpx
+
+from app.services.image_generation.comfyui_client import ComfyUIClient
+
+CONCURRENCY = 16
+IMAGE_SIZE = 4 * 1024 * 1024
+# Bytes per read from the socket
+NETWORK_CHUNK = 16 * 1024
+PAYLOAD = bytes(range(256)) * (IMAGE_SIZE // 256)
+
+
+class NetworkStream(httpx.AsyncByteStream):
+    """Response body arriving in socket-sized chunks, like from a real ComfyUI server"""
+
+    async def __aiter__(self):
+        for offset in range(0, len(PAYLOAD), NETWORK_CHUNK):
+            yield PAYLOAD[offset:offset + NETWORK_CHUNK]
+            await asyncio.sleep(0)
+
+
+def handler(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, stream=NetworkStream())
+
+
+async def buffered(client: ComfyUIClient, destination: Path) -> None:
+    """The previous download: the whole image in memory, then written in a second pass"""
+    response = await client._client.get("/view", params={"filename": "image.png", "subfolder": "", "type": "output"})
+    with open(destination, "wb") as f:
+        f.write(response.content)
+
+
+async def streamed(client: ComfyUIClient, destination: Path) -> None:
+    await client.download_image("image.png", destination)
+
+
+async def measure(download, output_dir: Path) -> tuple:
+    """Peak traced memory in MiB and wall time in ms of CONCURRENCY simultaneous downloads"""
+    client = ComfyUIClient(base_url="http://comfyui", transport=httpx.MockTransport(handler), use_websocket=False)
+    tracemalloc.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(download(client, output_dir / f"image_{i}.png") for i in range(CONCURRENCY)))
+    elapsed = (time.perf_counter() - started) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    await client.close()
+    return peak / (1024 * 1024), elapsed
+
+
+async def main():
+    print(f"{CONCURRENCY} concurrent downloads of {IMAGE_SIZE // (1024 * 1024)} MiB images")
+    with tempfile.TemporaryDirectory() as output_dir:
+        for name, download in (("buffered", buffered), ("streamed", streamed)):
+            peak, elapsed = await measure(download, Path(output_dir))
+            print(f"{name:<9} | peak {peak:7.1f} MiB | {elapsed:7.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
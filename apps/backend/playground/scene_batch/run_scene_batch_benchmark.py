@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import httpx
+
+from app.services.image_generation.comfyui_client import ComfyUIClient
+from app.services.image_generation.comfyui_service import ComfyUIService, ImageRequest
+from app.services.image_generation.image_cache import ImageCache
+from app.services.image_generation.media_store import MediaStore
+from app.services.image_generation.scheduler import ComfyUIScheduler, Priority
+
+from tests.services.image_generation.stub_comfyui import create_stub_app
+
+# A location and three portraits, the largest scene the agent creates
+SCENE = [
+    ImageRequest("a fishing harbour at dawn, fog over the water", "location"),
+    ImageRequest("an old sailor with a grey beard", "character"),
+    ImageRequest("a young cartographer holding a map", "character"),
+    ImageRequest("a harbour master in a blue coat", "character"),
+]
+# Stub cost model: seconds of per-prompt overhead and seconds per image
+STUB_LOAD_DELAY = 0.4
+STUB_IMAGE_DELAY = 0.25
+
+
+def make_service(output_dir: Path, comfyui_url: Optional[str]) -> ComfyUIService:
+    if comfyui_url:
+        client = ComfyUIClient(base_url=comfyui_url)
+    else:
+        app = create_stub_app(delay=STUB_IMAGE_DELAY, steps=2, load_delay=STUB_LOAD_DELAY)
+        client = ComfyUIClient(base_url="http://stub", transport=httpx.ASGITransport(app=app), use_websocket=False)
+    service = ComfyUIService(scheduler=ComfyUIScheduler([client]))
+    service.store = MediaStore(output_dir, staging_dir=output_dir / "staging")
+    # A fresh cache per run, so no image is served without generating it
+    service.image_cache = ImageCache(output_dir / "image_cache.json")
+    return service
+
+
+def gpu_seconds(results: List[dict]) -> float:
+    """Execution time summed over the distinct jobs of the results"""
+    jobs = {result["promptId"]: result.get("gpuSeconds") or 0.0 for result in results if result.get("promptId")}
+    return sum(jobs.values())
+
+
+async def one_at_a_time(service: ComfyUIService) -> List[dict]:
+    """The previous path: every deferred image is its own job, all queued at once"""
+    return list(await asyncio.gather(*(
+        service.generate_image(request.prompt, request.context_type, priority=Priority.BACKGROUND)
+        for request in SCENE
+    )))
+
+
+async def batched(service: ComfyUIService) -> List[dict]:
+    return await service.generate_batch(SCENE)
+
+
+async def main(comfyui_url: Optional[str], rounds: int) -> None:
+    target = comfyui_url or f"stub ComfyUI ({STUB_LOAD_DELAY}s per prompt + {STUB_IMAGE_DELAY}s per image)"
+    print(f"Scene of {len(SCENE)} images on {target}, {rounds} rounds")
+    for name, generate in (("one-at-a-time", one_at_a_time), ("batched", batched)):
+        walls, gpus, jobs = [], [], []
+        for _ in range(rounds):
+            with tempfile.TemporaryDirectory() as output_dir:
+                service = make_service(Path(output_dir), comfyui_url)
+                started = time.perf_counter()
+                results = await generate(service)
+                walls.append(time.perf_counter() - started)
+                await service.scheduler.close()
+            failed = [result["error"] for result in results if not result["success"]]
+            if failed:
+                raise SystemExit(f"{name}: {len(failed)} images failed: {failed[0]}")
+            gpus.append(gpu_seconds(results))
+            jobs.append(len({result["promptId"] for result in results}))
+        print(
+            f"{name:<14} | {jobs[0]} jobs | GPU {sum(gpus) / rounds:6.2f} s/scene "
+            f"| wall {sum(walls) / rounds:6.2f} s/scene"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="GPU time per scene, one job per image against one batched job")
+    parser.add_argument("--comfyui", help="URL of a real ComfyUI backend, defaults to an in-process stub")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.comfyui, args.rounds))
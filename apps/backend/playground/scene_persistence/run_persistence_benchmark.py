@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import uuid
+from typing import Dict, List, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+
+import app.models  # noqa: F401 - registers all tables
+from app.db.session import Base
+from app.db.unit_of_work import UnitOfWork
+from app.crud import scenes as scenes_crud
+from app.crud import characters as characters_crud
+from app.models.scene import Scene
+from app.models.story import Story as StoryModel
+from app.models.user import User
+from app.models.character import Character as CharacterModel
+from app.models.location import Location as LocationModel
+from app.schemas.story_generation import Character, Location
+from app.services.game_engine.tools.character_generator import CharacterGenerator
+from app.services.game_engine.tools.location_generator import LocationGenerator
+
+EXISTING_CHARACTERS = 3
+NEW_CHARACTERS = 2
+
+
+class Counter:
+    """Counts SQL round trips and commits on an engine"""
+
+    def __init__(self, engine):
+        self.statements = 0
+        self.commits = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+        event.listen(engine, "commit", self._on_commit)
+
+    def _on_execute(self, *args):
+        self.statements += 1
+
+    def _on_commit(self, *args):
+        self.commits += 1
+
+    def reset(self):
+        self.statements = 0
+        self.commits = 0
+
+
+def legacy_add_characters_to_scene(db: Session, scene_id: int, character_uuids: List[str]):
+    """The pre-unit-of-work scenes_crud.add_characters_to_scene, kept for comparison"""
+    db_scene = db.query(Scene).filter(Scene.id == scene_id).first()
+    for character_uuid in character_uuids:
+        character = characters_crud.get_character_by_uuid(db, character_uuid)
+        if character:
+            if character not in db_scene.characters:
+                db_scene.characters.append(character)
+    db.commit()
+    db.refresh(db_scene)
+    return db_scene
+
+
+def legacy_create_complete_scene(
+    db: Session, story_id: int, location_id: int, description: str, character_uuids: Optional[List[str]] = None
+) -> Scene:
+    """The pre-unit-of-work scenes_crud.create_complete_scene, kept for comparison"""
+    db_scene = Scene(uuid=str(uuid.uuid4()), description=description, story_id=story_id,
+                     location_id=location_id, status="active")
+    db.add(db_scene)
+    db.flush()
+    scene_id = db_scene.id
+    if character_uuids:
+        db_scene = db.query(Scene).filter(Scene.id == scene_id).first()
+        if db_scene:
+            db_scene = legacy_add_characters_to_scene(db, scene_id, character_uuids)
+    db.commit()
+    db.refresh(db_scene)
+    return db_scene
+
+
+def seed(db: Session) -> Dict[str, object]:
+    """A story with a player, some existing NPCs and no locations"""
+    user = User(username=f"bench-{uuid.uuid4()}", email=f"{uuid.uuid4()}@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+    story = StoryModel(title="Benchmark", description="", rules="", user_id=user.id, uuid=str(uuid.uuid4()))
+    db.add(story)
+    db.flush()
+    characters = [
+        CharacterModel(name=f"Existing {i}", role="npc" if i else "player", story_id=story.id, uuid=str(uuid.uuid4()))
+        for i in range(EXISTING_CHARACTERS + 1)
+    ]
+    db.add_all(characters)
+    db.commit()
+    return {"story_id": story.id, "player_uuid": characters[0].uuid, "npc_uuid": characters[1].uuid}
+
+
+def new_entities():
+    location = Location(name="Harbor", description="A harbor", rules=[], imageUrl="", uuid=str(uuid.uuid4()))
+    characters = [
+        Character(name=f"New {i}", description="", backstory="", goals=[], relationships=[],
+                  imageUrl="", role="npc", uuid=str(uuid.uuid4()))
+        for i in range(NEW_CHARACTERS)
+    ]
+    return location, characters
+
+
+async def run_legacy(db: Session, data: Dict[str, object]) -> None:
+    """Each generator commits its entity, then the scene is created with the legacy crud"""
+    location, characters = new_entities()
+    location_generator = LocationGenerator(llm_service=object(), db_session=db)
+    character_generator = CharacterGenerator(llm_service=object(), db_session=db)
+    await location_generator._save_location_to_db(location, data["story_id"], "")
+    for character in characters:
+        await character_generator._save_character_to_db(character, data["story_id"], "")
+    uuids = [data["player_uuid"], data["npc_uuid"], *[c.uuid for c in characters]]
+    legacy_create_complete_scene(db, data["story_id"], location.id, "A scene", uuids)
+
+
+async def run_unit_of_work(db: Session, data: Dict[str, object]) -> None:
+    """Generators collect their entities, everything is written at finalize"""
+    location, characters = new_entities()
+    unit_of_work = UnitOfWork(db)
+    location_generator = LocationGenerator(llm_service=object(), db_session=db, unit_of_work=unit_of_work)
+    character_generator = CharacterGenerator(llm_service=object(), db_session=db, unit_of_work=unit_of_work)
+    await location_generator._save_location_to_db(location, data["story_id"], "")
+    for character in characters:
+        await character_generator._save_character_to_db(character, data["story_id"], "")
+    uuids = [data["player_uuid"], data["npc_uuid"], *[c.uuid for c in characters]]
+    pending_location = unit_of_work.get(location.uuid)
+    unit_of_work.commit(lambda session: scenes_crud.create_complete_scene(
+        session, data["story_id"], pending_location.id, "A scene", uuids, commit=False
+    ))
+
+
+async def measure(name: str, run) -> None:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    data = seed(db)
+    counter = Counter(engine)
+    await run(db, data)
+    associations = db.query(Scene).one().characters
+    print(f"{name:<14} | SQL round trips {counter.statements:>3} | commits {counter.commits:>2}"
+          f" | scene characters {len(associations)}")
+    db.close()
+
+
+async def main():
+    logging.disable(logging.CRITICAL)
+    print(f"One scene: 1 new location, {NEW_CHARACTERS} new characters, player and 1 existing NPC (SQLite in memory)")
+    await measure("legacy", run_legacy)
+    await measure("unit of work", run_unit_of_work)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,249 @@
+import statistics
+import time
+import tracemalloc
+import uuid
+from typing import Callable, List, Tuple
+
+from app.services.scene_prompt_builder import ScenePromptBuilder
+from app.schemas.scene_generator import SceneGeneratorState
+from app.schemas.story_generation import Story, Character, Location
+
+POOL_SIZES = [10, 100, 1000]
+AGENT_STEPS = 6
+REPEATS = 20
+
+
+class LegacyAgent:
+    """Renders the whole prompt on every step, as SceneGeneratorAgent did before ScenePromptBuilder"""
+
+    def __init__(self):
+        self.state: SceneGeneratorState
+
+    def build(self, state: SceneGeneratorState) -> str:
+        self.state = state
+        return self._create_user_prompt()
+
+    def _create_user_prompt(self) -> str:
+        """The original SceneGeneratorAgent._create_user_prompt, verbatim"""
+        
+        # Format the selected location
+        selected_location_str = "None"
+        if self.state.selected_location:
+            selected_location_str = f"""
+            <uuid>{self.state.selected_location.uuid}</uuid>
+            <name>{self.state.selected_location.name}</name>
+            """
+        
+        # Format the selected characters
+        selected_characters_str = "[]"
+        if self.state.selected_characters:
+            characters: List[str] = []
+            for character in self.state.selected_characters:
+                char_str = f"""
+                <character>
+                    <uuid>{character.uuid}</uuid>
+                    <name>{character.name}</name>
+                </character>
+                """
+                characters.append(char_str)
+            selected_characters_str = "".join(characters)
+        
+        # Format available characters
+        available_characters_str = ""
+        for character in self.state.characters_pool:
+            char_str = f"""
+            <character>
+                <name>{character.name}</name>
+                <role>{character.role}</role>
+                <description>{character.description}</description>
+                <uuid>{character.uuid}</uuid>
+            </character>
+            """
+            available_characters_str += char_str
+        
+        # Format available locations
+        available_locations_str = ""
+        for location in self.state.locations_pool:
+            loc_str = f"""
+            <location>
+                <name>{location.name}</name>
+                <description>{location.description}</description>
+                <uuid>{location.uuid}</uuid>
+            </location>
+            """
+            available_locations_str += loc_str
+        
+        # Format the previous scene if available
+        previous_scene_str = "None"
+        if self.state.previous_scene:
+            scene = self.state.previous_scene
+            characters_xml = ""
+            for character in scene.characters:
+                characters_xml += f"""
+                <character>
+                    <name>{character.name}</name>
+                    <uuid>{character.uuid}</uuid>
+                </character>
+                """
+            
+            previous_scene_str = f"""
+            <scene>
+                <location>
+                    <name>{scene.location.name}</name>
+                    <uuid>{scene.location.uuid}</uuid>
+                </location>
+                <characters>
+                    {characters_xml}
+                </characters>
+                <description>{scene.description}</description>
+                # TODO: Split summary into key events and sentiment or change db to the single string
+                <summary>{scene.summary}</summary>
+            </scene>
+            """
+        
+        # Format error messages
+        error_messages = ""
+        if self.state.location_generation_error:
+            error_messages += f"<location_error>{self.state.location_generation_error}</location_error>\n"
+        if self.state.character_generation_error:
+            error_messages += f"<character_error>{self.state.character_generation_error}</character_error>\n"
+        if self.state.finalize_scene_error:
+            error_messages += f"<finalize_error>{self.state.finalize_scene_error}</finalize_error>\n"
+        
+        # Build the complete prompt with XML delimiters
+        return f"""
+        <context>
+            <story>
+                <uuid>{self.state.story.uuid}</uuid>
+                <title>{self.state.story.title}</title>
+                <description>{self.state.story.description}</description>
+            </story>
+            
+            <player>
+                <uuid>{self.state.player.uuid}</uuid>
+                <name>{self.state.player.name}</name>
+                <role>{self.state.player.role}</role>
+                <description>{self.state.player.description}</description>
+            </player>
+            
+            <previous_scene>{previous_scene_str}</previous_scene>
+            
+            <current_state>
+                <selected_location>
+                {selected_location_str}
+                </selected_location>
+                
+                <selected_characters>
+                {selected_characters_str}
+                </selected_characters>
+                
+                <scene_description>{self.state.scene_description or "None"}</scene_description>
+                
+                <errors>
+                {error_messages}
+                </errors>
+            </current_state>
+            
+            <available_characters>
+            {available_characters_str}
+            </available_characters>
+            
+            <available_locations>
+            {available_locations_str}
+            </available_locations>
+        </context>
+        
+        Based on the context above, continue generating the next scene. If you need to generate a location, use the generate_location tool. If you need to generate characters, use the generate_character tool. When you have selected a location and at least one character, use the finalize_scene tool to complete the scene.
+        """
+
+
+def make_state(pool_size: int) -> SceneGeneratorState:
+    """Create a state with pool_size characters and pool_size locations"""
+    description = "A weathered figure with a long history in the city. " * 4
+    return SceneGeneratorState(
+        story=Story(title="Benchmark", description="A benchmark story. " * 20, rules=[], uuid=str(uuid.uuid4())),
+        player=Character(
+            name="Player", description=description, backstory="", goals=[], relationships=[],
+            imageUrl="", role="player", uuid=str(uuid.uuid4())
+        ),
+        characters_pool=[
+            Character(
+                name=f"Character {i}", description=description, backstory="", goals=[], relationships=[],
+                imageUrl="", role="npc", uuid=str(uuid.uuid4())
+            )
+            for i in range(pool_size)
+        ],
+        locations_pool=[
+            Location(name=f"Location {i}", description=description, rules=[], imageUrl="", uuid=str(uuid.uuid4()))
+            for i in range(pool_size)
+        ],
+    )
+
+
+def agent_step_states(state: SceneGeneratorState) -> List[SceneGeneratorState]:
+    """States seen by the agent on consecutive steps: one more entity is selected each step"""
+    states = [state]
+    for step in range(1, AGENT_STEPS):
+        previous = states[-1]
+        if step == 1:
+            states.append(previous.model_copy(update={"selected_location": previous.locations_pool[0]}))
+        else:
+            selected = previous.selected_characters + [previous.characters_pool[step]]
+            states.append(previous.model_copy(update={"selected_characters": selected}))
+    return states
+
+
+def time_steps(build: Callable[[SceneGeneratorState], str], states: List[SceneGeneratorState]) -> List[float]:
+    """Time each step of one simulated agent run"""
+    timings: List[float] = []
+    for state in states:
+        start = time.perf_counter()
+        build(state)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def traced_peak(build: Callable[[SceneGeneratorState], str], state: SceneGeneratorState) -> Tuple[int, int]:
+    """Peak traced memory and number of blocks allocated by a single build"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    prompt = build(state)
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+    del prompt
+    return peak, blocks
+
+
+def measure(pool_size: int) -> None:
+    states = agent_step_states(make_state(pool_size))
+    builder = ScenePromptBuilder()
+    for state in states:
+        assert builder.build(state) == LegacyAgent().build(state), "The builder changed the prompt text"
+
+    # One agent (and builder) per run, as SceneGeneratorAgent is created per scene
+    for name, agent_class in (("legacy", LegacyAgent), ("builder", ScenePromptBuilder)):
+        runs = [time_steps(agent_class().build, states) for _ in range(REPEATS)]
+        first_ms = statistics.median(run[0] for run in runs) * 1000
+        step_ms = statistics.median(t for run in runs for t in run[1:]) * 1000
+        agent = agent_class()
+        for state in states[:-1]:
+            agent.build(state)
+        peak, blocks = traced_peak(agent.build, states[-1])
+        print(
+            f"{pool_size:>6} | {name:<7} | first step {first_ms:>8.3f} ms | later steps {step_ms:>8.3f} ms"
+            f" | peak {peak / 1024:>8.1f} KiB | new blocks {blocks:>6}"
+        )
+
+
+def main():
+    print(f"Median build time per agent step over {REPEATS} runs of {AGENT_STEPS} steps;")
+    print("memory is measured for the last step of a run.")
+    for pool_size in POOL_SIZES:
+        measure(pool_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import argparse
+import json
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from websockets.extensions.permessage_deflate import PerMessageDeflate
+from websockets.frames import OP_BINARY, OP_TEXT, Frame
+
+SCENE_FILE = Path(__file__).parent.parent / "scene_generator" / "generated_scene.json"
+STORY_ID = str(uuid.uuid4())
+
+
+def session_messages(scene: Dict[str, Any], chat_replies: int) -> List[Dict[str, Any]]:
+    """The server messages of generating a scene and chatting in it, as the handlers send them"""
+    messages: List[Dict[str, Any]] = [
+        {"type": "SCENE_START", "payload": {"message": f"Scene generation starting for story {STORY_ID}"}},
+        {"type": "LOCATION_ADDED", "payload": scene["location"]},
+    ]
+    for character in scene["characters"]:
+        entity_uuid = str(uuid.uuid4())
+        messages.append({"type": "CHARACTER_ADDED", "payload": {
+            **character, "imageUrl": "/placeholder.png", "imageVariants": {}, "role": "npc", "uuid": entity_uuid,
+        }})
+        for step in range(1, 11):
+            messages.append({"type": "GENERATION_PROGRESS", "payload": {
+                "storyId": STORY_ID, "promptId": entity_uuid, "step": step, "totalSteps": 10,
+                "status": "running", "jobId": None, "preview": False,
+            }})
+    for word in scene["description"].split(" "):
+        messages.append({"type": "SCENE_DESCRIPTION_DELTA", "payload": {"storyId": STORY_ID, "delta": word + " "}})
+    messages.append({"type": "SCENE_COMPLETE", "payload": {
+        "storyId": STORY_ID, "message": "Scene generation complete.", "description": scene["description"],
+    }})
+
+    # Chat replies of ~100 words, coalesced into chunks of a few words
+    words = scene["description"].split(" ")
+    for i in range(chat_replies):
+        reply = [words[(i * 37 + j * 5) % len(words)] for j in range(100)]
+        for start in range(0, len(reply), 6):
+            messages.append({"type": "chat_chunk", "content": " ".join(reply[start:start + 6]) + " "})
+        messages.append({"type": "chat_complete"})
+    return messages
+
+
+def wire_bytes(messages: List[Dict[str, Any]], encode: Callable[[Any], bytes], opcode: int, deflate: bool) -> int:
+    """Bytes of the server frames on the wire, compressed like websockets does with context takeover"""
+    extensions = [PerMessageDeflate(False, False, 15, 15)] if deflate else []
+    return sum(len(Frame(opcode, encode(message)).serialize(mask=False, extensions=extensions)) for message in messages)
+
+
+def main(chat_replies: int) -> None:
+    scene = json.loads(SCENE_FILE.read_text())
+    messages = session_messages(scene, chat_replies)
+
+    encodings: Dict[str, Callable[[Any], bytes]] = {
+        "json": lambda message: json.dumps(message).encode(),
+    }
+    try:
+        import msgpack
+        encodings["msgpack"] = msgpack.packb
+    except ImportError:
+        print("msgpack is not installed, only measuring JSON")
+
+    print(f"{len(messages)} server messages ({chat_replies} chat replies)")
+    baseline = None
+    for name, encode in encodings.items():
+        opcode = OP_TEXT if name == "json" else OP_BINARY
+        for deflate in (False, True):
+            size = wire_bytes(messages, encode, opcode, deflate)
+            baseline = baseline or size
+            label = f"{name}{' + permessage-deflate' if deflate else ''}"
+            print(f"  {label:<28} {size:>8} bytes  {size / baseline:6.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bytes per game session by WebSocket message encoding")
+    parser.add_argument("--chat-replies", type=int, default=20)
+    args = parser.parse_args()
+    main(args.chat_replies)
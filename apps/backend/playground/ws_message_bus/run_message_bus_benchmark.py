@@ -0,0 +1,107 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import time
+from typing import Any, Dict, List
+
+from fastapi import WebSocket
+
+from app.routers.game_ws.base import BaseMessageHandler
+from app.routers.game_ws.router import GameMessageHandler
+from app.schemas.story_generation import StoryGenerationInput
+
+FRAMES = {
+    "AUTHENTICATE": json.dumps({"type": "AUTHENTICATE", "payload": {"Authorization": "Bearer " + "x" * 160}}),
+    "INITIALIZE_GAME": json.dumps({
+        "type": "INITIALIZE_GAME",
+        "payload": {
+            "story": {"theme": "redemption", "genre": "dark fantasy", "year": 1350, "setting": "a plague-struck port"},
+            "playerCharacter": {
+                "name": "Maren", "age": 34, "appearance": "weathered, grey cloak",
+                "background": "a former ship's surgeon looking for her missing brother",
+            },
+        },
+    }),
+}
+
+
+class FakeWebSocket:
+    class State:
+        username = "benchmark"
+
+    state = State()
+
+    async def send_json(self, data: Dict[str, Any]) -> None:
+        pass
+
+
+class ValidatingHandler(BaseMessageHandler):
+    """Handler doing only the payload validation of the real handlers"""
+
+    def __init__(self, message_type: str):
+        super().__init__()
+        self.message_types = {message_type}
+
+    async def handle(self, message: Dict[str, Any], websocket: WebSocket) -> bool:
+        if message.get("type") not in self.message_types:
+            return False
+        if message["type"] == "INITIALIZE_GAME":
+            StoryGenerationInput(**message.get("payload", {}))
+        else:
+            message.get("payload", {}).get("Authorization", "")
+        return True
+
+    async def handle_decoded(self, message: Any, websocket: WebSocket) -> None:
+        pass
+
+
+class OtherHandler(ValidatingHandler):
+    """Handler of a type never sent, standing for handlers added later"""
+
+    def __init__(self, index: int):
+        super().__init__(f"OTHER_{index}")
+
+
+async def previous_dispatch(handlers: List[BaseMessageHandler], frame: str, websocket: Any) -> None:
+    """The previous path: json.loads, a print, then every handler in turn"""
+    message = json.loads(frame)
+    print(f"Handling message {message.get('type')} from user: {websocket.state.username}")
+    for handler in handlers:
+        if await handler.handle(message, websocket):
+            return
+
+
+async def measure(dispatch, frame: str, messages: int) -> float:
+    """Microseconds per message"""
+    started = time.perf_counter()
+    for _ in range(messages):
+        await dispatch(frame)
+    return (time.perf_counter() - started) / messages * 1e6
+
+
+async def main(messages: int) -> None:
+    websocket = FakeWebSocket()
+    print(f"Per-message dispatch overhead, {messages} messages per row (handlers do validation only)")
+    for other_handlers in (0, 8):
+        # Types that are never sent come first, as handlers registered before the real ones
+        handlers = [OtherHandler(i) for i in range(other_handlers)]
+        handlers += [ValidatingHandler("AUTHENTICATE"), ValidatingHandler("INITIALIZE_GAME")]
+        bus = GameMessageHandler(handlers=handlers)
+        for message_type, frame in FRAMES.items():
+            # The print of the previous path goes to /dev/null, so the terminal does not dominate
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                previous = await measure(lambda f: previous_dispatch(handlers, f, websocket), frame, messages)
+            decoded = await measure(lambda f: bus.handle_frame(f, websocket), frame, messages)
+            print(
+                f"{len(handlers):2d} handlers | {message_type:<15} | previous {previous:6.1f} us "
+                f"| handle_frame {decoded:6.1f} us | {previous / decoded:4.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-message overhead of the game WebSocket dispatch")
+    parser.add_argument("--messages", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main(args.messages))
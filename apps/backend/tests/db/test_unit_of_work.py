@@ -0,0 +1,67 @@
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+
+import app.models  # noqa: F401 - registers all tables
+from app.db.session import Base
+from app.db.unit_of_work import UnitOfWork
+from app.crud import scenes as scenes_crud
+from app.models.character import Character
+from app.models.location import Location
+from app.models.story import Story
+from app.models.user import User
+
+
+@pytest.fixture
+def db() -> Session:
+    """An in-memory SQLite session with one story."""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    user = User(username="user", email="user@example.com", hashed_password="x")
+    session.add(user)
+    session.flush()
+    session.add(Story(id=1, title="Story", user_id=user.id, uuid=str(uuid.uuid4())))
+    session.commit()
+    return session
+
+
+def test_pending_objects_are_written_with_the_scene_in_one_commit(db: Session):
+    """Entities and the scene with its associations are committed together."""
+    commits = []
+    event.listen(db.get_bind(), "commit", lambda *args: commits.append(1))
+    unit_of_work = UnitOfWork(db)
+    location = Location(name="Harbor", story_id=1, uuid=str(uuid.uuid4()))
+    characters = [Character(name=f"NPC {i}", story_id=1, uuid=str(uuid.uuid4())) for i in range(2)]
+    unit_of_work.add(location)
+    for character in characters:
+        unit_of_work.add(character)
+
+    # Changes to pending objects are part of the insert
+    unit_of_work.get(characters[0].uuid).image_dir = "/media/comfyui/npc.png"
+    assert db.query(Character).count() == 0
+
+    scene = unit_of_work.commit(lambda session: scenes_crud.create_complete_scene(
+        session, 1, location.id, "A scene", [c.uuid for c in characters], commit=False
+    ))
+
+    assert len(commits) == 1
+    assert unit_of_work.pending == []
+    assert {c.name for c in scene.characters} == {"NPC 0", "NPC 1"}
+    assert db.query(Character).filter(Character.uuid == characters[0].uuid).one().image_dir == "/media/comfyui/npc.png"
+
+
+def test_failed_finalize_rolls_back_everything(db: Session):
+    """Nothing is written if the scene cannot be created."""
+    unit_of_work = UnitOfWork(db)
+    unit_of_work.add(Character(name="NPC", story_id=1, uuid=str(uuid.uuid4())))
+
+    def fail(session: Session):
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        unit_of_work.commit(fail)
+
+    assert db.query(Character).count() == 0
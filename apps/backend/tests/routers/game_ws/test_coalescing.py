@@ -0,0 +1,65 @@
+"""
+Tests for the coalescing of streamed chat chunks
+"""
+import asyncio
+from typing import AsyncIterator, List, Tuple
+
+import pytest
+
+from app.routers.game_ws.coalescing import coalesce_chunks
+
+
+async def stream(deltas: List[Tuple[str, float]]) -> AsyncIterator[str]:
+    """Yield each delta after its delay in seconds"""
+    for delta, delay in deltas:
+        await asyncio.sleep(delay)
+        yield delta
+
+
+async def collect(chunks: AsyncIterator[str]) -> List[str]:
+    return [chunk async for chunk in chunks]
+
+
+@pytest.mark.asyncio
+async def test_fast_deltas_are_joined_until_the_byte_threshold() -> None:
+    """Deltas are sent in chunks of max_bytes, the rest as soon as the stream ends"""
+    chunks = await collect(coalesce_chunks(stream([("ab", 0.01)] * 5), flush_interval=10, max_bytes=4))
+
+    assert chunks == ["abab", "abab", "ab"]
+
+
+@pytest.mark.asyncio
+async def test_buffered_text_is_flushed_when_the_stream_stalls() -> None:
+    """A stall longer than the flush interval does not hold back the text already received"""
+    deltas = [("Hello", 0), (" there", 0), (", traveller", 0.2)]
+    received = []
+
+    async def consume() -> None:
+        async for chunk in coalesce_chunks(stream(deltas), flush_interval=0.02, max_bytes=1024):
+            received.append(chunk)
+
+    task = asyncio.create_task(consume())
+    await asyncio.sleep(0.1)
+    assert received == ["Hello there"]
+    await task
+    assert received == ["Hello there", ", traveller"]
+
+
+@pytest.mark.asyncio
+async def test_zero_interval_passes_every_delta_on() -> None:
+    chunks = await collect(coalesce_chunks(stream([("a", 0), ("b", 0)]), flush_interval=0, max_bytes=1024))
+
+    assert chunks == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_stream_errors_are_raised() -> None:
+    async def failing() -> AsyncIterator[str]:
+        yield "partial"
+        raise RuntimeError("LLM stream broke")
+
+    received = []
+    with pytest.raises(RuntimeError, match="LLM stream broke"):
+        async for chunk in coalesce_chunks(failing(), flush_interval=0.01, max_bytes=1024):
+            received.append(chunk)
+    assert received == ["partial"]
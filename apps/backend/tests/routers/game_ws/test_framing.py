@@ -0,0 +1,63 @@
+"""
+Tests for the negotiated encoding of game WebSocket messages
+"""
+import json
+
+import pytest
+from fastapi import FastAPI, WebSocket
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.routers.game_ws.framing import (
+    JSON_SUBPROTOCOL,
+    MSGPACK_SUBPROTOCOL,
+    accept,
+    select_subprotocol,
+    send_model
+)
+from app.schemas.conversation import ChatChunkMessage
+
+MESSAGE = {"type": "CHARACTER_ADDED", "payload": {"name": "Maren", "relationships": [{"level": 3}]}}
+
+
+def create_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.websocket("/ws")
+    async def endpoint(websocket: WebSocket):
+        websocket = await accept(websocket)
+        await websocket.send_json(MESSAGE)
+        await send_model(websocket, ChatChunkMessage(type="chat_chunk", content="Hello"))
+        await websocket.close()
+
+    return app
+
+
+def test_clients_without_a_subprotocol_get_json_text_frames():
+    """Clients from before the negotiation are accepted without a subprotocol and get JSON"""
+    with TestClient(create_app()).websocket_connect("/ws") as websocket:
+        assert websocket.accepted_subprotocol is None
+        assert websocket.receive_json() == MESSAGE
+        assert json.loads(websocket.receive_text()) == {"type": "chat_chunk", "content": "Hello"}
+
+
+def test_msgpack_is_not_selected_when_disabled(monkeypatch):
+    """A client offering MessagePack and JSON falls back to JSON"""
+    monkeypatch.setattr(settings, "WS_MSGPACK_ENABLED", False)
+
+    assert select_subprotocol([MSGPACK_SUBPROTOCOL, JSON_SUBPROTOCOL]) == JSON_SUBPROTOCOL
+    assert select_subprotocol(["graphql-ws"]) is None
+    with TestClient(create_app()).websocket_connect("/ws", subprotocols=[MSGPACK_SUBPROTOCOL, JSON_SUBPROTOCOL]) as websocket:
+        assert websocket.accepted_subprotocol == JSON_SUBPROTOCOL
+        assert websocket.receive_json() == MESSAGE
+
+
+def test_msgpack_clients_get_binary_frames(monkeypatch):
+    """Messages sent with send_json and send_model arrive as MessagePack binary frames"""
+    msgpack = pytest.importorskip("msgpack")
+    monkeypatch.setattr(settings, "WS_MSGPACK_ENABLED", True)
+
+    with TestClient(create_app()).websocket_connect("/ws", subprotocols=[MSGPACK_SUBPROTOCOL, JSON_SUBPROTOCOL]) as websocket:
+        assert websocket.accepted_subprotocol == MSGPACK_SUBPROTOCOL
+        assert msgpack.unpackb(websocket.receive_bytes()) == MESSAGE
+        assert msgpack.unpackb(websocket.receive_bytes()) == {"type": "chat_chunk", "content": "Hello"}
@@ -1,6 +1,7 @@
 """
 Tests for the game_ws router
 """
+import json
 from typing import Dict, Any, List, Optional
 from unittest.mock import AsyncMock
 
@@ -9,6 +10,7 @@ from fastapi import WebSocket
 
 from app.routers.game_ws.router import GameMessageHandler
 from app.routers.game_ws.base import BaseMessageHandler
+from app.schemas.schemas_ws import AuthenticateMessage
 
 
 class MockHandler(BaseMessageHandler):
@@ -126,10 +128,7 @@ async def test_multiple_handlers(mock_websocket: AsyncMock) -> None:
     """Test message routing with multiple handlers"""
     # Create handlers for different message types
     handler1 = MockHandler(message_types=["TYPE1"])
-    handler1.handle_mock.return_value = False  # This handler doesn't handle the message
-    
     handler2 = MockHandler(message_types=["TYPE2"])
-    handler2.handle_mock.return_value = True  # This handler handles the message
     
     # Create game handler with both mock handlers using dependency injection
     game_handler = GameMessageHandler(handlers=[handler1, handler2])
@@ -137,14 +136,60 @@ async def test_multiple_handlers(mock_websocket: AsyncMock) -> None:
     # Send message of type TYPE2
     await game_handler.handle_message({"type": "TYPE2"}, mock_websocket)
     
-    # Verify both handlers were tried, but only handler2 actually handled it
-    assert handler1.handle_called
+    # Verify the message went straight to the handler declaring its type
+    assert not handler1.handle_called
     assert handler2.handle_called
     
     # No error response should be sent
     mock_websocket.send_json.assert_not_called()
 
 
+class DecodedHandler(MockHandler):
+    """Mock handler recording the decoded messages it receives"""
+
+    def __init__(self, message_types: List[str]):
+        super().__init__(message_types)
+        self.decoded: List[Any] = []
+
+    async def handle_decoded(self, message: Any, websocket: WebSocket) -> None:
+        self.decoded.append(message)
+
+
+@pytest.mark.asyncio
+async def test_handle_frame_dispatches_decoded_messages(mock_websocket: AsyncMock) -> None:
+    """Frames are validated against the model of their type and passed to its handler"""
+    handler = DecodedHandler(message_types=["AUTHENTICATE", "INITIALIZE_GAME"])
+    game_handler = GameMessageHandler(handlers=[handler])
+
+    await game_handler.handle_frame(
+        json.dumps({"type": "AUTHENTICATE", "payload": {"Authorization": "Bearer token"}}), mock_websocket
+    )
+
+    assert isinstance(handler.decoded[0], AuthenticateMessage)
+    assert handler.decoded[0].payload.Authorization == "Bearer token"
+    mock_websocket.send_json.assert_not_called()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("frame, error", [
+    ("not valid json", "Invalid JSON"),
+    ("{}", "Missing message type"),
+    ('{"type": "UNKNOWN_TYPE"}', "Unknown message type"),
+    ('{"type": "INITIALIZE_GAME", "payload": {}}', "Invalid input data"),
+])
+async def test_handle_frame_errors(mock_websocket: AsyncMock, frame: str, error: str) -> None:
+    """Invalid frames are answered with an error and never reach a handler"""
+    handler = DecodedHandler(message_types=["INITIALIZE_GAME"])
+    game_handler = GameMessageHandler(handlers=[handler])
+
+    await game_handler.handle_frame(frame, mock_websocket)
+
+    response = mock_websocket.send_json.call_args[0][0]
+    assert response["type"] == "ERROR"
+    assert error in response["payload"]["message"]
+    assert handler.decoded == [] and not handler.handle_called
+
+
 @pytest.mark.asyncio
 async def test_handler_factory() -> None:
     """Test the handler factory functionality"""
@@ -161,4 +206,18 @@ async def test_handler_factory() -> None:
     handler = GameMessageHandler(handler_factory=custom_factory)
     
     # Verify custom factory was used
-    assert handler.handlers[0] is mock_handler 
\ No newline at end of file
+    assert handler.handlers[0] is mock_handler 
+
+def test_entity_reservoir_stats_endpoint(monkeypatch, test_client):
+    """GET /game/reservoirs serves the metrics of the entity reservoirs"""
+    stats = {
+        "storyUuid": "story-1", "sessions": 1, "characters": 2, "maxCharacters": 3, "locations": 1,
+        "maxLocations": 2, "hits": 3, "misses": 1, "generated": 5, "hitRate": 0.75,
+        "characterHitRate": 1.0, "locationHitRate": 0.5,
+    }
+    monkeypatch.setattr("app.routers.game_ws.router.reservoir_stats", lambda: [stats])
+
+    response = test_client.get("/api/game/reservoirs")
+
+    assert response.status_code == 200
+    assert response.json() == [stats]
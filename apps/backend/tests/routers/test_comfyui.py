@@ -0,0 +1,84 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.main import app
+from app.schemas.comfyui import GenerationProgressResponse
+from app.services.image_generation.generation_jobs import GenerationJobs
+
+
+class FakeComfyUIService:
+    """Generation that reports one sampling step and waits to be released"""
+
+    def __init__(self, release: asyncio.Event):
+        self.release = release
+
+    async def generate_image(self, prompt, context_type="character", on_progress=None, **kwargs):
+        await on_progress(GenerationProgressResponse(promptId="p1", step=0, totalSteps=0, status="queued"))
+        await on_progress(GenerationProgressResponse(promptId="p1", step=1, totalSteps=2, status="running"))
+        await self.release.wait()
+        await on_progress(GenerationProgressResponse(promptId="p1", step=1, totalSteps=1, status="completed"))
+        return {"success": True, "imagePath": "/media/comfyui/ab/abc.png", "promptId": "p1"}
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    release = asyncio.Event()
+    jobs = GenerationJobs(service_factory=lambda: FakeComfyUIService(release))
+    jobs.release = release
+    monkeypatch.setattr("app.routers.comfyui.get_generation_jobs", lambda: jobs)
+    return jobs
+
+
+@pytest.mark.asyncio
+async def test_generate_image_returns_a_job_right_away(jobs):
+    """The request returns before the image is generated; polling shows progress, then the result."""
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post(
+            "/api/comfyui/generate-image", json={"prompt": "a lighthouse", "context_type": "location"}
+        )
+        assert response.status_code == 202
+        job_id = response.json()["jobId"]
+
+        await asyncio.sleep(0.01)
+        running = (await client.get(f"/api/comfyui/jobs/{job_id}")).json()
+        assert running["status"] == "running"
+        assert running["progress"]["step"] == 1 and running["progress"]["jobId"] == job_id
+        assert running["result"] is None
+
+        jobs.release.set()
+        await asyncio.sleep(0.01)
+        completed = (await client.get(f"/api/comfyui/jobs/{job_id}")).json()
+        assert completed["status"] == "completed"
+        assert completed["result"]["imagePath"] == "/media/comfyui/ab/abc.png"
+
+        assert (await client.get("/api/comfyui/jobs/unknown")).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_job_events_stream_progress_until_completion(jobs):
+    """The event stream starts with the last progress and ends with the completion event."""
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        job_id = (await client.post("/api/comfyui/generate-image", json={"prompt": "a lighthouse"})).json()["jobId"]
+        await asyncio.sleep(0.01)
+        asyncio.get_running_loop().call_later(0.05, jobs.release.set)
+        response = await client.get(f"/api/comfyui/jobs/{job_id}/events")
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [
+        json.loads(line[len("data: "):]) for line in response.text.splitlines() if line.startswith("data: ")
+    ]
+    assert [(event["status"], event["step"]) for event in events] == [("running", 1), ("completed", 1)]
+    assert all(event["jobId"] == job_id for event in events)
+
+
+@pytest.mark.asyncio
+async def test_generate_image_rejects_unknown_profiles(jobs):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post("/api/comfyui/generate-image", json={"prompt": "a lighthouse", "profile": "ultra"})
+        profiles = (await client.get("/api/comfyui/profiles")).json()
+
+    assert response.status_code == 400
+    assert [profile["name"] for profile in profiles] == ["fast", "balanced", "quality"]
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from app.services.game_engine.orchestrators.dag_executor import DagExecutor, DagNode
+
+
+def sleeper(result, delay: float = 0.05):
+    async def step(*inputs):
+        await asyncio.sleep(delay)
+        return (result, inputs)
+    return step
+
+
+@pytest.mark.asyncio
+async def test_independent_steps_run_concurrently():
+    """Nodes start once their inputs are ready and receive the input results in order."""
+    nodes = [
+        DagNode("description", sleeper("description")),
+        DagNode("rules", sleeper("rules"), ("description",)),
+        DagNode("image", sleeper("image"), ("description",)),
+        DagNode("story", lambda description, rules, image: "story", ("description", "rules", "image")),
+    ]
+
+    run = await DagExecutor(max_concurrency=4).run(nodes)
+
+    assert run.results["rules"] == ("rules", (("description", ()),))
+    assert run.results["story"] == "story"
+    assert run.timings["image"].start < run.timings["rules"].end
+    assert run.total < run.sum_of_steps
+    path, _ = run.critical_path()
+    assert path[0] == "description" and path[-1] == "story"
+
+
+@pytest.mark.asyncio
+async def test_concurrency_cap():
+    """No more than max_concurrency nodes run at the same time."""
+    running = 0
+    peak = 0
+
+    async def step():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    await DagExecutor(max_concurrency=2).run([DagNode(f"step_{i}", step) for i in range(5)])
+
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_failure_cancels_remaining_steps():
+    """The first error is raised and steps that have not finished are cancelled."""
+    cancelled = asyncio.Event()
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def fail():
+        raise RuntimeError("LLM unavailable")
+
+    with pytest.raises(RuntimeError, match="LLM unavailable"):
+        await DagExecutor().run([DagNode("slow", slow), DagNode("fail", fail)])
+    assert cancelled.is_set()
+
+
+@pytest.mark.asyncio
+async def test_invalid_graphs_are_rejected():
+    """Unknown inputs and cycles are reported before anything runs."""
+    with pytest.raises(ValueError, match="unknown node"):
+        await DagExecutor().run([DagNode("a", lambda x: x, ("missing",))])
+    with pytest.raises(ValueError, match="cycle"):
+        await DagExecutor().run([DagNode("a", lambda b: b, ("b",)), DagNode("b", lambda a: a, ("a",))])
@@ -0,0 +1,171 @@
+import asyncio
+import uuid
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.core.config import settings
+from app.services.game_engine.orchestrators import entity_reservoir
+from app.services.game_engine.orchestrators.entity_reservoir import EntityReservoir, evict_reservoirs, reservoir_stats
+from app.services.game_engine.tools.character_generator import CharacterGenerator
+from app.services.game_engine.tools.location_generator import LocationGenerator
+from app.schemas.story_generation import Story, Character, Location, CharacterDraft
+
+
+def make_character(name: str) -> Character:
+    return Character(
+        name=name, description=f"{name} runs the night market.", backstory=f"{name} grew up here.",
+        goals=[], relationships=[], imageUrl="http://backend/image.png", role="npc", uuid=str(uuid.uuid4())
+    )
+
+
+def make_location(name: str) -> Location:
+    return Location(
+        name=name, description=f"{name} is loud at night.", rules=[],
+        imageUrl="http://backend/image.png", uuid=str(uuid.uuid4())
+    )
+
+
+@pytest.fixture
+def reservoir() -> EntityReservoir:
+    """Create a reservoir backed by mock generators."""
+    character_generator = MagicMock(spec=CharacterGenerator)
+    character_generator.create_character_draft_from_description = AsyncMock(
+        return_value=CharacterDraft(name="Mara", age=40, appearance="", background="")
+    )
+    character_generator.generate_character = AsyncMock(side_effect=lambda *args, **kwargs: make_character("Mara"))
+    location_generator = MagicMock(spec=LocationGenerator)
+    location_generator.generate_location = AsyncMock(side_effect=lambda *args, **kwargs: make_location("Harbor"))
+    story = Story(title="Test Story", description="A test story", rules=[], uuid=str(uuid.uuid4()), id=1)
+    return EntityReservoir(
+        story, character_generator, location_generator, characters_size=2, locations_size=1, retry_delay=0
+    )
+
+
+async def wait_until_full(reservoir: EntityReservoir) -> None:
+    for _ in range(100):
+        if reservoir._next_kind() is None:
+            return
+        await asyncio.sleep(0)
+    raise AssertionError("Reservoir was not refilled")
+
+
+@pytest.mark.asyncio
+async def test_refill_generates_unsaved_entities(reservoir: EntityReservoir):
+    """The refill task fills the reservoir without saving entities to the story."""
+    reservoir.open_session()
+    await wait_until_full(reservoir)
+    await reservoir.stop()
+
+    assert len(reservoir.characters) == 2
+    assert len(reservoir.locations) == 1
+    for call in reservoir.character_generator.generate_character.call_args_list:
+        assert call.kwargs["persist"] is False
+    assert reservoir.location_generator.generate_location.call_args.kwargs["persist"] is False
+
+
+@pytest.mark.asyncio
+async def test_entities_without_an_image_are_not_reserved(reservoir: EntityReservoir):
+    """A character whose image generation failed got the placeholder and is generated again."""
+    failed = make_character("Mara").model_copy(update={"imageUrl": settings.PLACEHOLDER_IMAGE_URL})
+    reservoir.character_generator.generate_character = AsyncMock(
+        side_effect=[failed, make_character("Mara"), make_character("Ilse")]
+    )
+    reservoir.open_session()
+    await wait_until_full(reservoir)
+    await reservoir.stop()
+
+    assert reservoir.character_generator.generate_character.await_count == 3
+    assert failed not in reservoir.characters
+    assert all(c.imageUrl != settings.PLACEHOLDER_IMAGE_URL for c in reservoir.characters)
+
+
+@pytest.mark.asyncio
+async def test_refill_waits_while_busy(reservoir: EntityReservoir):
+    """Nothing is generated while a scene is being generated for the story."""
+    async with reservoir.busy():
+        reservoir.open_session()
+        for _ in range(10):
+            await asyncio.sleep(0)
+        assert reservoir.character_generator.generate_character.await_count == 0
+
+    await wait_until_full(reservoir)
+    await reservoir.stop()
+
+
+@pytest.mark.asyncio
+async def test_refill_only_runs_during_a_session(reservoir: EntityReservoir):
+    """Nothing is generated for a story nobody plays, and refilling pauses when its last session ends."""
+    reservoir.start()
+    for _ in range(10):
+        await asyncio.sleep(0)
+    assert reservoir.character_generator.generate_character.await_count == 0
+
+    reservoir.open_session()
+    await wait_until_full(reservoir)
+    reservoir.close_session()
+    reservoir.claim_character(reservoir.characters[0].uuid)
+    for _ in range(10):
+        await asyncio.sleep(0)
+    assert len(reservoir.characters) == 1
+
+    reservoir.open_session()
+    await wait_until_full(reservoir)
+    await reservoir.stop()
+
+
+@pytest.mark.asyncio
+async def test_idle_and_least_recently_used_reservoirs_are_evicted(monkeypatch, reservoir: EntityReservoir):
+    """Reservoirs without a session are dropped after the idle TTL or beyond the size cap, their task cancelled."""
+    def make_reservoir(sessions: int, idle: float) -> EntityReservoir:
+        story = Story(title="Story", description="", rules=[], uuid=str(uuid.uuid4()), id=1)
+        r = EntityReservoir(story, reservoir.character_generator, reservoir.location_generator)
+        r.sessions = sessions
+        r.last_used -= idle
+        return r
+
+    idle, old, recent = make_reservoir(0, 120), make_reservoir(0, 30), make_reservoir(0, 10)
+    playing = make_reservoir(1, 120)
+    registry = entity_reservoir.OrderedDict((r.story.uuid, r) for r in (idle, old, recent, playing))
+    monkeypatch.setattr(entity_reservoir, "_reservoirs", registry)
+    idle.start()
+
+    evict_reservoirs(idle_ttl=60, max_stories=2)
+    await asyncio.sleep(0)
+
+    assert list(registry.values()) == [recent, playing]
+    assert idle._refill_task is None
+
+
+@pytest.mark.asyncio
+async def test_claim_renames_and_reports_hit_rate(reservoir: EntityReservoir):
+    """A claimed character is renamed, removed from the reservoir and counted as a hit."""
+    character = make_character("Mara")
+    reservoir.characters.append(character)
+
+    claimed = reservoir.claim_character(character.uuid, name="Ilse")
+    reservoir.record_miss("character")
+
+    assert claimed is not None
+    assert claimed.uuid == character.uuid
+    assert claimed.name == "Ilse"
+    assert claimed.description == "Ilse runs the night market."
+    assert reservoir.characters == []
+    assert reservoir.claim_character(character.uuid) is None
+    assert reservoir.hit_rate("character") == 0.5
+    assert reservoir.hit_rate("location") is None
+
+
+def test_stats_of_all_reservoirs(monkeypatch, reservoir: EntityReservoir):
+    """Each reservoir reports its content and hit rates, as served at GET /game/reservoirs."""
+    registry = entity_reservoir.OrderedDict({reservoir.story.uuid: reservoir})
+    monkeypatch.setattr(entity_reservoir, "_reservoirs", registry)
+    reservoir.locations.append(make_location("Harbor"))
+    reservoir.claim_location(reservoir.locations[0].uuid)
+    reservoir.record_miss("character")
+
+    [stats] = reservoir_stats()
+    assert stats["storyUuid"] == reservoir.story.uuid
+    assert (stats["characters"], stats["maxCharacters"], stats["locations"], stats["maxLocations"]) == (0, 2, 0, 1)
+    assert (stats["hits"], stats["misses"], stats["hitRate"]) == (1, 1, 0.5)
+    assert (stats["characterHitRate"], stats["locationHitRate"]) == (0.0, 1.0)
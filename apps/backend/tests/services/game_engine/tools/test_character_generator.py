@@ -1,6 +1,7 @@
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 
+from app.core.config import settings
 from app.services.game_engine.tools.character_generator import CharacterGenerator
 from app.schemas.story_generation import (
     CharacterDraft, 
@@ -105,3 +106,91 @@ async def test_generate_character(
     # Verify expected calls
     assert mock_llm_service.generate_completion.call_count == 3
     assert mock_llm_service.extract_content.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_generate_character_with_deferred_image(
+    character_generator: CharacterGenerator,
+    test_character_draft: CharacterDraft,
+    mock_llm_service: MagicMock
+):
+    """The character is returned with a placeholder and the image is delivered through the callback."""
+    story = Story(title="Test Story", description="A test story description", rules=[])
+    character_from_llm = CharacterFromLLM(
+        name="Test Character",
+        description="Tall with brown hair",
+        personalityTraits=["Brave"],
+        backstory="A mysterious background",
+        goals=["Find the truth"],
+        relationships=[]
+    )
+    mock_llm_service.extract_content.return_value = "llm output"
+    on_image_ready = AsyncMock()
+
+    with patch('app.utils.json_service.JSONService.parse_and_validate_json_response',
+               return_value=character_from_llm), \
+         patch.object(settings, "BACKEND_URL", "http://backend"), \
+         patch.object(character_generator, '_generate_image_result', AsyncMock(
+             return_value={"success": True, "imagePath": "/image.png"}
+         )):
+        result = await character_generator.generate_character(
+            test_character_draft, story, is_player=False, on_image_ready=on_image_ready
+        )
+
+        assert result.imageUrl == settings.PLACEHOLDER_IMAGE_URL
+        await character_generator.deferred_images.wait()
+
+    on_image_ready.assert_awaited_once_with(result.uuid, "http://backend/image.png")
+    assert character_generator.deferred_images.pending == 0
+    # Description, JSON and image prompt
+    assert mock_llm_service.generate_completion.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_failed_image_falls_back_to_placeholder(character_generator: CharacterGenerator):
+    """An image generation that did not succeed yields the placeholder, not a bare BACKEND_URL."""
+    with patch.object(settings, "BACKEND_URL", "http://backend"), \
+         patch.object(character_generator, '_generate_image_result', AsyncMock(
+             return_value={"success": False, "error": "ComfyUI is down", "imagePath": ""}
+         )):
+        image_url = await character_generator._generate_image("a portrait", "character-1")
+
+    assert image_url == settings.PLACEHOLDER_IMAGE_URL
+
+
+@pytest.mark.asyncio
+async def test_generate_characters_batch_with_fallback(
+    character_generator: CharacterGenerator,
+    mock_llm_service: MagicMock
+):
+    """Valid batch entries are used as is, invalid entries are regenerated on their own."""
+    story = Story(title="Test Story", description="A test story description", rules=[])
+    drafts = [
+        CharacterDraft(name="Ada", age=30, appearance="Short", background="A smith"),
+        CharacterDraft(name="Bram", age=50, appearance="Tall", background="A sailor"),
+    ]
+    # The second entry misses its backstory
+    mock_llm_service.extract_content.return_value = """
+    [
+        {"name": "Ada", "description": "A smith", "personalityTraits": ["Calm"],
+         "backstory": "Forged swords", "goals": ["Rest"], "relationships": []},
+        {"name": "Bram", "description": "A sailor", "goals": [], "relationships": []}
+    ]
+    """
+    regenerated = Character(
+        name="Bram", description="A sailor", backstory="Sailed far", goals=[], relationships=[],
+        imageUrl="http://backend/bram.png", role="npc", uuid="bram-uuid"
+    )
+
+    with patch.object(character_generator, '_generate_image_prompt', AsyncMock(return_value="prompt")), \
+         patch.object(character_generator, '_generate_image', AsyncMock(return_value="http://backend/ada.png")), \
+         patch.object(character_generator, 'generate_character', AsyncMock(return_value=regenerated)) as single:
+        result = await character_generator.generate_characters(drafts, story)
+
+    assert [character.name for character in result] == ["Ada", "Bram"]
+    assert result[0].imageUrl == "http://backend/ada.png"
+    assert result[1] is regenerated
+    single.assert_awaited_once()
+    assert single.await_args.args[0] == drafts[1]
+    # One batch call describes and structures both characters
+    assert mock_llm_service.generate_completion.call_count == 1
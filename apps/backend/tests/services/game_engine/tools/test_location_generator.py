@@ -1,6 +1,7 @@
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 
+from app.core.config import settings
 from app.services.game_engine.tools.location_generator import LocationGenerator
 from app.schemas.story_generation import Location, Story, LocationFromLLM
 from app.services.llm import LLMService
@@ -78,4 +79,35 @@ async def test_generate_location(
     assert result.imagePrompt == image_prompt
     
     # Verify expected calls
-    assert mock_llm_service.extract_content.call_count == 3 
\ No newline at end of file
+    assert mock_llm_service.extract_content.call_count == 3 
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("generation", [
+    AsyncMock(side_effect=RuntimeError("ComfyUI down")),
+    AsyncMock(return_value={"success": False, "error": "No image generated", "imagePath": ""}),
+], ids=["raised", "unsuccessful"])
+async def test_generate_location_with_deferred_image(
+    location_generator: LocationGenerator,
+    mock_llm_service: MagicMock,
+    generation: AsyncMock
+):
+    """The location is returned with a placeholder and a failed image generation leaves it in place."""
+    story = Story(title="Test Story", description="A test story description", rules=[])
+    location_from_llm = LocationFromLLM(
+        name="Test Location",
+        description="A beautiful test location",
+        rules=[],
+    )
+    mock_llm_service.extract_content.return_value = "llm output"
+    on_image_ready = AsyncMock()
+
+    with patch('app.utils.json_service.JSONService.parse_and_validate_json_response',
+               return_value=location_from_llm), \
+         patch.object(location_generator, '_generate_image_result', generation):
+        result = await location_generator.generate_location(story, "A quiet harbor", on_image_ready=on_image_ready)
+
+        assert result.imageUrl == settings.PLACEHOLDER_IMAGE_URL
+        await location_generator.deferred_images.wait()
+
+    on_image_ready.assert_not_awaited()
+    assert location_generator.deferred_images.pending == 0
@@ -0,0 +1,289 @@
+import argparse
+import asyncio
+import base64
+import logging
+import struct
+import time
+import uuid
+import zlib
+from collections import deque
+from typing import Any, Deque, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from fastapi import FastAPI, File, Request, Response, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
+
+from app.services.image_generation.workflow_models import workflow_models
+
+# 1x1 transparent PNG returned for every generated image
+STUB_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+)
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def stub_png(filename: str) -> bytes:
+    """STUB_PNG with the image's filename in a text chunk, so every image has its own content"""
+    data = b"Title\0" + filename.encode("utf-8")
+    chunk = struct.pack(">I", len(data)) + b"tEXt" + data + struct.pack(">I", zlib.crc32(b"tEXt" + data))
+    # The text chunk goes before the 12 byte IEND chunk
+    return STUB_PNG[:-12] + chunk + STUB_PNG[-12:]
+
+
+# Samplers that evaluate the model twice per step
+SECOND_ORDER_SAMPLERS = ("heun", "dpm_2", "dpm_2_ancestral")
+
+
+class StubComfyUI:
+    """
+    In-memory stand-in for a ComfyUI backend.
+
+    Prompts are executed one after another like on a single GPU: each takes load_delay
+    seconds of per-prompt overhead (loading and moving models) plus delay seconds per
+    SaveImage node, split into steps progress events. With step_delay set, the time of an
+    image follows its KSampler nodes instead: step_delay seconds per model evaluation, two
+    per step for second-order samplers. A prompt loading other models than the previous one
+    takes model_load_delay seconds more. With fail set, every prompt ends in execution_error.
+    Pending prompts can be deleted and the running one interrupted. The history records
+    execution timestamps like ComfyUI does.
+    """
+
+    def __init__(
+        self,
+        delay: float = 0.5,
+        steps: int = 4,
+        fail: bool = False,
+        load_delay: float = 0,
+        step_delay: float = 0,
+        model_load_delay: float = 0
+    ):
+        self.delay = delay
+        self.load_delay = load_delay
+        self.step_delay = step_delay
+        self.model_load_delay = model_load_delay
+        self.loaded_models: FrozenSet[str] = frozenset()
+        self.model_loads = 0
+        self.steps = steps
+        self.fail = fail
+        self.pending: Deque[Tuple[str, str, Dict[str, Any]]] = deque()
+        self.running: Optional[str] = None
+        self.history: Dict[str, Dict[str, Any]] = {}
+        self.inputs: List[str] = []
+        self.sockets: Dict[str, Set[WebSocket]] = {}
+        self.executed = 0
+        self.deleted: List[str] = []
+        self.interrupted: List[str] = []
+        self._sampling: Optional["asyncio.Task[None]"] = None
+        self._wakeup = asyncio.Event()
+        self._worker: Optional["asyncio.Task[None]"] = None
+
+    def queue(self, prompt: Dict[str, Any], client_id: str) -> str:
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+        prompt_id = str(uuid.uuid4())
+        self.pending.append((prompt_id, client_id, prompt))
+        self._wakeup.set()
+        return prompt_id
+
+    def delete(self, prompt_ids: List[str]) -> None:
+        """Remove prompts from the pending queue"""
+        self.deleted.extend(prompt_id for prompt_id, _, _ in self.pending if prompt_id in prompt_ids)
+        self.pending = deque(item for item in self.pending if item[0] not in prompt_ids)
+
+    def interrupt(self, prompt_id: Optional[str]) -> None:
+        """Stop the running prompt, only if it is prompt_id when one is given"""
+        if self.running is None or self._sampling is None or prompt_id not in (None, self.running):
+            return
+        self.interrupted.append(self.running)
+        self._sampling.cancel()
+
+    async def _run(self) -> None:
+        while True:
+            if not self.pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            prompt_id, client_id, prompt = self.pending.popleft()
+            self.running = prompt_id
+            try:
+                await self._execute(prompt_id, client_id, prompt)
+            except Exception as e:
+                logging.error(f"Stub ComfyUI failed to execute {prompt_id}: {e}")
+            finally:
+                self.running = None
+
+    async def _execute(self, prompt_id: str, client_id: str, prompt: Dict[str, Any]) -> None:
+        messages: List[List[Any]] = [["execution_start", {"prompt_id": prompt_id, "timestamp": _now_ms()}]]
+        await self._send(client_id, "execution_start", {"prompt_id": prompt_id})
+        self._sampling = asyncio.create_task(self._sample(prompt_id, client_id, prompt))
+        try:
+            await self._sampling
+        except asyncio.CancelledError:
+            if prompt_id not in self.interrupted:
+                raise
+            messages.append(["execution_interrupted", {"prompt_id": prompt_id, "timestamp": _now_ms()}])
+            self.history[prompt_id] = {"prompt": prompt, "outputs": {}, "status": {"messages": messages}}
+            await self._send(client_id, "execution_interrupted", {"prompt_id": prompt_id})
+            return
+        finally:
+            self._sampling = None
+        self.executed += 1
+
+        if self.fail:
+            messages.append(["execution_error", {"prompt_id": prompt_id, "timestamp": _now_ms()}])
+            self.history[prompt_id] = {"prompt": prompt, "outputs": {}, "status": {"messages": messages}}
+            await self._send(
+                client_id, "execution_error", {"prompt_id": prompt_id, "exception_message": "Stub failure"}
+            )
+            return
+
+        outputs: Dict[str, Any] = {}
+        for node_id, node in prompt.items():
+            if node.get("class_type") == "SaveImage":
+                prefix = node.get("inputs", {}).get("filename_prefix", "stub")
+                outputs[node_id] = {"images": [{"filename": f"{prefix}_00001_.png", "subfolder": "", "type": "output"}]}
+        if not outputs:
+            outputs["0"] = {"images": [{"filename": f"{prompt_id}.png", "subfolder": "", "type": "output"}]}
+        messages.append(["execution_success", {"prompt_id": prompt_id, "timestamp": _now_ms()}])
+        self.history[prompt_id] = {
+            "prompt": prompt, "outputs": outputs, "status": {"completed": True, "messages": messages}
+        }
+        await self._send(client_id, "executing", {"prompt_id": prompt_id, "node": None})
+
+    async def _sample(self, prompt_id: str, client_id: str, prompt: Dict[str, Any]) -> None:
+        await asyncio.sleep(self.load_delay)
+        models = workflow_models(prompt)
+        if models and models != self.loaded_models:
+            self.loaded_models = models
+            self.model_loads += 1
+            await asyncio.sleep(self.model_load_delay)
+        seconds = self._render_seconds(prompt)
+        for step in range(1, self.steps + 1):
+            await asyncio.sleep(seconds / self.steps)
+            await self._send(client_id, "progress", {"prompt_id": prompt_id, "value": step, "max": self.steps})
+
+    def _render_seconds(self, prompt: Dict[str, Any]) -> float:
+        images = max(1, sum(1 for node in prompt.values() if node.get("class_type") == "SaveImage"))
+        if not self.step_delay:
+            return self.delay * images
+        evaluations = 0
+        for node in prompt.values():
+            if node.get("class_type") == "KSampler":
+                inputs = node.get("inputs", {})
+                per_step = 2 if inputs.get("sampler_name") in SECOND_ORDER_SAMPLERS else 1
+                evaluations += int(inputs.get("steps", 0)) * per_step
+        return self.step_delay * evaluations
+
+    async def _send(self, client_id: str, event_type: str, data: Dict[str, Any]) -> None:
+        for websocket in list(self.sockets.get(client_id, ())):
+            try:
+                await websocket.send_json({"type": event_type, "data": data})
+            except Exception:
+                self.sockets[client_id].discard(websocket)
+
+
+def create_stub_app(
+    delay: float = 0.5,
+    steps: int = 4,
+    fail: bool = False,
+    load_delay: float = 0,
+    step_delay: float = 0,
+    model_load_delay: float = 0
+) -> FastAPI:
+    """
+    FastAPI app serving the parts of the ComfyUI API used by ComfyUIClient.
+
+    Used to test the scheduler against several backends without GPUs, either in-process
+    through httpx.ASGITransport or as a server on its own port.
+    """
+    app = FastAPI(title="Stub ComfyUI")
+    comfyui = StubComfyUI(delay, steps, fail, load_delay, step_delay, model_load_delay)
+    app.state.comfyui = comfyui
+
+    @app.post("/prompt")
+    async def queue_prompt(request: Request):
+        body = await request.json()
+        prompt = body.get("prompt")
+        if not isinstance(prompt, dict):
+            return JSONResponse({"error": "Invalid prompt"}, status_code=400)
+        prompt_id = comfyui.queue(prompt, body.get("client_id", ""))
+        return {"prompt_id": prompt_id, "number": len(comfyui.pending)}
+
+    @app.get("/queue")
+    async def get_queue():
+        running = [[0, comfyui.running]] if comfyui.running else []
+        pending = [[i + 1, prompt_id] for i, (prompt_id, _, _) in enumerate(comfyui.pending)]
+        return {"queue_running": running, "queue_pending": pending}
+
+    @app.post("/queue")
+    async def edit_queue(request: Request):
+        body = await request.json()
+        comfyui.delete(body.get("delete", []))
+        return {}
+
+    @app.post("/interrupt")
+    async def interrupt(request: Request):
+        body = await request.json() if await request.body() else {}
+        comfyui.interrupt(body.get("prompt_id"))
+        return {}
+
+    @app.get("/history/{prompt_id}")
+    async def get_history(prompt_id: str):
+        if prompt_id not in comfyui.history:
+            return {}
+        return {prompt_id: comfyui.history[prompt_id]}
+
+    @app.get("/view")
+    async def view(filename: str, subfolder: str = "", type: str = "output"):
+        return Response(content=stub_png(filename), media_type="image/png")
+
+    @app.post("/upload/image")
+    async def upload_image(image: UploadFile = File(...)):
+        name = image.filename or f"{uuid.uuid4()}.png"
+        await image.read()
+        if name not in comfyui.inputs:
+            comfyui.inputs.append(name)
+        return {"name": name, "subfolder": "", "type": "input"}
+
+    @app.get("/object_info/LoadImage")
+    async def load_image_info():
+        return {"LoadImage": {"input": {"required": {"image": [comfyui.inputs, {}]}}}}
+
+    @app.websocket("/ws")
+    async def events(websocket: WebSocket, clientId: str = ""):
+        await websocket.accept()
+        comfyui.sockets.setdefault(clientId, set()).add(websocket)
+        await websocket.send_json({"type": "status", "data": {"sid": clientId}})
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            comfyui.sockets[clientId].discard(websocket)
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run a stub ComfyUI backend")
+    parser.add_argument("--port", type=int, default=8188)
+    parser.add_argument("--delay", type=float, default=0.5, help="Seconds per generated image")
+    parser.add_argument("--load-delay", type=float, default=0, help="Seconds of overhead per prompt")
+    parser.add_argument("--step-delay", type=float, default=0, help="Seconds per sampler model evaluation")
+    parser.add_argument("--model-load-delay", type=float, default=0, help="Seconds to load other models")
+    parser.add_argument("--fail", action="store_true", help="Fail every prompt")
+    args = parser.parse_args()
+    uvicorn.run(
+        create_stub_app(
+            args.delay,
+            fail=args.fail,
+            load_delay=args.load_delay,
+            step_delay=args.step_delay,
+            model_load_delay=args.model_load_delay
+        ),
+        host="127.0.0.1",
+        port=args.port
+    )
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from app.services.image_generation.comfyui_events import ComfyUIEventListener, ComfyUIExecutionError
+
+
+def connected_listener() -> ComfyUIEventListener:
+    listener = ComfyUIEventListener("http://comfyui")
+    listener._connected.set()
+    return listener
+
+
+@pytest.mark.asyncio
+async def test_wait_completes_on_executing_event_and_reports_progress():
+    """Progress events are forwarded and the job completes when execution reaches node None."""
+    listener = connected_listener()
+    steps = []
+
+    async def on_progress(step: int, total: int) -> None:
+        steps.append((step, total))
+
+    waiter = asyncio.create_task(listener.wait("p1", timeout=1, on_progress=on_progress))
+    await asyncio.sleep(0)
+    listener._dispatch({"type": "progress", "data": {"prompt_id": "p1", "value": 1, "max": 10}})
+    listener._dispatch({"type": "progress", "data": {"prompt_id": "other", "value": 1, "max": 10}})
+    listener._dispatch({"type": "executing", "data": {"prompt_id": "p1", "node": "3"}})
+    listener._dispatch({"type": "executing", "data": {"prompt_id": "p1", "node": None}})
+
+    assert await waiter is True
+    assert steps == [(1, 10)]
+
+
+@pytest.mark.asyncio
+async def test_events_before_the_waiter_are_remembered():
+    """A job that finishes before anyone waits for it is still reported."""
+    listener = connected_listener()
+    listener._dispatch({"type": "execution_success", "data": {"prompt_id": "p1"}})
+    listener._dispatch({"type": "execution_error", "data": {"prompt_id": "p2", "exception_message": "OOM"}})
+
+    assert await listener.wait("p1", timeout=1) is True
+    with pytest.raises(ComfyUIExecutionError, match="OOM"):
+        await listener.wait("p2", timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_wait_without_feed_falls_back():
+    """Without a connection the caller is told to poll instead."""
+    listener = ComfyUIEventListener("https://comfyui")
+
+    assert listener.ws_url == "wss://comfyui"
+    assert await listener.wait("p1", timeout=1) is False
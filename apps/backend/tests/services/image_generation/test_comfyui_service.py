@@ -0,0 +1,116 @@
+import asyncio
+import hashlib
+import threading
+
+import httpx
+import pytest
+
+from app.services.image_generation.comfyui_client import ComfyUIClient
+from app.services.image_generation.comfyui_service import ComfyUIService
+from app.services.image_generation.image_cache import ImageCache
+from app.services.image_generation.media_store import MediaStore
+
+from tests.services.image_generation.stub_comfyui import create_stub_app
+
+
+def make_service(tmp_path, handler) -> ComfyUIService:
+    client = ComfyUIClient(base_url="http://comfyui", transport=httpx.MockTransport(handler), use_websocket=False)
+    service = ComfyUIService(client=client)
+    service.store = MediaStore(tmp_path, staging_dir=tmp_path / "staging")
+    service.image_cache = ImageCache(tmp_path / "image_cache.json")
+    return service
+
+
+@pytest.mark.asyncio
+async def test_generate_image_runs_on_the_event_loop(tmp_path):
+    """Queue, history and view requests go through the shared async client without threads."""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append((request.method, request.url.path))
+        assert threading.current_thread() is threading.main_thread()
+        if request.url.path == "/queue":
+            return httpx.Response(200, json={"queue_running": [], "queue_pending": []})
+        if request.url.path == "/prompt":
+            return httpx.Response(200, json={"prompt_id": "p1"})
+        if request.url.path == "/history/p1":
+            return httpx.Response(200, json={"p1": {"outputs": {"9": {"images": [
+                {"filename": "location.png", "subfolder": "", "type": "output"}
+            ]}}}})
+        if request.url.path == "/view":
+            return httpx.Response(200, content=b"png")
+        return httpx.Response(404)
+
+    service = make_service(tmp_path, handler)
+    result = await service.generate_image("a lighthouse at dusk", "location")
+    await service.scheduler.close()
+
+    assert result["success"] is True
+    assert result["promptId"] == "p1"
+    digest = hashlib.sha256(b"png").hexdigest()
+    assert result["sha256"] == digest
+    assert result["imagePath"] == f"/media/comfyui/{digest[:2]}/{digest}.png"
+    assert (tmp_path / result["imagePaths"]["images"][0]).read_bytes() == b"png"
+    assert list(service.store.staging_dir.iterdir()) == []
+    assert [path for _, path in requests] == ["/queue", "/prompt", "/history/p1", "/history/p1", "/view"]
+
+
+@pytest.mark.asyncio
+async def test_generate_image_reports_unreachable_backend(tmp_path):
+    """Connection errors are reported in the result instead of raised."""
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("connection refused", request=request)
+
+    service = make_service(tmp_path, handler)
+    result = await service.generate_image("a lighthouse at dusk", "location")
+    await service.scheduler.close()
+
+    assert result["success"] is False
+    assert "Failed to queue prompt" in result["error"]
+
+
+@pytest.mark.asyncio
+async def test_failed_download_leaves_no_partial_file(tmp_path):
+    """A download that breaks off mid-stream removes its temporary file and publishes nothing."""
+    class BrokenStream(httpx.AsyncByteStream):
+        async def __aiter__(self):
+            yield b"partial"
+            raise httpx.ReadError("connection reset")
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, stream=BrokenStream())
+
+    client = ComfyUIClient(base_url="http://comfyui", transport=httpx.MockTransport(handler), use_websocket=False)
+    image = await client.download_image("location.png", tmp_path / "location.png", chunk_size=4)
+    await client.close()
+
+    assert image is None
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_cancelled_generations_are_stopped_on_comfyui(tmp_path, monkeypatch):
+    """Cancelling interrupts the running prompt, deletes the pending one and counts the wasted GPU time."""
+    monkeypatch.setattr("app.services.image_generation.comfyui_service.ABANDON_HISTORY_INTERVAL", 0.01)
+    app = create_stub_app(delay=5, steps=50)
+    client = ComfyUIClient(base_url="http://comfyui", transport=httpx.ASGITransport(app=app), use_websocket=False)
+    service = ComfyUIService(client=client)
+    service.store = MediaStore(tmp_path, staging_dir=tmp_path / "staging")
+    service.image_cache = ImageCache(tmp_path / "image_cache.json")
+    stub = app.state.comfyui
+
+    tasks = [asyncio.create_task(service.generate_image(f"a lighthouse number {i}", "location")) for i in range(2)]
+    while len(stub.pending) + (stub.running is not None) < 2:
+        await asyncio.sleep(0.01)
+    running, pending = stub.running, stub.pending[0][0]
+    await asyncio.sleep(0.1)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    while client.abandoned < 2:
+        await asyncio.sleep(0.01)
+
+    assert stub.interrupted == [running] and stub.deleted == [pending]
+    assert stub.executed == 0
+    assert 0.05 < client.wasted_gpu_seconds < 5
+    await service.scheduler.close()
@@ -0,0 +1,81 @@
+import copy
+from pathlib import Path
+
+from app.core.config import settings
+from app.services.image_generation import image_cache
+from app.services.image_generation.image_cache import ImageCache, get_image_cache
+
+
+WORKFLOW = {
+    "3": {"class_type": "KSampler", "inputs": {"seed": 1, "steps": 20, "cfg": 7.0, "sampler_name": "euler"}},
+    "16": {"class_type": "CLIPTextEncode", "inputs": {"text": "a lighthouse at dusk"}},
+    "69": {"class_type": "SaveImage", "inputs": {"filename_prefix": "location_abc_1"}},
+}
+
+
+def patched(**inputs) -> dict:
+    workflow = copy.deepcopy(WORKFLOW)
+    workflow["3"]["inputs"].update(inputs)
+    workflow["69"]["inputs"]["filename_prefix"] = f"location_{inputs.get('seed', 1)}"
+    return workflow
+
+
+def make_image(tmp_path: Path, name: str) -> str:
+    path = tmp_path / name
+    path.write_bytes(b"png")
+    return str(path)
+
+
+def test_key_ignores_volatile_inputs_and_unpinned_seed():
+    """Without a pinned seed only the prompt and the other workflow inputs matter."""
+    assert ImageCache.key(patched(seed=1), pin_seed=False) == ImageCache.key(patched(seed=2), pin_seed=False)
+    assert ImageCache.key(patched(seed=1), pin_seed=True) != ImageCache.key(patched(seed=2), pin_seed=True)
+    # Sampling parameters come from the generation profile, images of other profiles are misses
+    assert ImageCache.key(patched(steps=10), pin_seed=False) != ImageCache.key(patched(steps=30), pin_seed=False)
+
+    other_prompt = patched()
+    other_prompt["16"]["inputs"]["text"] = "a harbor at night"
+    assert ImageCache.key(other_prompt, pin_seed=False) != ImageCache.key(patched(), pin_seed=False)
+
+
+def test_lru_eviction_metrics_and_persistence(tmp_path: Path):
+    """The least recently used entry is evicted and the index survives a reload."""
+    cache = ImageCache(tmp_path / "index.json", max_entries=2)
+    cache.put("a", "/media/comfyui/a.png", make_image(tmp_path, "a.png"))
+    cache.put("b", "/media/comfyui/b.png", make_image(tmp_path, "b.png"))
+    assert cache.get("a") == "/media/comfyui/a.png"
+    cache.put("c", "/media/comfyui/c.png", make_image(tmp_path, "c.png"))
+
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1
+    assert cache.hit_rate == 0.5
+
+    reloaded = ImageCache(tmp_path / "index.json", max_entries=2)
+    assert reloaded.get("a") == "/media/comfyui/a.png"
+    assert reloaded.get("c") == "/media/comfyui/c.png"
+
+
+def test_missing_file_is_a_miss(tmp_path: Path):
+    """Entries whose image was deleted are dropped."""
+    cache = ImageCache(tmp_path / "index.json")
+    file_path = make_image(tmp_path, "a.png")
+    cache.put("a", "/media/comfyui/a.png", file_path)
+    Path(file_path).unlink()
+
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_shared_index_is_kept_out_of_the_media_root(monkeypatch, tmp_path: Path):
+    """The index lives under CACHE_ROOT, an index left in the served media directory is moved there."""
+    public_index = tmp_path / "media" / "comfyui" / "image_cache.json"
+    public_index.parent.mkdir(parents=True)
+    public_index.write_text('{"a": {"imagePath": "/media/comfyui/a.png", "filePath": "a.png"}}')
+    monkeypatch.setattr(settings, "MEDIA_ROOT", str(tmp_path / "media"))
+    monkeypatch.setattr(settings, "CACHE_ROOT", str(tmp_path / "cache"))
+    monkeypatch.setattr(image_cache, "_image_cache", None)
+
+    cache = get_image_cache()
+    assert cache.index_path == tmp_path / "cache" / "image_cache.json"
+    assert cache.image_paths() == ["/media/comfyui/a.png"]
+    assert not public_index.exists()
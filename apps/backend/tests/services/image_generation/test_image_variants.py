@@ -0,0 +1,33 @@
+import pytest
+
+from app.core.config import settings
+from app.services.image_generation.image_variants import ImageVariants, render_variants
+
+
+@pytest.mark.asyncio
+async def test_variant_urls_follow_the_image_url(monkeypatch, tmp_path):
+    """Variants are looked up by media path and returned in the form of the image URL."""
+    monkeypatch.setattr(settings, "BACKEND_URL", "http://backend")
+    variants = ImageVariants(max_workers=0)
+    variants._variants["/media/comfyui/a.png"] = {"webp_256": "/media/comfyui/a_webp_256.webp"}
+
+    assert variants.urls("http://backend/media/comfyui/a.png") == {
+        "webp_256": "http://backend/media/comfyui/a_webp_256.webp"
+    }
+    assert variants.urls("/media/comfyui/a.png") == {"webp_256": "/media/comfyui/a_webp_256.webp"}
+    assert variants.urls("http://backend/media/comfyui/unknown.png") == {}
+    assert await variants.create(tmp_path / "b.png", "/media/comfyui/b.png") == {}
+
+
+def test_render_variants_downscales_and_converts(tmp_path):
+    """Widths at or above the original are skipped; formats Pillow cannot write are ignored."""
+    Image = pytest.importorskip("PIL.Image")
+    source = tmp_path / "portrait.png"
+    Image.new("RGB", (512, 768), "teal").save(source)
+
+    variants = render_variants(str(source), [256, 1024], ["webp", "nonexistent"], 80)
+
+    assert variants == {"webp": "portrait_webp.webp", "webp_256": "portrait_webp_256.webp"}
+    with Image.open(tmp_path / "portrait_webp_256.webp") as thumbnail:
+        assert thumbnail.size == (256, 384)
+    assert not list(tmp_path.glob(".*.part"))
@@ -0,0 +1,91 @@
+import hashlib
+import os
+import time
+
+from app.core.config import settings
+from app.services.image_generation.media_store import MediaStore
+
+
+def stage(store: MediaStore, name: str, content: bytes):
+    path = store.staging_path(name)
+    path.write_bytes(content)
+    return path, hashlib.sha256(content).hexdigest()
+
+
+def make_store(tmp_path, **kwargs) -> MediaStore:
+    return MediaStore(tmp_path / "comfyui", staging_dir=tmp_path / "staging", **kwargs)
+
+
+def age(path, seconds: float = 7 * 86400) -> None:
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def test_identical_images_are_stored_once(tmp_path):
+    """Publishing the same content twice returns the same content address and drops the copy."""
+    store = make_store(tmp_path)
+    first, first_path = store.publish(*stage(store, "a_image.png", b"image"))
+    second, second_path = store.publish(*stage(store, "b_image.png", b"image"))
+
+    digest = hashlib.sha256(b"image").hexdigest()
+    assert first == second == tmp_path / "comfyui" / digest[:2] / f"{digest}.png"
+    assert first_path == second_path == f"/media/comfyui/{digest[:2]}/{digest}.png"
+    assert list(store.staging_dir.iterdir()) == []
+    assert store.file_path(first_path) == first
+
+
+def test_garbage_collection_keeps_referenced_and_recent_files(monkeypatch, tmp_path):
+    """Unreferenced files older than the grace period go, including variants and staging leftovers.
+
+    URLs count as references whatever their host, e.g. after BACKEND_URL changed.
+    """
+    monkeypatch.setattr(settings, "BACKEND_URL", "http://backend")
+    store = make_store(tmp_path, grace_period=3600)
+    root = store.root
+    kept, kept_path = store.publish(*stage(store, "kept.png", b"kept"))
+    orphan, _ = store.publish(*stage(store, "orphan.png", b"orphan"))
+    recent, _ = store.publish(*stage(store, "recent.png", b"recent"))
+    kept_variant = kept.with_name(f"{kept.stem}_webp_256.webp")
+    orphan_variant = orphan.with_name(f"{orphan.stem}_webp_256.webp")
+    legacy = root / "abc12345_character_00001_.png"
+    legacy_variant = root / "abc12345_character_00001__webp.webp"
+    abandoned = store.staging_path(".x.png.part")
+    for path in (kept_variant, orphan_variant, legacy, legacy_variant, abandoned):
+        path.write_bytes(b"data")
+    (root / "image_cache.json").write_text("{}")
+    reference = root / "reference_images" / "model_reference.jpg"
+    reference.parent.mkdir()
+    reference.write_bytes(b"reference")
+    age(reference)
+    for path in (kept, orphan, kept_variant, orphan_variant, legacy, legacy_variant, abandoned):
+        age(path)
+
+    referenced = store.referenced_owners([
+        f"https://old-host:8000{kept_path}", "/media/comfyui/abc12345_character_00001_.png", "/placeholder.png", None
+    ])
+    usage = store.usage(referenced)
+    assert (usage.files, usage.referenced_files, usage.legacy_files) == (8, 4, 2)
+
+    dry_run = store.collect_garbage(referenced, dry_run=True)
+    assert (dry_run.deleted_files, dry_run.recent_files) == (3, 1)
+    assert orphan.exists()
+
+    result = store.collect_garbage(referenced)
+    assert result.deleted_files == 3
+    assert not orphan.exists() and not orphan_variant.exists() and not abandoned.exists()
+    assert all(path.exists() for path in (kept, kept_variant, recent, legacy, legacy_variant))
+    assert (root / "image_cache.json").exists()
+
+
+def test_garbage_collection_keeps_workflow_reference_images(tmp_path):
+    """Reference images uploaded for workflows are not part of the store, even when nothing references them."""
+    store = make_store(tmp_path, grace_period=0)
+    reference = store.root / "reference_images" / "model_reference.jpg"
+    reference.parent.mkdir()
+    reference.write_bytes(b"reference")
+    age(reference)
+
+    assert store.usage(set()).files == 0
+    result = store.collect_garbage(set())
+    assert (result.scanned, result.deleted_files) == (0, 0)
+    assert reference.exists()
@@ -0,0 +1,66 @@
+import httpx
+import pytest
+
+from app.services.image_generation.comfyui_client import ComfyUIClient
+
+
+class FakeComfyUI:
+    """Records uploads and lists them as LoadImage choices, like a ComfyUI input folder."""
+
+    def __init__(self):
+        self.inputs = []
+        self.uploads = 0
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/upload/image":
+            self.uploads += 1
+            name = request.content.split(b'filename="')[1].split(b'"')[0].decode()
+            self.inputs.append(name)
+            return httpx.Response(200, json={"name": name, "subfolder": "", "type": "input"})
+        if request.url.path == "/object_info/LoadImage":
+            return httpx.Response(200, json={"LoadImage": {"input": {"required": {"image": [self.inputs, {}]}}}})
+        return httpx.Response(404)
+
+
+@pytest.mark.asyncio
+async def test_reference_is_uploaded_once_and_reverified_after_reconnect(tmp_path):
+    """The same file is uploaded once; after a reconnect it is only re-uploaded if it is gone."""
+    comfyui = FakeComfyUI()
+    client = ComfyUIClient(base_url="http://comfyui", transport=httpx.MockTransport(comfyui.handler))
+    reference = tmp_path / "model_reference.jpg"
+    reference.write_bytes(b"jpeg" * 1000)
+
+    name = await client.references.ensure_uploaded(reference)
+    assert name.startswith("ref_") and name.endswith(".jpg")
+    assert await client.references.ensure_uploaded(reference) == name
+    assert comfyui.uploads == 1
+
+    # Reconnected, the image is still there
+    client.events.connections += 1
+    assert await client.references.ensure_uploaded(reference) == name
+    assert comfyui.uploads == 1
+
+    # Reconnected to a restarted backend with an empty input folder
+    client.events.connections += 1
+    comfyui.inputs.clear()
+    assert await client.references.ensure_uploaded(reference) == name
+    assert comfyui.uploads == 2
+
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_changed_reference_gets_a_new_name(tmp_path):
+    """Names are derived from the content, so an edited file is uploaded again."""
+    comfyui = FakeComfyUI()
+    client = ComfyUIClient(base_url="http://comfyui", transport=httpx.MockTransport(comfyui.handler))
+    reference = tmp_path / "model_reference.jpg"
+    reference.write_bytes(b"first")
+    first = await client.references.ensure_uploaded(reference)
+
+    reference.write_bytes(b"second version")
+    second = await client.references.ensure_uploaded(reference)
+
+    assert first != second
+    assert comfyui.uploads == 2
+    await client.close()
@@ -0,0 +1,183 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.image_generation.comfyui_client import ComfyUIClient
+from app.services.image_generation.comfyui_service import ComfyUIService
+from app.services.image_generation.image_cache import ImageCache
+from app.services.image_generation.media_store import MediaStore
+from app.services.image_generation.scheduler import ComfyUIScheduler, NoBackendAvailableError, Priority
+from app.services.image_generation.workflow_models import workflow_models
+
+from tests.services.image_generation.stub_comfyui import create_stub_app
+
+CHARACTER_MODELS = frozenset({"CheckpointLoaderSimple:portrait.safetensors"})
+LOCATION_MODELS = frozenset({"CheckpointLoaderSimple:landscape.safetensors"})
+
+
+class FakeClient:
+    """Backend with a fixed /queue depth"""
+
+    def __init__(self, base_url: str, depth: int = 0):
+        self.base_url = base_url
+        self.depth = depth
+        self.abandoned = 0
+        self.wasted_gpu_seconds = 0.0
+
+    async def get_queue_depth(self) -> int:
+        return self.depth
+
+    async def close(self) -> None:
+        pass
+
+
+@pytest.mark.asyncio
+async def test_waiting_jobs_run_by_priority():
+    """Once a slot frees up, interactive jobs go before earlier queued bulk jobs."""
+    scheduler = ComfyUIScheduler([FakeClient("http://a")], max_in_flight=1, reserved_slots=0)
+    release = asyncio.Event()
+    order = []
+
+    async def job(name: str, client) -> str:
+        if name == "first":
+            await release.wait()
+        order.append(name)
+        return name
+
+    first = asyncio.create_task(scheduler.run(lambda c: job("first", c), Priority.INTERACTIVE))
+    await asyncio.sleep(0.01)
+    bulk = asyncio.create_task(scheduler.run(lambda c: job("bulk", c), Priority.BULK))
+    await asyncio.sleep(0.01)
+    interactive = asyncio.create_task(scheduler.run(lambda c: job("interactive", c), Priority.INTERACTIVE))
+    await asyncio.sleep(0.01)
+    release.set()
+    await asyncio.gather(first, bulk, interactive)
+
+    assert order == ["first", "interactive", "bulk"]
+
+
+@pytest.mark.asyncio
+async def test_bulk_jobs_leave_reserved_slots_free():
+    """With one reserved slot, bulk jobs never take the last free slot."""
+    scheduler = ComfyUIScheduler([FakeClient("http://a")], max_in_flight=2, reserved_slots=1)
+    release = asyncio.Event()
+    running = []
+
+    async def job(name: str, client) -> None:
+        running.append(name)
+        await release.wait()
+
+    bulk = [asyncio.create_task(scheduler.run(lambda c, i=i: job(f"bulk{i}", c), Priority.BULK)) for i in range(2)]
+    await asyncio.sleep(0.01)
+    interactive = asyncio.create_task(scheduler.run(lambda c: job("interactive", c), Priority.INTERACTIVE))
+    await asyncio.sleep(0.01)
+
+    assert running == ["bulk0", "interactive"]
+    release.set()
+    await asyncio.gather(*bulk, interactive)
+
+
+@pytest.mark.asyncio
+async def test_jobs_go_to_the_least_loaded_backend():
+    """The /queue depth from other clients counts towards a backend's load."""
+    busy, idle = FakeClient("http://busy", depth=5), FakeClient("http://idle")
+    scheduler = ComfyUIScheduler([busy, idle])
+
+    assert await scheduler.run(lambda client: asyncio.sleep(0, client.base_url)) == "http://idle"
+
+
+def test_workflow_models_reads_the_model_loader_nodes():
+    workflow = {
+        "4": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "portrait.safetensors"}},
+        "10": {"class_type": "LoraLoader", "inputs": {"lora_name": "ink.safetensors", "model": ["4", 0]}},
+        "3": {"class_type": "KSampler", "inputs": {"model": ["10", 0]}},
+    }
+
+    assert workflow_models(workflow) == {"CheckpointLoaderSimple:portrait.safetensors", "LoraLoader:ink.safetensors"}
+
+
+@pytest.mark.asyncio
+async def test_jobs_with_the_loaded_models_go_first_within_the_wait_limit():
+    """Waiting jobs are grouped by checkpoint, but a passed-over job runs once it waited too long."""
+    order = []
+
+    async def run(affinity_max_wait: float) -> int:
+        scheduler = ComfyUIScheduler(
+            [FakeClient("http://a")], max_in_flight=1, reserved_slots=0, affinity_max_wait=affinity_max_wait
+        )
+        release = asyncio.Event()
+        order.clear()
+
+        async def job(name: str, client) -> None:
+            if name == "first":
+                await release.wait()
+            order.append(name)
+
+        jobs = [("first", CHARACTER_MODELS), ("location", LOCATION_MODELS), ("character", CHARACTER_MODELS)]
+        tasks = []
+        for name, models in jobs:
+            tasks.append(asyncio.create_task(scheduler.run(lambda c, n=name: job(n, c), Priority.BACKGROUND, models)))
+            await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.gather(*tasks)
+        return scheduler.model_switches
+
+    assert await run(affinity_max_wait=10) == 1
+    assert order == ["first", "character", "location"]
+    assert await run(affinity_max_wait=0) == 2
+    assert order == ["first", "location", "character"]
+
+
+@pytest.mark.asyncio
+async def test_jobs_go_to_the_backend_with_their_models_loaded():
+    scheduler = ComfyUIScheduler([FakeClient("http://a"), FakeClient("http://b")], reserved_slots=0)
+    scheduler.backends[0].loaded_models = LOCATION_MODELS
+    scheduler.backends[1].loaded_models = CHARACTER_MODELS
+
+    assert await scheduler.run(lambda client: asyncio.sleep(0, client.base_url), models=CHARACTER_MODELS) == "http://b"
+    assert scheduler.model_switches == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_backend_is_skipped_and_job_retried():
+    """A connection error retries the job elsewhere and takes the backend out of rotation."""
+    down, up = FakeClient("http://down"), FakeClient("http://up", depth=1)
+    scheduler = ComfyUIScheduler([down, up], max_attempts=2)
+
+    async def job(client) -> str:
+        if client is down:
+            raise ConnectionError("connection refused")
+        return client.base_url
+
+    assert await scheduler.run(job) == "http://up"
+    assert await scheduler.run(job) == "http://up"
+    assert [backend["healthy"] for backend in scheduler.stats()] == [False, True]
+
+    # Without a healthy backend left, jobs fail instead of waiting
+    single = ComfyUIScheduler([down], max_attempts=2)
+    with pytest.raises(ConnectionError, match="connection refused"):
+        await single.run(job)
+    with pytest.raises(NoBackendAvailableError):
+        await single.run(job)
+
+
+@pytest.mark.asyncio
+async def test_images_are_spread_over_stub_backends(tmp_path):
+    """Concurrent generations are balanced over two stub ComfyUI servers."""
+    apps = [create_stub_app(delay=0.05, steps=1) for _ in range(2)]
+    clients = [
+        ComfyUIClient(base_url=f"http://comfyui{i}", transport=httpx.ASGITransport(app=app), use_websocket=False)
+        for i, app in enumerate(apps)
+    ]
+    service = ComfyUIService(scheduler=ComfyUIScheduler(clients, max_in_flight=1, reserved_slots=0))
+    service.store = MediaStore(tmp_path, staging_dir=tmp_path / "staging")
+    service.image_cache = ImageCache(tmp_path / "image_cache.json")
+
+    results = await asyncio.gather(
+        *(service.generate_image(f"a lighthouse number {i}", "location") for i in range(4))
+    )
+    await service.scheduler.close()
+
+    assert all(result["success"] for result in results)
+    assert [app.state.comfyui.executed for app in apps] == [2, 2]
@@ -0,0 +1,99 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.image_generation.comfyui_client import ComfyUIClient
+from app.services.image_generation.comfyui_service import ComfyUIService, ImageRequest
+from app.services.image_generation.image_batch import ImageBatch
+from app.services.image_generation.image_cache import ImageCache
+from app.services.image_generation.media_store import MediaStore
+from app.services.image_generation.workflow_batch import merge_workflows
+
+from tests.services.image_generation.stub_comfyui import create_stub_app
+
+
+def workflow(prompt: str, prefix: str) -> dict:
+    return {
+        "4": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "dreamshaper_8.safetensors"}},
+        "16": {"class_type": "CLIPTextEncode", "inputs": {"text": prompt, "clip": ["4", 1]}},
+        "40": {"class_type": "CLIPTextEncode", "inputs": {"text": "", "clip": ["4", 1]}},
+        "3": {"class_type": "KSampler", "inputs": {"seed": 1, "model": ["4", 0], "positive": ["16", 0],
+                                                   "negative": ["40", 0]}},
+        "67": {"class_type": "VAEDecode", "inputs": {"samples": ["3", 0], "vae": ["4", 2]}},
+        "69": {"class_type": "SaveImage", "inputs": {"filename_prefix": prefix, "images": ["67", 0]}},
+    }
+
+
+def test_merged_workflows_share_identical_nodes():
+    """The checkpoint and negative prompt are shared, the prompt-specific nodes are not."""
+    merged, save_nodes = merge_workflows([workflow("a harbour", "location"), workflow("a sailor", "character")])
+
+    class_types = sorted(node["class_type"] for node in merged.values())
+    assert class_types == sorted([
+        "CheckpointLoaderSimple", "CLIPTextEncode", *["CLIPTextEncode", "KSampler", "VAEDecode", "SaveImage"] * 2
+    ])
+    prefixes = [merged[node_id]["inputs"]["filename_prefix"] for node_id in save_nodes]
+    assert prefixes == ["location", "character"]
+    # Every link points at a node of the merged graph
+    for node in merged.values():
+        for value in node["inputs"].values():
+            if isinstance(value, list):
+                assert value[0] in merged
+
+
+def test_identical_workflows_keep_their_own_outputs():
+    """Output nodes are never shared, even when the rest of two workflows is identical."""
+    merged, save_nodes = merge_workflows([workflow("a harbour", "same"), workflow("a harbour", "same")])
+
+    assert len(merged) == 7
+    assert save_nodes[0] != save_nodes[1]
+
+
+@pytest.mark.asyncio
+async def test_scene_images_run_as_one_job(tmp_path):
+    """A location and two portraits are queued once and each output goes to its own request."""
+    app = create_stub_app(delay=0.02, steps=1)
+    client = ComfyUIClient(base_url="http://comfyui", transport=httpx.ASGITransport(app=app), use_websocket=False)
+    service = ComfyUIService(client=client)
+    service.store = MediaStore(tmp_path, staging_dir=tmp_path / "staging")
+    service.image_cache = ImageCache(tmp_path / "image_cache.json")
+
+    results = await service.generate_batch([
+        ImageRequest("a harbour at dawn", "location"),
+        ImageRequest("an old sailor", "character"),
+        ImageRequest("a young cartographer", "character"),
+    ])
+    await service.scheduler.close()
+
+    assert app.state.comfyui.executed == 1
+    assert all(result["success"] for result in results)
+    assert len({result["sha256"] for result in results}) == 3
+    # The stub writes the filename of every image into it
+    contents = [(tmp_path / result["imagePaths"]["images"][0]).read_bytes() for result in results]
+    assert [b"location_" in content for content in contents] == [True, False, False]
+    assert all(result["batchSize"] == 3 and result["gpuSeconds"] > 0 for result in results)
+
+
+@pytest.mark.asyncio
+async def test_image_batch_submits_added_images_together(tmp_path):
+    """Images added before submit share a job; cancelled batches cancel their futures."""
+    app = create_stub_app(delay=0.02, steps=1)
+    client = ComfyUIClient(base_url="http://comfyui", transport=httpx.ASGITransport(app=app), use_websocket=False)
+    service = ComfyUIService(client=client)
+    service.store = MediaStore(tmp_path, staging_dir=tmp_path / "staging")
+    service.image_cache = ImageCache(tmp_path / "image_cache.json")
+    batch = ImageBatch(service, window=60)
+
+    futures = [batch.add("a harbour at dawn", "location"), batch.add("an old sailor", "character")]
+    batch.submit()
+    results = await asyncio.gather(*futures)
+
+    assert app.state.comfyui.executed == 1
+    assert [result["success"] for result in results] == [True, True]
+    assert batch.stats()["jobs"] == 1 and batch.stats()["images"] == 2
+
+    dropped = batch.add("a lighthouse", "location")
+    batch.cancel()
+    assert dropped.cancelled()
+    await service.scheduler.close()
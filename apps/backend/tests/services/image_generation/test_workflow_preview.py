@@ -0,0 +1,63 @@
+import httpx
+import pytest
+
+from app.services.image_generation.comfyui_client import ComfyUIClient
+from app.services.image_generation.comfyui_service import ComfyUIService
+from app.services.image_generation.image_cache import ImageCache
+from app.services.image_generation.media_store import MediaStore
+from app.services.image_generation.workflow_preview import preview_workflow
+
+from tests.services.image_generation.stub_comfyui import create_stub_app
+
+WORKFLOW = {
+    "3": {"class_type": "KSampler", "inputs": {"steps": 30, "model": ["4", 0], "latent_image": ["5", 0]}},
+    "5": {"class_type": "EmptyLatentImage", "inputs": {"width": 1024, "height": 576, "batch_size": 1}},
+    "65": {"class_type": "LoadImage", "inputs": {"image": "reference.png"}},
+    "66": {"class_type": "VAEEncode", "inputs": {"pixels": ["65", 0], "vae": ["4", 2]}},
+    "69": {"class_type": "SaveImage", "inputs": {"filename_prefix": "location_1", "images": ["67", 0]}},
+}
+
+
+def test_preview_workflow_renders_fewer_steps_at_lower_resolution():
+    """Steps are capped, latents are scaled, encoded images are downscaled; the original is unchanged."""
+    preview = preview_workflow(WORKFLOW, steps=4, scale=0.5)
+
+    assert preview["3"]["inputs"]["steps"] == 4
+    assert (preview["5"]["inputs"]["width"], preview["5"]["inputs"]["height"]) == (512, 288)
+    scale_node = preview["66"]["inputs"]["pixels"][0]
+    assert preview[scale_node] == {
+        "class_type": "ImageScaleBy",
+        "inputs": {"image": ["65", 0], "upscale_method": "bilinear", "scale_by": 0.5},
+    }
+    assert preview["69"]["inputs"]["filename_prefix"] == "preview_location_1"
+    assert WORKFLOW["3"]["inputs"]["steps"] == 30 and WORKFLOW["66"]["inputs"]["pixels"] == ["65", 0]
+
+
+@pytest.mark.asyncio
+async def test_preview_is_delivered_before_the_final_image(tmp_path):
+    """The preview job runs first, its progress is marked, and only the final image is cached."""
+    app = create_stub_app(delay=0.02, steps=1)
+    client = ComfyUIClient(base_url="http://comfyui", transport=httpx.ASGITransport(app=app), use_websocket=False)
+    service = ComfyUIService(client=client)
+    service.store = MediaStore(tmp_path, staging_dir=tmp_path / "staging")
+    service.image_cache = ImageCache(tmp_path / "image_cache.json")
+    previews, progress = [], []
+
+    async def on_preview(result):
+        previews.append(result)
+
+    async def on_progress(event):
+        progress.append((event.status, event.preview))
+
+    result = await service.generate_image(
+        "a lighthouse at dusk", "location", on_progress=on_progress, on_preview=on_preview
+    )
+    await service.scheduler.close()
+
+    assert app.state.comfyui.executed == 2
+    assert result["success"] and result.get("preview") is None
+    assert len(previews) == 1 and previews[0]["preview"] is True
+    assert previews[0]["imagePath"] != result["imagePath"]
+    assert progress[0] == ("queued", True)
+    assert ("completed", False) in progress
+    assert service.image_cache.image_paths() == [result["imagePath"]]
@@ -0,0 +1,96 @@
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from app.services.image_generation.location_workflow import LocationWorkflowLoader
+from app.services.image_generation.workflow_templates import CompiledWorkflow, WorkflowTemplates
+
+
+WORKFLOW = {
+    "3": {"class_type": "KSampler", "inputs": {"seed": 1, "steps": 20, "cfg": 7.0, "sampler_name": "euler",
+                                               "positive": ["16", 0], "negative": ["40", 0]}},
+    "16": {"class_type": "CLIPTextEncode", "inputs": {"text": "placeholder"}},
+    "40": {"class_type": "CLIPTextEncode", "inputs": {"text": ""}},
+    "67": {"class_type": "VAEDecode", "inputs": {"samples": ["3", 0]}},
+}
+
+
+def write_workflow(tmp_path: Path, workflow: dict = WORKFLOW) -> Path:
+    path = tmp_path / "locations_api.json"
+    path.write_text(json.dumps(workflow))
+    return path
+
+
+def test_compile_indexes_patch_points(tmp_path):
+    """Prompt, sampler and output nodes are found once; empty negative prompts are skipped."""
+    template = CompiledWorkflow.compile(write_workflow(tmp_path))
+
+    assert template.prompt_nodes == ("16",)
+    assert template.sampler_nodes == ("3",)
+    assert template.save_node is None
+    assert template.output_node == "67"
+    assert template.next_node_id == "68"
+
+
+def test_instances_do_not_share_patched_inputs(tmp_path):
+    """Patching an instance leaves the template and other instances untouched."""
+    template = CompiledWorkflow.compile(write_workflow(tmp_path))
+
+    first = template.instantiate()
+    first["16"]["inputs"]["text"] = "a harbor"
+    first["3"]["inputs"]["seed"] = 42
+
+    assert template.nodes["16"]["inputs"]["text"] == "placeholder"
+    assert template.instantiate()["3"]["inputs"]["seed"] == 1
+
+
+def test_templates_are_reloaded_when_the_file_changes(tmp_path):
+    """Lookups return the cached template until the file's mtime changes."""
+    templates = WorkflowTemplates()
+    path = write_workflow(tmp_path)
+
+    template = templates.get(path)
+    assert templates.get(path) is template
+
+    changed = dict(WORKFLOW, **{"16": {"class_type": "CLIPTextEncode", "inputs": {"text": "new"}}})
+    path.write_text(json.dumps(changed))
+    os.utime(path, ns=(template.mtime_ns + 1_000_000, template.mtime_ns + 1_000_000))
+
+    assert templates.get(path).nodes["16"]["inputs"]["text"] == "new"
+    assert templates.get(tmp_path / "missing.json") is None
+
+
+def test_location_loader_patches_the_template(tmp_path):
+    """The loader fills in the prompt and sampling inputs and adds a SaveImage node."""
+    write_workflow(tmp_path)
+    loader = LocationWorkflowLoader()
+    loader.workflow_dir = tmp_path
+    loader.pin_seed("a harbor")
+
+    workflow = loader.load_workflow("a harbor", "abc")
+
+    assert workflow["16"]["inputs"]["text"] == "a harbor"
+    assert workflow["40"]["inputs"]["text"] == ""
+    seed = workflow["3"]["inputs"]["seed"]
+    assert workflow["68"] == {
+        "class_type": "SaveImage",
+        "inputs": {"filename_prefix": f"location_abc_{seed}", "images": ["67", 0]},
+    }
+
+
+def test_location_loader_samples_with_the_generation_profile(tmp_path):
+    """Sampling inputs come from the selected profile, not from the seed."""
+    write_workflow(tmp_path)
+    loader = LocationWorkflowLoader()
+    loader.workflow_dir = tmp_path
+    loader.use_profile("quality")
+
+    inputs = loader.load_workflow("a harbor", "abc")["3"]["inputs"]
+
+    assert (inputs["sampler_name"], inputs["scheduler"], inputs["steps"], inputs["cfg"]) == (
+        "dpmpp_2m", "karras", 30, 7.5
+    )
+    with pytest.raises(ValueError):
+        loader.use_profile("ultra")
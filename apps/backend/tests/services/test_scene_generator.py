@@ -10,7 +10,7 @@ from app.schemas.scene_generator import SceneGenerationResult
 from app.models.scene import Scene
 from app.models.story import Story
 from app.models.character import Character
-from app.schemas.story_generation import Location, Character as CharacterSchema
+from app.schemas.story_generation import Location, Character as CharacterSchema, Story as StorySchema
 from app.crud import scenes as scenes_crud
 
 
@@ -170,4 +170,68 @@ class TestSceneGeneratorStatus:
                                     assert status_calls[-1] == "failed"  # Final status should be failed
                                     
                                     # Verify error was logged
-                                    assert mock_log_error.called 
\ No newline at end of file
+                                    assert mock_log_error.called 
+
+@pytest.mark.asyncio
+class TestSceneNarration:
+    """Tests for streaming the final scene description"""
+
+    @pytest.fixture
+    def story(self):
+        return StorySchema(title="Test story", description="A test story", rules=[], uuid=str(uuid.uuid4()))
+
+    @pytest.fixture
+    def player(self):
+        return CharacterSchema(
+            name="Player",
+            description="Player character",
+            backstory="",
+            goals=[],
+            relationships=[],
+            imageUrl="",
+            role="player",
+            uuid=str(uuid.uuid4())
+        )
+
+    async def test_narration_streams_deltas(self, mock_llm_service, story, player):
+        """Each streamed chunk is passed to the callback and joined into the description"""
+        async def stream():
+            for chunk in ["The rain ", "hammers ", "the roof."]:
+                yield chunk
+
+        mock_llm_service.create_message = MagicMock(return_value={"role": "user", "content": "test"})
+        mock_llm_service.generate_completion.return_value = stream()
+        on_description_delta = AsyncMock()
+
+        generator = SceneGeneratorAgent(
+            llm_service=mock_llm_service,
+            story=story,
+            player=player,
+            on_description_delta=on_description_delta
+        )
+        generator.state.scene_outline = "Rain at night"
+
+        description = await generator._narrate_scene()
+
+        assert description == "The rain hammers the roof."
+        assert [call.args[0] for call in on_description_delta.call_args_list] == ["The rain ", "hammers ", "the roof."]
+        assert mock_llm_service.generate_completion.call_args.kwargs["stream"] is True
+
+    async def test_narration_falls_back_to_outline(self, mock_llm_service, story, player):
+        """A failed narration call falls back to the outline written by the agent"""
+        mock_llm_service.create_message = MagicMock(return_value={"role": "user", "content": "test"})
+        mock_llm_service.generate_completion.side_effect = ValueError("API error")
+        on_description_delta = AsyncMock()
+
+        generator = SceneGeneratorAgent(
+            llm_service=mock_llm_service,
+            story=story,
+            player=player,
+            on_description_delta=on_description_delta
+        )
+        generator.state.scene_outline = "Rain at night"
+
+        description = await generator._narrate_scene()
+
+        assert description == "Rain at night"
+        on_description_delta.assert_called_once_with("Rain at night")
@@ -0,0 +1,75 @@
+import uuid
+
+import pytest
+
+from app.services.scene_prompt_builder import ScenePromptBuilder
+from app.schemas.scene_generator import SceneGeneratorState
+from app.schemas.story_generation import Story, Character, Location
+
+
+def make_character(name: str, role: str = "npc") -> Character:
+    return Character(
+        name=name,
+        description=f"{name} description",
+        backstory="",
+        goals=[],
+        relationships=[],
+        imageUrl="",
+        role=role,
+        uuid=str(uuid.uuid4())
+    )
+
+
+def make_location(name: str) -> Location:
+    return Location(name=name, description=f"{name} description", rules=[], imageUrl="", uuid=str(uuid.uuid4()))
+
+
+@pytest.fixture
+def state() -> SceneGeneratorState:
+    """Create a scene generator state with small pools"""
+    return SceneGeneratorState(
+        story=Story(title="Test story", description="A test story", rules=[], uuid=str(uuid.uuid4())),
+        player=make_character("Player", role="player"),
+        characters_pool=[make_character(f"Character {i}") for i in range(5)],
+        locations_pool=[make_location(f"Location {i}") for i in range(5)],
+    )
+
+
+def test_build_renders_the_original_prompt(state: SceneGeneratorState):
+    """The prompt keeps the text the agent sent before fragments were cached"""
+    character = state.characters_pool[0]
+    prompt = ScenePromptBuilder().build(state)
+
+    assert prompt.startswith("\n        <context>\n            <story>\n                <uuid>")
+    assert (
+        f"\n            <character>\n                <name>{character.name}</name>\n"
+        f"                <role>npc</role>\n                <description>{character.description}</description>\n"
+        f"                <uuid>{character.uuid}</uuid>\n            </character>\n            "
+    ) in prompt
+    assert "<selected_characters>\n                []\n                </selected_characters>" in prompt
+    assert "<reserved_characters>" not in prompt
+    assert prompt.endswith("use the finalize_scene tool to complete the scene.\n        ")
+
+
+def test_build_only_renders_changed_entities(state: SceneGeneratorState):
+    """Between steps only new and edited entities are rendered, and the prompt reflects them"""
+    builder = ScenePromptBuilder()
+    first = builder.build(state)
+    renders = builder.renders
+    assert builder.build(state) == first
+    assert builder.renders == renders
+
+    state.characters_pool[1].description = "Changed"
+    state.selected_characters = [state.characters_pool[0]]
+    state.finalize_scene_error = "No location selected"
+    state.reserved_locations = [make_location("Reserved harbor")]
+    prompt = builder.build(state)
+
+    # The edited character, the selected character and the reserved location
+    assert builder.renders == renders + 3
+    assert "<description>Changed</description>" in prompt
+    assert f"<uuid>{state.characters_pool[0].uuid}</uuid>\n                    <name>Character 0</name>" in prompt
+    assert "<finalize_error>No location selected</finalize_error>" in prompt
+    assert (
+        "<reserved_locations>\n            \n            <location>\n                <name>Reserved harbor</name>"
+    ) in prompt
@@ -8,6 +8,7 @@ import { useConversation } from '@/common/hooks/useConversation';
 import { useMessages } from '@/common/hooks/useMessages';
 
 import styles from './ChatView.module.scss';
+import { imageForWidth } from '@/utils/imageVariants';
 
 const Chat = () => {
   const { storyId, sceneId, characterId } = useParams({
@@ -73,7 +74,7 @@ const Chat = () => {
       style={
         scene.location?.image_dir
           ? {
-              backgroundImage: `url(${scene.location.image_dir})`,
+              backgroundImage: `url(${imageForWidth(scene.location.image_dir, scene.location.image_variants, 1920)})`,
             }
           : undefined
       }
@@ -90,7 +91,10 @@ const Chat = () => {
           {selectedCharacter && (
             <>
               <div className={styles.characterAvatar}>
-                <img src={selectedCharacter.image_dir} alt={selectedCharacter.name} />
+                <img
+                  src={imageForWidth(selectedCharacter.image_dir, selectedCharacter.image_variants, 256)}
+                  alt={selectedCharacter.name}
+                />
               </div>
               <div className={styles.characterInfo}>
                 <h2>{selectedCharacter.name}</h2>
@@ -102,7 +106,7 @@ const Chat = () => {
 
         <div className={styles.contentSection}>
           <div className={styles.userAvatar}>
-            <img src={playerCharacter?.image_dir} alt="You" />
+            <img src={imageForWidth(playerCharacter?.image_dir, playerCharacter?.image_variants, 256)} alt="You" />
           </div>
 
           {messages && messages.length > 0 && (
@@ -111,6 +111,13 @@ const SceneGenerationView = ({ storyId, onSceneComplete, startGeneration }: Scen
               </div>
             </div>
           )}
+
+          {state.description && (
+            <div className={styles.descriptionSection}>
+              <h3>The Scene Unfolds</h3>
+              <p>{state.description}</p>
+            </div>
+          )}
         </div>
       </div>
     );
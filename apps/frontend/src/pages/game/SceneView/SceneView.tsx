@@ -4,6 +4,7 @@ import { useLatestScene } from '@/services/api/hooks/useLatestScene';
 import { useCompleteScene } from '@/services/api/hooks/useCompleteScene';
 import Button from '@/common/components/Button/Button';
 import { Character } from '@/types/character.types';
+import { imageForWidth } from '@/utils/imageVariants';
 import { useState } from 'react';
 import styles from './SceneView.module.scss';
 
@@ -86,7 +87,7 @@ const SceneView = () => {
             </div>
             <div className={styles.locationCard}>
               <div className={styles.locationImage}>
-                <img src={scene.location.image_dir} alt={scene.location.name} />
+                <img src={imageForWidth(scene.location.image_dir, scene.location.image_variants, 768)} alt={scene.location.name} />
               </div>
 
               <div className={styles.locationDetails}>
@@ -114,7 +115,7 @@ const SceneView = () => {
                   onClick={() => handleCharacterClick(character)}
                 >
                   <div className={styles.characterPortrait}>
-                    <img src={character.image_dir} alt={character.name} />
+                    <img src={imageForWidth(character.image_dir, character.image_variants, 256)} alt={character.name} />
                   </div>
                   <div className={styles.characterInfo}>
                     <h3>{character.name}</h3>
@@ -26,18 +26,57 @@ interface ActionChangedPayload {
   actions: Record<string, string>;
 }
 
+// Interface for the payload of SCENE_DESCRIPTION_DELTA
+interface SceneDescriptionDeltaPayload {
+  storyId: string;
+  delta: string;
+}
+
+// Interface for the payload of CHARACTER_IMAGE_READY and LOCATION_IMAGE_READY
+interface ImageReadyPayload {
+  storyId: string;
+  uuid: string;
+  imageUrl: string;
+  imageVariants?: Record<string, string>;
+  preview?: boolean; // A quick provisional image, replaced by the final image
+}
+
+// Interface for the payload of GENERATION_PROGRESS
+interface GenerationProgressPayload {
+  storyId: string;
+  promptId: string;
+  step: number;
+  totalSteps: number;
+  status: 'queued' | 'running' | 'completed';
+  entityUuid?: string;
+  preview?: boolean; // Progress of the preview rendered before the final image
+}
+
 // Define message types for scene generation
 interface SceneGenerationMessage {
   type:
     | 'LOCATION_ADDED'
     | 'CHARACTER_ADDED'
+    | 'LOCATION_IMAGE_READY'
+    | 'CHARACTER_IMAGE_READY'
+    | 'GENERATION_PROGRESS'
+    | 'SCENE_DESCRIPTION_DELTA'
     | 'SCENE_COMPLETE'
     | 'ERROR'
     | 'AUTH_SUCCESS'
     | 'SCENE_START'
     | 'ACTION_CHANGED';
   // Use specific payload types based on message type
-  payload: Location | Character | SceneCompletePayload | ErrorPayload | ActionChangedPayload | any;
+  payload:
+    | Location
+    | Character
+    | SceneCompletePayload
+    | SceneDescriptionDeltaPayload
+    | ImageReadyPayload
+    | GenerationProgressPayload
+    | ErrorPayload
+    | ActionChangedPayload
+    | any;
 }
 
 // Define the state for the hook
@@ -49,6 +88,7 @@ export interface SceneGenerationState {
   description?: string; // Store the final scene description separately if needed
   error?: string; // Store the error message
   actions: Record<string, string>; // Track active actions by type
+  imageProgress?: Record<string, number>; // Image generation progress (0-1) by entity UUID
 }
 
 interface UseSceneGenerationProps {
@@ -127,6 +167,62 @@ export const useSceneGeneration = ({
               lastCharacters: [...prevState.lastCharacters, characterPayload],
             }));
             break;
+          case 'LOCATION_IMAGE_READY':
+            // Images arrive after the entity and may arrive after SCENE_COMPLETE, so keep the status
+            const locationImagePayload = data.payload as ImageReadyPayload;
+            setInternalState((prevState) =>
+              prevState.lastLocation?.uuid === locationImagePayload.uuid
+                ? {
+                    ...prevState,
+                    lastLocation: {
+                      ...prevState.lastLocation,
+                      image_dir: locationImagePayload.imageUrl,
+                      image_variants: locationImagePayload.imageVariants,
+                    },
+                  }
+                : prevState,
+            );
+            break;
+          case 'CHARACTER_IMAGE_READY':
+            const characterImagePayload = data.payload as ImageReadyPayload;
+            setInternalState((prevState) => ({
+              ...prevState,
+              lastCharacters: prevState.lastCharacters.map((char) =>
+                char.uuid === characterImagePayload.uuid
+                  ? {
+                      ...char,
+                      image_dir: characterImagePayload.imageUrl,
+                      image_variants: characterImagePayload.imageVariants,
+                    }
+                  : char,
+              ),
+            }));
+            break;
+          case 'GENERATION_PROGRESS':
+            const progressPayload = data.payload as GenerationProgressPayload;
+            // Only the final image counts towards the progress of an entity
+            if (!progressPayload.entityUuid || progressPayload.preview) break;
+            const entityUuid = progressPayload.entityUuid;
+            const progress =
+              progressPayload.status === 'completed'
+                ? 1
+                : progressPayload.totalSteps > 0
+                  ? progressPayload.step / progressPayload.totalSteps
+                  : 0;
+            setInternalState((prevState) => ({
+              ...prevState,
+              imageProgress: { ...prevState.imageProgress, [entityUuid]: progress },
+            }));
+            break;
+          case 'SCENE_DESCRIPTION_DELTA':
+            // Append the streamed chunk to the description shown so far
+            const deltaPayload = data.payload as SceneDescriptionDeltaPayload;
+            setInternalState((prevState) => ({
+              ...prevState,
+              status: 'generating',
+              description: (prevState.description ?? '') + deltaPayload.delta,
+            }));
+            break;
           case 'SCENE_COMPLETE':
             // Assert payload type for SCENE_COMPLETE
             const scenePayload = data.payload as SceneCompletePayload;
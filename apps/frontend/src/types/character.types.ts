@@ -10,6 +10,7 @@ export interface Character {
   name: string;
   description: string;
   image_dir: string;
+  image_variants?: Record<string, string> | null;
   role: 'player' | 'npc';
   personalityTraits?: string[];
   backstory: string;
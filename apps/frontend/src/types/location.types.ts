@@ -3,5 +3,6 @@ export interface Location {
   name: string;
   description: string;
   image_dir: string;
+  image_variants?: Record<string, string> | null;
   rules?: string[];
 }
@@ -0,0 +1,21 @@
+// Variants are named after their format, downscaled ones as "<format>_<width>", e.g. "webp_256"
+const PREFERRED_FORMAT = 'webp';
+
+/**
+ * Returns the URL of the smallest WebP variant at least as wide as the slot,
+ * falling back to the full-size WebP variant and then to the original image.
+ */
+export const imageForWidth = (
+  imageUrl: string | undefined,
+  variants: Record<string, string> | null | undefined,
+  width: number,
+): string | undefined => {
+  if (!variants) return imageUrl;
+  const widths = Object.keys(variants)
+    .filter((name) => name.startsWith(`${PREFERRED_FORMAT}_`))
+    .map((name) => Number(name.slice(PREFERRED_FORMAT.length + 1)))
+    .filter((variantWidth) => variantWidth >= width)
+    .sort((a, b) => a - b);
+  if (widths.length > 0) return variants[`${PREFERRED_FORMAT}_${widths[0]}`];
+  return variants[PREFERRED_FORMAT] ?? imageUrl;
+};